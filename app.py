@@ -1,5 +1,9 @@
 #app.py
 
+from dotenv import load_dotenv
+
+load_dotenv()  # Before any project module reads its settings from the environment
+
 import streamlit as st
 import os
 from llm.conversational_agent import ConversationalAgent
@@ -7,7 +11,10 @@ from db.neo4j_client import (
     save_pdf_document_to_neo4j,
     get_pdf_documents
 )
+from db.schema import SCHEMA_RETRY_SECONDS, ensure_schema
+from ui.components import show_diagnostics
 from utils.pdf_processor import PDFProcessor
+from utils.tracing import get_tracer, span
 
 # Page configuration
 st.set_page_config(
@@ -48,6 +55,32 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+
+@st.cache_resource(ttl=SCHEMA_RETRY_SECONDS, show_spinner=False)
+def schema_problem():
+    """
+    Make sure constraints and indexes exist.
+
+    Cached for the whole process, so Streamlit reruns do not repeat the
+    bootstrap; a failure is remembered and only retried after
+    SCHEMA_RETRY_SECONDS.
+
+    Returns:
+        A message describing the failure, or None when the schema is in place
+    """
+    try:
+        failed = ensure_schema()
+    except Exception as e:
+        return f"Could not set up the database schema: {e}"
+    if failed:
+        return f"{len(failed)} of the database schema statements failed (see the log); search may be slower."
+    return None
+
+
+schema_warning = schema_problem()
+if schema_warning:
+    st.warning(f"⚠️ {schema_warning}")
+
 # Initialize session state
 if "conversational_agent" not in st.session_state:
     st.session_state.conversational_agent = ConversationalAgent()
@@ -88,11 +121,14 @@ with col1:
                 </div>
                 """, unsafe_allow_html=True)
             else:
-                st.markdown(f"""
-                <div class="conversation-bubble">
-                    <strong>Assistant:</strong> {message["content"]}
-                </div>
-                """, unsafe_allow_html=True)
+                if message["content"]:
+                    st.markdown(f"""
+                    <div class="conversation-bubble">
+                        <strong>Assistant:</strong> {message["content"]}
+                    </div>
+                    """, unsafe_allow_html=True)
+                if message.get("error"):
+                    st.error(f"❌ {message['error']}")
                 # Display suggested actions if available
                 if "suggested_actions" in message and message["suggested_actions"]:
                     st.write("**Suggested actions:**")
@@ -122,30 +158,35 @@ with col1:
             "content": user_input
         })
         
-        # Generate response
-        with st.spinner("🤔 Thinking..."):
-            # Build context
-            pdf_context = None
-            if st.session_state.uploaded_pdfs:
-                pdf_names = [pdf['filename'] for pdf in st.session_state.uploaded_pdfs]
-                pdf_context = f"Available PDFs: {', '.join(pdf_names)}"
-            
-            graph_context = "Neo4j graph database for storing PDF documents and their content"
-            
-            # Get response from conversational agent
-            response = st.session_state.conversational_agent.generate_response(
-                user_input, pdf_context, graph_context
-            )
-            
-            # Add assistant response to chat
-            st.session_state.current_chat.append({
-                "role": "assistant",
-                "content": response["content"],
-                "suggested_actions": response.get("suggested_actions", [])
-            })
-            
-            # Rerun to display the new messages
-            st.rerun()
+        # Build context
+        pdf_context = None
+        if st.session_state.uploaded_pdfs:
+            pdf_names = [pdf['filename'] for pdf in st.session_state.uploaded_pdfs]
+            pdf_context = f"Available PDFs: {', '.join(pdf_names)}"
+        
+        graph_context = "Neo4j graph database for storing PDF documents and their content"
+        
+        # Stream the response from the conversational agent as it is generated
+        agent = st.session_state.conversational_agent
+        with chat_container:
+            placeholder = st.empty()
+            placeholder.markdown("🤔 Thinking...")
+            streamed = ""
+            for token in agent.generate_response_stream(user_input, pdf_context, graph_context):
+                streamed += token
+                placeholder.markdown(f"**Assistant:** {streamed}▌")
+        response = agent.last_response
+        
+        # Add assistant response to chat
+        st.session_state.current_chat.append({
+            "role": "assistant",
+            "content": response["content"],
+            "error": response.get("error"),
+            "suggested_actions": response.get("suggested_actions", [])
+        })
+        
+        # Rerun to display the new messages
+        st.rerun()
 
 with col2:
     st.header("📚 PDF Management")
@@ -160,21 +201,27 @@ with col2:
     
     if uploaded_file is not None:
         if st.button("🔍 Process & Store PDF"):
-            with st.spinner("Processing PDF..."):
+            with st.spinner("Processing PDF..."), span("app.upload"):
                 # Process the PDF
-                pdf_data = st.session_state.pdf_processor.extract_text_from_pdf(uploaded_file)
+                pdf_data = st.session_state.pdf_processor.extract_text_from_pdf(uploaded_file, include_tables=True)
                 
                 if pdf_data:
                     # Extract key information
                     pdf_data['key_info'] = st.session_state.pdf_processor.extract_key_information(
-                        pdf_data['extracted_text']
+                        pdf_data['text_content'], document_id=pdf_data['content_hash']
                     )
                     
                     # Save to Neo4j
                     try:
-                        save_pdf_document_to_neo4j(pdf_data)
+                        result = save_pdf_document_to_neo4j(pdf_data)
                         st.session_state.uploaded_pdfs.append(pdf_data)
-                        st.success(f"✅ PDF '{pdf_data['filename']}' processed and stored successfully!")
+                        if result['status'] == 'unchanged':
+                            st.info(f"ℹ️ PDF '{pdf_data['filename']}' is already stored and unchanged.")
+                        elif result['status'] == 'duplicate':
+                            st.info(f"ℹ️ PDF '{pdf_data['filename']}' is identical to '{result['filename']}', which is already stored.")
+                        else:
+                            st.success(f"✅ PDF '{pdf_data['filename']}' processed and stored successfully! "
+                                       f"({result['pages_written']} page(s) written)")
                         
                         # Add to conversation
                         st.session_state.conversational_agent.add_message(
@@ -210,6 +257,10 @@ with col2:
     if st.button("📊 View Chat Summary"):
         summary = st.session_state.conversational_agent.get_conversation_summary()
         st.text_area("Chat Summary", summary, height=200)
+    
+    # Diagnostics
+    with st.expander("🩺 Diagnostics"):
+        show_diagnostics(get_tracer())
 
 # Footer
 st.markdown("---")
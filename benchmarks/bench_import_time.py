@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Cold-start import budget check for the ingest CLI and the app's modules.
+
+Each target is imported in a fresh interpreter several times and the best
+time is compared against its budget. The script also verifies that heavy
+dependencies (neo4j driver, OpenAI SDK, PDF parsers, Streamlit) are not
+pulled in by the import itself. Exits non-zero when a budget is exceeded.
+
+Usage:
+    python -m benchmarks.bench_import_time --repeat 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# target name -> (modules imported, budget in milliseconds)
+TARGETS = {
+    "ingest_cli": (["ingest"], 100),
+    "app_modules": (["db.neo4j_client", "db.schema", "llm.conversational_agent", "llm.query",
+                     "utils.pdf_processor"], 150),
+}
+
+HEAVY_MODULES = ["neo4j", "openai", "PyPDF2", "pdfplumber", "streamlit"]
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+elapsed = time.perf_counter() - start
+print(json.dumps({{"ms": elapsed * 1000, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(modules, repeat: int) -> dict:
+    best, heavy = None, []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(modules=modules, heavy=HEAVY_MODULES)],
+            cwd=ROOT, check=True, capture_output=True, text=True
+        ).stdout
+        sample = json.loads(output.strip().splitlines()[-1])
+        best = sample["ms"] if best is None else min(best, sample["ms"])
+        heavy = sample["heavy"]
+    return {"ms": round(best, 1), "heavy_imports": heavy}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results, failed = {}, False
+    for name, (modules, budget_ms) in TARGETS.items():
+        result = measure(modules, args.repeat)
+        result["budget_ms"] = budget_ms
+        result["ok"] = result["ms"] <= budget_ms and not result["heavy_imports"]
+        failed = failed or not result["ok"]
+        results[name] = result
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, result in results.items():
+            status = "✅" if result["ok"] else "❌"
+            heavy = f" (imports {', '.join(result['heavy_imports'])})" if result["heavy_imports"] else ""
+            print(f"{status} {name}: {result['ms']:.1f} ms / {result['budget_ms']} ms budget{heavy}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
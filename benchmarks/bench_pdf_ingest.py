@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Compare the batched and row-by-row PDF write paths against a live Neo4j.
+
+Usage:
+    python -m benchmarks.bench_pdf_ingest --pages 400 --topics 200 --phrases 200
+
+Each run writes a synthetic document under a unique filename and removes it
+(together with its pages) afterwards.
+"""
+import argparse
+import time
+import uuid
+
+from db.neo4j_client import (
+    run_query,
+    save_pdf_document_to_neo4j,
+    save_pdf_document_to_neo4j_row_by_row
+)
+
+
+def make_pdf_data(filename: str, pages: int, topics: int, phrases: int, words_per_page: int = 300) -> dict:
+    """Build a pdf_data dict shaped like PDFProcessor output."""
+    text = " ".join(f"word{i % 97}" for i in range(words_per_page))
+    return {
+        'filename': filename,
+        'file_size': pages * len(text),
+        'metadata': {
+            'title': 'Benchmark Document',
+            'author': 'bench',
+            'subject': '',
+            'creator': '',
+            'producer': '',
+            'creation_date': '',
+            'modification_date': '',
+            'page_count': pages
+        },
+        'text_content': [{'page': n + 1, 'text': text} for n in range(pages)],
+        'key_info': {
+            'document_type': 'PDF Document',
+            'main_topics': [f"BENCH TOPIC {n}" for n in range(topics)],
+            'key_phrases': [f"Bench phrase {n}:" for n in range(phrases)],
+            'estimated_word_count': pages * words_per_page,
+            'has_tables': False,
+            'has_numbers': True,
+            'language': 'English'
+        }
+    }
+
+
+def cleanup(filename: str):
+    """Delete the benchmark document, its pages and the topics/key phrases no other document uses."""
+    run_query("""
+    MATCH (d:Document {filename: $filename})
+    OPTIONAL MATCH (d)-[:HAS_TOPIC|HAS_KEY_PHRASE]->(n)
+    WITH d, collect(n) AS linked
+    CALL {
+        WITH d
+        MATCH (d)-[:HAS_CONTENT]->(c:Content)
+        DETACH DELETE c
+    }
+    DETACH DELETE d
+    WITH linked
+    UNWIND linked AS n
+    WITH n
+    WHERE NOT EXISTS { (n)--() }
+    DELETE n
+    """, {"filename": filename})
+
+
+def time_write(write, pdf_data: dict) -> float:
+    start = time.perf_counter()
+    write(pdf_data)
+    elapsed = time.perf_counter() - start
+    cleanup(pdf_data['filename'])
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--topics", type=int, default=200)
+    parser.add_argument("--phrases", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    paths = {
+        "row_by_row": save_pdf_document_to_neo4j_row_by_row,
+        "batched": lambda data: save_pdf_document_to_neo4j(data, batch_size=args.batch_size),
+    }
+
+    for name, write in paths.items():
+        timings = []
+        for _ in range(args.repeat):
+            pdf_data = make_pdf_data(f"bench-{uuid.uuid4().hex}.pdf", args.pages, args.topics, args.phrases)
+            timings.append(time_write(write, pdf_data))
+        best = min(timings)
+        print(f"{name:>10}: best {best:.3f}s  {args.pages / best:,.1f} pages/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Reproducible end-to-end benchmark suite.
+
+Generates synthetic PDFs locally (see benchmarks.synthetic) and measures
+
+    extract   PDFProcessor.extract_text_from_pdf pages/s and MB/s
+    tables    selective table extraction pages/s (candidate pages only)
+    key_info  extract_key_information MB/s
+    write     save_pdf_document_to_neo4j pages/s and statements per document,
+              against an in-process recording driver or, with --neo4j, the
+              database configured in .env; the local search and passage
+              indexes are disabled, so benchmark documents never reach the
+              directories configured there
+    llm       Cypher generation, guarded question answering and chat latency
+              through the gateway with the deterministic fake backend
+
+Results are printed (or written with --output) as JSON. With --baseline the
+run is compared against a stored result and the script exits non-zero when
+a metric regressed by more than --tolerance: rates (_per_s) may not drop,
+latencies (_ms) may not grow by more than that fraction and at least
+--min-delta-ms, and counts (everything else) must match exactly.
+
+Usage:
+    python -m benchmarks.bench_suite --output results.json --baseline benchmarks/baseline.json
+    python -m benchmarks.bench_suite --save-baseline benchmarks/baseline.json
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+
+from benchmarks.fake_graph import RecordingDriver
+from benchmarks.synthetic import make_synthetic_pdf
+
+QUESTIONS = [
+    "Which documents mention brake pads?",
+    "List all documents and their titles",
+    "What is the total price of parts in the tables?",
+    "How many pages does each document have?",
+    "Which topics appear in more than one document?",
+]
+
+
+def best_of(repeat: int, run: Callable[[], object]) -> float:
+    """Fastest wall time of repeat calls, in seconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def percentile(samples: List[float], q: float) -> float:
+    samples = sorted(samples)
+    return samples[min(int(q * len(samples)), len(samples) - 1)] if samples else 0.0
+
+
+def bench_pdf(args, pdf: bytes) -> tuple:
+    """Extraction, table and key information metrics; returns (metrics, pdf_data)."""
+    from utils.key_info import CorpusStats, extract_key_information
+    from utils.pdf_processor import PDFProcessor
+    from utils.tables import table_candidate_pages
+
+    pdf_data = PDFProcessor.extract_text_from_pdf(pdf, include_extracted_text=False)
+    text_bytes = sum(len(page['text']) for page in pdf_data['text_content'])
+
+    extract = best_of(args.repeat, lambda: PDFProcessor.extract_text_from_pdf(pdf, include_extracted_text=False))
+    tables = best_of(args.repeat, lambda: PDFProcessor.extract_tables(pdf, pdf_data['text_content'],
+                                                                       workers=args.table_workers))
+    key_info = best_of(args.repeat, lambda: extract_key_information(pdf_data['text_content'], corpus=CorpusStats()))
+
+    pdf_data['tables'] = PDFProcessor.extract_tables(pdf, pdf_data['text_content'], workers=args.table_workers)
+    pdf_data['key_info'] = extract_key_information(pdf_data['text_content'], corpus=CorpusStats())
+    metrics = {
+        "extract_pages_per_s": args.pages / extract,
+        "extract_mb_per_s": len(pdf) / extract / 1e6,
+        "tables_pages_per_s": args.pages / tables,
+        "tables_found": len(pdf_data['tables']),
+        "table_candidate_pages": len(table_candidate_pages(pdf_data['text_content'])),
+        "key_info_mb_per_s": text_bytes / key_info / 1e6,
+    }
+    return metrics, pdf_data
+
+
+def _cleanup(filename: str):
+    from db.neo4j_client import run_query
+
+    run_query("""
+    MATCH (d:Document {filename: $filename})
+    OPTIONAL MATCH (d)-[:HAS_CONTENT]->(c:Content)
+    OPTIONAL MATCH (c)-[:HAS_TABLE]->(t:Table)
+    OPTIONAL MATCH (t)-[:HAS_ROW]->(r:TableRow)
+    DETACH DELETE d, c, t, r
+    """, {"filename": filename})
+
+
+def bench_write(args, pdf_data: dict, recorder: RecordingDriver) -> Dict[str, float]:
+    from db.neo4j_client import save_pdf_document_to_neo4j
+
+    timings = []
+    for _ in range(args.repeat):
+        document = dict(pdf_data, filename=f"bench-{uuid.uuid4().hex}.pdf", content_hash=None)
+        recorder.reset()
+        started = time.perf_counter()
+        save_pdf_document_to_neo4j(document, batch_size=args.batch_size)
+        timings.append(time.perf_counter() - started)
+        if args.neo4j:
+            _cleanup(document['filename'])
+    metrics = {"write_pages_per_s": args.pages / min(timings)}
+    if not args.neo4j:
+        metrics["write_statements"] = recorder.statements
+        metrics["write_rows"] = recorder.rows
+    return metrics
+
+
+def bench_llm(args) -> Dict[str, float]:
+    from llm.conversational_agent import ConversationalAgent
+    from llm.cypher_cache import CypherCache, set_cypher_cache
+    from llm.gateway import FakeBackend, LLMGateway, set_gateway
+    from llm.memory import ConversationMemory
+    from llm.query import generate_cypher_query, run_cypher_question
+    from llm.schema_prompt import invalidate_prompt_schema
+
+    set_gateway(LLMGateway(backend=FakeBackend(latency_seconds=args.llm_latency)))
+    set_cypher_cache(CypherCache(path=None))
+    invalidate_prompt_schema()
+    questions = QUESTIONS * args.repeat
+
+    def latencies(run) -> List[float]:
+        run(questions[0])  # warm up imports and lazily built state
+        samples = []
+        for question in questions:
+            started = time.perf_counter()
+            run(question)
+            samples.append((time.perf_counter() - started) * 1000)
+        return samples
+
+    uncached = latencies(lambda question: generate_cypher_query(question, use_cache=False))
+    cached = latencies(generate_cypher_query)
+    guarded = latencies(run_cypher_question)
+    agent = ConversationalAgent(memory=ConversationMemory())
+    chat = latencies(agent.generate_response)
+
+    metrics = {}
+    for name, samples in (("llm_cypher", uncached), ("llm_cypher_cached", cached),
+                          ("llm_question", guarded), ("llm_chat", chat)):
+        metrics[f"{name}_p50_ms"] = percentile(samples, 0.5)
+        metrics[f"{name}_p95_ms"] = percentile(samples, 0.95)
+    return metrics
+
+
+@contextmanager
+def isolated_state(driver=None):
+    """
+    Swap the process-wide singletons for benchmark-local ones, restoring them afterwards.
+
+    The local search and passage indexes are disabled and key phrase
+    statistics are kept in memory, so nothing the suite writes ends up in
+    the index directories or statistics file configured in .env.
+
+    Args:
+        driver: Neo4j driver to install (None keeps the configured one)
+    """
+    import utils.search_index as search_index
+    import utils.vector_index as vector_index
+    from db.neo4j_client import set_driver
+    from db.result_cache import ResultCache, set_result_cache
+    from llm.cypher_cache import set_cypher_cache
+    from llm.gateway import set_gateway
+    from utils.key_info import CorpusStats, set_corpus_stats
+
+    index_dirs = search_index.PDF_SEARCH_INDEX_DIR, vector_index.PDF_VECTOR_INDEX_DIR
+    search_index.PDF_SEARCH_INDEX_DIR = vector_index.PDF_VECTOR_INDEX_DIR = None
+    restore = [
+        (search_index.set_search_index, search_index.set_search_index(None)),
+        (vector_index.set_vector_index, vector_index.set_vector_index(None)),
+        (set_corpus_stats, set_corpus_stats(CorpusStats())),
+        (set_result_cache, set_result_cache(ResultCache())),
+        (set_gateway, set_gateway(None)),
+        (set_cypher_cache, set_cypher_cache(None)),
+    ]
+    if driver is not None:
+        restore.append((set_driver, set_driver(driver)))
+    try:
+        yield
+    finally:
+        for setter, previous in reversed(restore):
+            setter(previous)
+        search_index.PDF_SEARCH_INDEX_DIR, vector_index.PDF_VECTOR_INDEX_DIR = index_dirs
+
+
+def run_suite(args) -> dict:
+    pdf = make_synthetic_pdf(args.pages, args.words_per_page, args.table_every, args.table_rows, args.seed)
+    recorder = RecordingDriver()
+    with isolated_state(None if args.neo4j else recorder):
+        metrics, pdf_data = bench_pdf(args, pdf)
+        metrics.update(bench_write(args, pdf_data, recorder))
+        metrics.update(bench_llm(args))
+
+    return {
+        "config": {key: getattr(args, key) for key in
+                   ("pages", "words_per_page", "table_every", "table_rows", "seed", "repeat",
+                    "batch_size", "table_workers", "llm_latency", "neo4j")},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "machine": platform.machine()},
+        "pdf_bytes": len(pdf),
+        "metrics": {name: round(value, 3) for name, value in metrics.items()},
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float, min_delta_ms: float = 1.0) -> List[str]:
+    """
+    Return a line per metric that regressed against the baseline.
+
+    Args:
+        result: Output of run_suite
+        baseline: A stored run_suite result
+        tolerance: Allowed relative change of rates and latencies (a fraction)
+        min_delta_ms: Latency increases smaller than this are treated as noise
+    """
+    regressions = []
+    if result["config"] != baseline.get("config"):
+        regressions.append("config differs from the baseline; numbers are not comparable")
+    for name, old in baseline.get("metrics", {}).items():
+        new = result["metrics"].get(name)
+        if new is None:
+            regressions.append(f"{name}: missing")
+        elif name.endswith("_per_s"):
+            if old and new < old * (1 - tolerance):
+                regressions.append(f"{name}: {old} -> {new} ({(new - old) / old:+.0%})")
+        elif name.endswith("_ms"):
+            if new > old * (1 + tolerance) and new - old >= min_delta_ms:
+                regressions.append(f"{name}: {old} -> {new} ms")
+        elif new != old:
+            regressions.append(f"{name}: {old} -> {new}")
+    return regressions
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=60)
+    parser.add_argument("--words-per-page", type=int, default=300)
+    parser.add_argument("--table-every", type=int, default=10, help="Put a table on every Nth page (0 for none)")
+    parser.add_argument("--table-rows", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=None, help="Rows per UNWIND batch when writing")
+    parser.add_argument("--table-workers", type=int, default=1)
+    parser.add_argument("--llm-latency", type=float, default=0.0,
+                        help="Simulated seconds per fake LLM call (0 measures only our own overhead)")
+    parser.add_argument("--neo4j", action="store_true", help="Write to the configured Neo4j instead of the fake")
+    parser.add_argument("--output", help="Write the JSON result to this file")
+    parser.add_argument("--baseline", help="Compare against this stored result")
+    parser.add_argument("--save-baseline", help="Write the result as the new baseline to this file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed regression as a fraction")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="Latency increases below this are noise")
+    args = parser.parse_args(argv)
+
+    result = run_suite(args)
+    text = json.dumps(result, indent=2)
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    if not args.output:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(result, json.load(f), args.tolerance, args.min_delta_ms)
+        for line in regressions:
+            print(f"❌ {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"✅ No metric regressed by more than {args.tolerance:.0%}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
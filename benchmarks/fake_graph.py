@@ -0,0 +1,96 @@
+"""
+In-process stand-in for the Neo4j driver, for benchmarks without a database.
+
+RecordingDriver accepts the calls db.neo4j_client and db.cypher_guard make
+(sessions, run, execute_read / execute_write, EXPLAIN summaries) and records
+every statement and the number of parameter rows it carried. Queries return
+no rows unless a responder is given, so write paths behave as if the graph
+were empty. Install it with db.neo4j_client.set_driver.
+"""
+import threading
+from typing import Callable, Dict, List, Optional
+
+
+class _Record(dict):
+    def data(self) -> dict:
+        return dict(self)
+
+
+class _Summary:
+    query_type = "r"
+    plan = None
+
+
+class _Result(list):
+    def single(self):
+        return self[0] if self else None
+
+    def value(self, key=0):
+        return [record[key] for record in self]
+
+    def data(self) -> List[dict]:
+        return [dict(record) for record in self]
+
+    def consume(self) -> _Summary:
+        return _Summary()
+
+
+class _Transaction:
+    def __init__(self, driver: "RecordingDriver"):
+        self._driver = driver
+
+    def run(self, query: str, parameters: dict = None, **kwargs) -> _Result:
+        parameters = parameters or kwargs
+        self._driver._record(query, parameters)
+        return _Result(_Record(row) for row in self._driver.responder(query, parameters))
+
+
+class _Session(_Transaction):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def close(self):
+        pass
+
+    def execute_write(self, work, *args, **kwargs):
+        return work(_Transaction(self._driver), *args, **kwargs)
+
+    def execute_read(self, work, *args, **kwargs):
+        return work(_Transaction(self._driver), *args, **kwargs)
+
+
+class RecordingDriver:
+    """Driver double that records statements instead of sending them."""
+
+    def __init__(self, responder: Optional[Callable[[str, dict], List[dict]]] = None):
+        """
+        Args:
+            responder: responder(query, parameters) -> rows; defaults to no rows
+        """
+        self.responder = responder or (lambda query, parameters: [])
+        self.statements = 0
+        self.rows = 0  # items in list parameters, i.e. rows expanded by UNWIND
+        self._lock = threading.Lock()
+
+    def _record(self, query: str, parameters: Dict):
+        rows = sum(len(value) for value in parameters.values() if isinstance(value, list))
+        with self._lock:
+            self.statements += 1
+            self.rows += rows
+
+    def reset(self):
+        with self._lock:
+            self.statements = 0
+            self.rows = 0
+
+    def session(self, **kwargs) -> _Session:
+        return _Session(self)
+
+    def verify_connectivity(self):
+        pass
+
+    def close(self):
+        pass
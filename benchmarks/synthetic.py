@@ -0,0 +1,103 @@
+"""
+Deterministic synthetic PDFs for benchmarks.
+
+make_synthetic_pdf writes a small, valid PDF from scratch (no PDF library
+needed) with a controlled number of pages, words per page and ruled tables,
+so extraction, key information and table benchmarks can run anywhere and
+produce comparable numbers. The same seed always yields the same bytes.
+"""
+import random
+from typing import List
+
+WORDS = ("engine brake clutch torque warranty service interval pressure valve chain sprocket "
+         "suspension fuel tank filter assembly bearing gasket coolant battery frame wheel "
+         "the the of of and to in is for with on be").split()
+PARTS = ["Brake pads", "Disc rotor", "Chain", "Sprocket", "Clutch cable", "Air filter", "Spark plug",
+         "Fork seal", "Battery", "Coolant", "Gasket set", "Bearing kit"]
+
+_FONT_SIZE = 10
+_LEADING = 12
+_WORDS_PER_LINE = 12
+_TOP = 750
+_LEFT = 50
+_TABLE_COLUMNS = [50, 200, 290, 390, 490]  # x of each column border
+_ROW_HEIGHT = 16
+
+
+def _text(x: float, y: float, text: str) -> str:
+    text = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return f"BT /F1 {_FONT_SIZE} Tf {x} {y} Td ({text}) Tj ET"
+
+
+def _table_ops(rng: random.Random, top: float, rows: int, number: int) -> List[str]:
+    """Caption, header, body rows and ruling lines of one table starting at top."""
+    ops = [_text(_LEFT, top, f"Table {number} Parts and prices")]
+    body = [["Part", "Qty", "Price", "Discount"]] + [
+        [rng.choice(PARTS), str(rng.randint(1, 20)), f"${rng.randint(5, 2500):,}.{rng.randint(0, 99):02d}",
+         f"{rng.randint(0, 40)}%"]
+        for _ in range(rows)
+    ]
+    grid_top = top - 8
+    for r, row in enumerate(body):
+        baseline = grid_top - (r + 1) * _ROW_HEIGHT + 4
+        ops.extend(_text(x + 4, baseline, cell) for x, cell in zip(_TABLE_COLUMNS, row))
+    bottom = grid_top - len(body) * _ROW_HEIGHT
+    for r in range(len(body) + 1):
+        y = grid_top - r * _ROW_HEIGHT
+        ops.append(f"{_TABLE_COLUMNS[0]} {y} m {_TABLE_COLUMNS[-1]} {y} l S")
+    ops.extend(f"{x} {grid_top} m {x} {bottom} l S" for x in _TABLE_COLUMNS)
+    return ops
+
+
+def _page_stream(rng: random.Random, page: int, words: int, table_rows: int) -> str:
+    ops = [_text(_LEFT, _TOP, f"SECTION {page}")]
+    y = _TOP - 2 * _LEADING
+    if table_rows:
+        ops.extend(_table_ops(rng, y, table_rows, page))
+        y -= 8 + (table_rows + 2) * _ROW_HEIGHT
+    while words > 0 and y > 40:
+        count = min(words, _WORDS_PER_LINE)
+        ops.append(_text(_LEFT, y, " ".join(rng.choice(WORDS) for _ in range(count))))
+        words -= count
+        y -= _LEADING
+    return "\n".join(ops) + "\n"
+
+
+def make_synthetic_pdf(pages: int = 50, words_per_page: int = 300, table_every: int = 10,
+                       table_rows: int = 8, seed: int = 0) -> bytes:
+    """
+    Build a synthetic PDF.
+
+    Args:
+        pages: Number of pages
+        words_per_page: Words of body text per page (capped by what fits, about 600)
+        table_every: Put a ruled table on every Nth page (0 for none)
+        table_rows: Data rows per table
+        seed: Random seed for the page text and table values
+
+    Returns:
+        The PDF file as bytes
+    """
+    rng = random.Random(seed)
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in range(1, pages + 1):
+        rows = table_rows if table_every and page % table_every == 0 else 0
+        stream = _page_stream(rng, page, words_per_page, rows).encode("latin-1")
+        kids.append(f"{len(objects) + 1} 0 R")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects) + 2} 0 R >>".encode())
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"endstream")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
@@ -0,0 +1,236 @@
+"""
+Async variant of the db.neo4j_client API built on AsyncGraphDatabase.
+
+Lets ingest workers and UI queries overlap on one event loop instead of each
+blocking a thread on its own session. Queries and write logic are shared with
+the sync client, so both produce identical graphs.
+
+Example:
+    async with AsyncNeo4jClient(max_concurrency=16) as client:
+        results = await client.save_pdf_documents(documents)
+        hits = await client.search_pdf_content("warranty")
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from db.neo4j_client import (
+    NEO4J_DATABASE,
+    NEO4J_FETCH_SIZE,
+    NEO4J_PASSWORD,
+    NEO4J_URI,
+    NEO4J_USER,
+    NEO4J_WRITE_BATCH_SIZE,
+    PDF_DOCUMENTS_QUERY,
+    PRODUCT_QUERY,
+    SEARCH_CONTENT_QUERY,
+    _WRITE_CLAUSE_RE,
+    _documents_page,
+    _list_documents_params,
+    _pdf_document_statements,
+    _pdf_documents_query,
+    _product_params,
+    _rows_sent,
+    _search_page,
+    _search_params,
+    _to_columns,
+    _update_local_indexes,
+    driver_config,
+    invalidate_result_cache,
+    require_password
+)
+from utils.tracing import span
+
+# Default cap on in-flight operations started by the fan-out helpers
+NEO4J_ASYNC_MAX_CONCURRENCY = 32
+
+
+async def _run_statements_async(tx, statements):
+    """Drive a statement generator inside an async transaction and return its result."""
+    try:
+        query, params = next(statements)
+        while True:
+            with span("neo4j.statement", rows_sent=_rows_sent(params)) as trace:
+                result = await tx.run(query, params)
+                rows = await result.data()
+                trace.add(rows=len(rows))
+            query, params = statements.send(rows)
+    except StopIteration as stop:
+        return stop.value
+
+
+class AsyncNeo4jClient:
+    """Async Neo4j client with a tunable connection pool and bounded fan-out."""
+
+    def __init__(self, uri: str = NEO4J_URI, user: str = NEO4J_USER, password: str = NEO4J_PASSWORD,
+                 database: str = NEO4J_DATABASE, max_connection_pool_size: Optional[int] = None,
+                 connection_acquisition_timeout: Optional[float] = None, fetch_size: Optional[int] = None,
+                 max_concurrency: int = NEO4J_ASYNC_MAX_CONCURRENCY):
+        """
+        Args:
+            uri, user, password, database: Connection settings (default to db.neo4j_client's)
+            max_connection_pool_size: Maximum open connections (NEO4J_MAX_CONNECTION_POOL_SIZE)
+            connection_acquisition_timeout: Seconds to wait for a free connection
+                (NEO4J_CONNECTION_ACQUISITION_TIMEOUT)
+            fetch_size: Records pulled per batch from the server (NEO4J_FETCH_SIZE)
+            max_concurrency: Default limit for the fan-out helpers
+        """
+        from neo4j import AsyncGraphDatabase
+
+        self.database = database
+        self.max_concurrency = max_concurrency
+        self.fetch_size = fetch_size or NEO4J_FETCH_SIZE
+        self.driver = AsyncGraphDatabase.driver(uri, auth=(user, require_password(password)), **driver_config(
+            max_connection_pool_size=max_connection_pool_size,
+            connection_acquisition_timeout=connection_acquisition_timeout,
+            fetch_size=fetch_size
+        ))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        await self.driver.close()
+
+    def _session_config(self, fetch_size: Optional[int], limit: Optional[int]) -> dict:
+        """Session options for a streamed read; never fetches more records per round trip than limit."""
+        fetch_size = fetch_size or self.fetch_size
+        if limit is not None and limit > 0:
+            fetch_size = min(fetch_size, limit)
+        return {"fetch_size": fetch_size}
+
+    async def _fetch(self, query: str, parameters: dict = None) -> List[Dict[str, Any]]:
+        with span("neo4j.read") as trace:
+            async with self.driver.session(database=self.database) as session:
+                result = await session.run(query, parameters or {})
+                rows = await result.data()
+            trace.add(rows=len(rows))
+            return rows
+
+    async def save_product(self, product: dict):
+        """Insert or update a product node in the Neo4j graph."""
+        with span("neo4j.write", rows_sent=1):
+            async with self.driver.session(database=self.database) as session:
+                result = await session.run(PRODUCT_QUERY, _product_params(product))
+                await result.consume()
+        invalidate_result_cache()
+
+    async def save_pdf_document(self, pdf_data: dict, batch_size: int = None) -> dict:
+        """
+        Async counterpart of save_pdf_document_to_neo4j; returns the same summary.
+
+        Written documents are mirrored into the local search and passage
+        indexes like the sync path, in a worker thread so tokenizing and
+        embedding do not block the event loop.
+        """
+        batch_size = batch_size or NEO4J_WRITE_BATCH_SIZE
+        if batch_size < 1:
+            raise ValueError("batch_size must be a positive integer")
+
+        async def write(tx):
+            return await _run_statements_async(tx, _pdf_document_statements(pdf_data, batch_size))
+
+        with span("neo4j.save_document", pages=len(pdf_data['text_content'])):
+            async with self.driver.session(database=self.database) as session:
+                result = await session.execute_write(write)
+        if result['status'] != 'unchanged':
+            invalidate_result_cache()
+        if result['status'] == 'written':
+            await asyncio.to_thread(_update_local_indexes, pdf_data, result['filename'])
+        return result
+
+    async def get_pdf_documents(self) -> List[Dict[str, Any]]:
+        """Retrieve all PDF documents from the database."""
+        return await self._fetch(PDF_DOCUMENTS_QUERY)
+
+    async def list_pdf_documents(self, page_size: int = 50, cursor: dict = None, max_tags: int = None,
+                                 include_counts: bool = False) -> dict:
+        """Async counterpart of list_pdf_documents (keyset-paginated listing)."""
+        query = _pdf_documents_query(paginated=True, max_tags=max_tags, include_counts=include_counts)
+        rows = await self._fetch(query, _list_documents_params(page_size, cursor, max_tags))
+        return _documents_page(rows, page_size)
+
+    async def search_pdf_content(self, search_term: str, limit: int = 20, cursor: dict = None,
+                                 window: int = 80, max_snippets: int = 3, max_hits: int = 20) -> dict:
+        """Full-text search returning ranked pages with snippets (see neo4j_client.search_pdf_content)."""
+        params = _search_params(search_term, limit, cursor, window, max_snippets, max_hits)
+        if params is None:
+            return {"results": [], "next_cursor": None}
+        return _search_page(await self._fetch(SEARCH_CONTENT_QUERY, params), limit)
+
+    async def run_query(self, cypher_query: str, parameters: dict = None) -> List[Dict[str, Any]]:
+        """
+        Run a Cypher query and return the results as a list of dictionaries.
+
+        Queries that look like writes invalidate the result cache of the
+        sync API, as neo4j_client.run_query does.
+        """
+        if not _WRITE_CLAUSE_RE.search(cypher_query):
+            return await self._fetch(cypher_query, parameters)
+        with span("neo4j.write", rows_sent=_rows_sent(parameters)) as trace:
+            async with self.driver.session(database=self.database) as session:
+                result = await session.run(cypher_query, parameters or {})
+                rows = await result.data()
+            trace.add(rows=len(rows))
+        invalidate_result_cache()
+        return rows
+
+    async def stream_query(self, cypher_query: str, parameters: dict = None, fetch_size: int = None,
+                           limit: int = None):
+        """Async generator yielding records lazily as dictionaries (see neo4j_client.stream_query)."""
+        if limit is not None and limit <= 0:
+            return
+        session_config = self._session_config(fetch_size, limit)
+        async with self.driver.session(database=self.database, **session_config) as session:
+            result = await session.run(cypher_query, parameters or {})
+            count = 0
+            async for record in result:
+                count += 1
+                yield record.data()
+                if limit is not None and count >= limit:
+                    await result.consume()
+                    break
+
+    async def run_query_columnar(self, cypher_query: str, parameters: dict = None, fetch_size: int = None,
+                                 limit: int = None, numpy_arrays: bool = True) -> dict:
+        """Run a query and return {column: values}, with NumPy arrays for numeric columns."""
+        session_config = self._session_config(fetch_size, limit)
+        async with self.driver.session(database=self.database, **session_config) as session:
+            result = await session.run(cypher_query, parameters or {})
+            keys = result.keys()
+            rows = []
+            if limit is None or limit > 0:
+                async for record in result:
+                    rows.append(record.values())
+                    if limit is not None and len(rows) >= limit:
+                        break
+            await result.consume()
+            return _to_columns(keys, rows, numpy_arrays)
+
+    async def fan_out(self, func: Callable[[Any], Awaitable[Any]], items: Iterable[Any],
+                      concurrency: Optional[int] = None, return_exceptions: bool = False) -> List[Any]:
+        """
+        Apply an async function to every item with at most `concurrency` in flight.
+
+        Results are returned in input order. With return_exceptions, failures
+        are returned in place of results instead of cancelling the batch.
+        """
+        semaphore = asyncio.Semaphore(concurrency or self.max_concurrency)
+
+        async def limited(item):
+            async with semaphore:
+                return await func(item)
+
+        return await asyncio.gather(*(limited(item) for item in items), return_exceptions=return_exceptions)
+
+    async def save_pdf_documents(self, documents: Iterable[dict], concurrency: Optional[int] = None,
+                                 batch_size: int = None) -> List[Any]:
+        """Write many documents concurrently; failed documents yield their exception."""
+        return await self.fan_out(lambda pdf_data: self.save_pdf_document(pdf_data, batch_size),
+                                  documents, concurrency, return_exceptions=True)
+
+    async def run_queries(self, queries: Iterable[tuple], concurrency: Optional[int] = None) -> List[Any]:
+        """Run (cypher_query, parameters) pairs concurrently, returning each result list in order."""
+        return await self.fan_out(lambda query: self.run_query(*query), queries, concurrency)
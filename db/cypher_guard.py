@@ -0,0 +1,204 @@
+"""
+Safety checks for LLM-generated Cypher before it reaches the database.
+
+check_cypher runs a query text through
+
+    1. clean-up      strip code fences and a trailing semicolon, reject multiple statements
+    2. write check   reject write clauses (and any plan the server reports as writing)
+    3. LIMIT         clamp a trailing literal LIMIT or add one (CYPHER_GUARD_MAX_ROWS)
+    4. EXPLAIN       reject plans where any operator estimates more than
+                     CYPHER_GUARD_MAX_ESTIMATED_ROWS rows
+
+and caches the verdict per query text for CYPHER_GUARD_CACHE_TTL_SECONDS,
+so a repeated question costs no extra round trip while plan estimates still
+follow the graph as it grows. run_guarded_query executes an accepted query in a read
+transaction with a server-side timeout (CYPHER_GUARD_TIMEOUT_SECONDS).
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from db.neo4j_client import NEO4J_DATABASE, _WRITE_CLAUSE_RE, get_driver
+from db.result_cache import get_result_cache
+from utils.tracing import span
+
+CYPHER_GUARD_MAX_ROWS = int(os.getenv("CYPHER_GUARD_MAX_ROWS", "1000"))
+CYPHER_GUARD_MAX_ESTIMATED_ROWS = float(os.getenv("CYPHER_GUARD_MAX_ESTIMATED_ROWS", "1000000"))
+CYPHER_GUARD_TIMEOUT_SECONDS = float(os.getenv("CYPHER_GUARD_TIMEOUT_SECONDS", "10"))
+CYPHER_GUARD_CACHE_SIZE = int(os.getenv("CYPHER_GUARD_CACHE_SIZE", "512"))
+CYPHER_GUARD_CACHE_TTL_SECONDS = float(os.getenv("CYPHER_GUARD_CACHE_TTL_SECONDS", "300"))
+
+_FENCE_RE = re.compile(r"^\s*```(?:cypher)?\s*|\s*```\s*$", re.IGNORECASE)
+_TRAILING_LIMIT_RE = re.compile(r"\bLIMIT\s+(\S+)\s*$", re.IGNORECASE)
+_UNION_RE = re.compile(r"\bUNION\b", re.IGNORECASE)
+_STRING_LITERAL_RE = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+# Standalone procedure calls and SHOW commands accept neither a trailing LIMIT nor a CALL { } wrapper
+_STANDALONE_RE = re.compile(r"^\s*(?:CALL\s+[\w.`]+\s*\(|SHOW\b)", re.IGNORECASE)
+_RETURN_RE = re.compile(r"\bRETURN\b", re.IGNORECASE)
+
+
+class CypherGuardError(ValueError):
+    """Raised when a query is rejected; the message says why."""
+
+
+def _clean(query: str) -> str:
+    query = _FENCE_RE.sub("", query).strip().rstrip(";").strip()
+    if not query:
+        raise CypherGuardError("Empty query")
+    if ";" in _STRING_LITERAL_RE.sub("''", query):
+        raise CypherGuardError("Only a single statement is allowed")
+    return query
+
+
+def apply_limit(query: str, max_rows: int = CYPHER_GUARD_MAX_ROWS) -> str:
+    """
+    Clamp a trailing literal LIMIT to max_rows, or bound the result to max_rows rows.
+
+    Standalone procedure calls and SHOW commands (without a RETURN) are left
+    unchanged; they return schema-sized results and only the guard's
+    timeout applies to them.
+    """
+    if _STANDALONE_RE.match(query) and not _RETURN_RE.search(_STRING_LITERAL_RE.sub("''", query)):
+        return query
+    if not _UNION_RE.search(query):
+        match = _TRAILING_LIMIT_RE.search(query)
+        if match is None:
+            return f"{query}\nLIMIT {max_rows}"
+        if match.group(1).isdigit():
+            return query if int(match.group(1)) <= max_rows else query[:match.start(1)] + str(max_rows)
+    # A UNION or a parameterised LIMIT can't take another LIMIT directly
+    return f"CALL {{\n{query}\n}}\nRETURN *\nLIMIT {max_rows}"
+
+
+def _max_estimated_rows(plan: Optional[dict]) -> float:
+    if not plan:
+        return 0.0
+    args = plan.get("args") or plan.get("arguments") or {}
+    children = plan.get("children") or []
+    return max([float(args.get("EstimatedRows", 0.0))] + [_max_estimated_rows(child) for child in children])
+
+
+class CypherGuard:
+    """Validates and bounds read-only Cypher, caching verdicts per query text."""
+
+    def __init__(self, max_rows: int = CYPHER_GUARD_MAX_ROWS,
+                 max_estimated_rows: float = CYPHER_GUARD_MAX_ESTIMATED_ROWS,
+                 timeout: float = CYPHER_GUARD_TIMEOUT_SECONDS, cache_size: int = CYPHER_GUARD_CACHE_SIZE,
+                 cache_ttl: float = CYPHER_GUARD_CACHE_TTL_SECONDS):
+        """
+        Args:
+            max_rows: Maximum rows a query may return (enforced with LIMIT)
+            max_estimated_rows: Largest planner row estimate allowed for any operator
+            timeout: Server-side transaction timeout in seconds
+            cache_size: Verdicts remembered
+            cache_ttl: Seconds a verdict is reused before the query is checked again
+        """
+        self.max_rows = max_rows
+        self.max_estimated_rows = max_estimated_rows
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._lock = threading.Lock()
+        self._verdicts: "OrderedDict[str, tuple]" = OrderedDict()  # query -> (verdict, checked)
+
+    def _explain(self, query: str, parameters: dict) -> dict:
+        from neo4j.exceptions import ClientError
+
+        try:
+            with span("neo4j.explain"), get_driver().session(database=NEO4J_DATABASE) as session:
+                summary = session.run("EXPLAIN " + query, parameters).consume()
+        except ClientError as e:
+            raise CypherGuardError(f"Invalid query: {e.message}") from e
+        if summary.query_type not in (None, "r"):
+            raise CypherGuardError("Query would modify the database")
+        estimated = _max_estimated_rows(summary.plan)
+        if estimated > self.max_estimated_rows:
+            raise CypherGuardError(
+                f"Query plan estimates {estimated:,.0f} rows (limit {self.max_estimated_rows:,.0f})"
+            )
+        return {"query": query, "estimated_rows": estimated}
+
+    def check(self, query: str, parameters: dict = None) -> dict:
+        """
+        Validate a query and return its verdict.
+
+        Returns:
+            Dictionary with the bounded 'query' to run and the plan's largest
+            'estimated_rows'
+
+        Raises:
+            CypherGuardError: When the query is rejected (cached like accepted ones)
+        """
+        verdict = None
+        with self._lock:
+            entry = self._verdicts.get(query)
+            if entry is not None:
+                if time.monotonic() - entry[1] < self.cache_ttl:
+                    verdict = entry[0]
+                    self._verdicts.move_to_end(query)
+                else:
+                    del self._verdicts[query]
+        if verdict is None:
+            try:
+                cleaned = _clean(query)
+                if _WRITE_CLAUSE_RE.search(_STRING_LITERAL_RE.sub("''", cleaned)):
+                    raise CypherGuardError("Query would modify the database")
+                verdict = self._explain(apply_limit(cleaned, self.max_rows), parameters or {})
+            except CypherGuardError as e:
+                verdict = {"error": str(e)}
+            with self._lock:
+                self._verdicts[query] = (verdict, time.monotonic())
+                while len(self._verdicts) > self.cache_size:
+                    self._verdicts.popitem(last=False)
+        if "error" in verdict:
+            raise CypherGuardError(verdict["error"])
+        return verdict
+
+    def run(self, query: str, parameters: dict = None) -> List[Dict[str, Any]]:
+        """Check a query and run it in a read transaction with the guard's timeout."""
+        from neo4j import unit_of_work
+
+        safe_query = self.check(query, parameters)["query"]
+
+        @unit_of_work(timeout=self.timeout)
+        def read(tx):
+            return [record.data() for record in tx.run(safe_query, parameters or {})]
+
+        def run():
+            with span("neo4j.guarded_read") as trace, get_driver().session(database=NEO4J_DATABASE) as session:
+                rows = session.execute_read(read)
+                trace.add(rows=len(rows))
+                return rows
+
+        return get_result_cache().fetch(safe_query, parameters, run)
+
+    def clear(self):
+        with self._lock:
+            self._verdicts.clear()
+
+
+_guard: Optional[CypherGuard] = None
+_guard_lock = threading.Lock()
+
+
+def get_cypher_guard() -> CypherGuard:
+    """Return the process-wide guard."""
+    global _guard
+    if _guard is None:
+        with _guard_lock:
+            if _guard is None:
+                _guard = CypherGuard()
+    return _guard
+
+
+def check_cypher(query: str, parameters: dict = None) -> dict:
+    """Validate a query with the process-wide guard (see CypherGuard.check)."""
+    return get_cypher_guard().check(query, parameters)
+
+
+def run_guarded_query(query: str, parameters: dict = None) -> List[Dict[str, Any]]:
+    """Validate and run a query with the process-wide guard (see CypherGuard.run)."""
+    return get_cypher_guard().run(query, parameters)
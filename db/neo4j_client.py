@@ -1,111 +1,172 @@
-def save_pdf_as_product(pdf_data: dict):
-    """
-    Store a PDF file as a Product node in Neo4j using the provided query and params structure.
-    Expects pdf_data to have keys: 'Product Name', 'Brand', 'Price', 'Discount', 'Availability',
-    'Rating', 'Review Count', 'Product URL', 'Category'.
-    """
-    query = """
-    MERGE (p:Product {name: $name})
-    SET p += {
-        brand: $brand,
-        price: $price,
-        discount: $discount,
-        availability: $availability,
-        rating: $rating,
-        review_count: $review_count,
-        url: $url,
-        category: $category
-    }
-    """
-    params = {
-        "name": pdf_data.get("Product Name", ""),
-        "brand": pdf_data.get("Brand", ""),
-        "price": pdf_data.get("Price", ""),
-        "discount": pdf_data.get("Discount", ""),
-        "availability": pdf_data.get("Availability", ""),
-        "rating": pdf_data.get("Rating", ""),
-        "review_count": pdf_data.get("Review Count", ""),
-        "url": pdf_data.get("Product URL", ""),
-        "category": pdf_data.get("Category", "")
-    }
-    with driver.session(database=NEO4J_DATABASE) as session:
-        session.run(query, params)
-from neo4j import GraphDatabase, Driver
 from dotenv import load_dotenv
 import os
+import hashlib
+import itertools
+import logging
+import threading
+import re
 from datetime import datetime
+from typing import Optional
 
-load_dotenv()  # Load credentials from .env
+load_dotenv()  # Load credentials from .env, before the modules below read their settings
 
-NEO4J_URI="neo4j+ssc://99ac5f56.databases.neo4j.io"
-NEO4J_USER="neo4j"
-NEO4J_PASSWORD="2OOPeeZBMU_ZcaJSB7iyRSvcvuRo1rENZG1mZLtxgxY"
-NEO4J_DATABASE="neo4j"
+from db.result_cache import get_result_cache
+from db.schema import CONTENT_FULLTEXT_INDEX
+from utils.tracing import span
 
-driver: Driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+logger = logging.getLogger(__name__)
 
+NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
+NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
+NEO4J_DATABASE = os.getenv("NEO4J_DATABASE", "neo4j")
+NEO4J_WRITE_BATCH_SIZE = int(os.getenv("NEO4J_WRITE_BATCH_SIZE", "500"))
 
-def save_product_to_neo4j(product: dict):
-    """Insert or update a product node in the Neo4j graph."""
-    query = """
-    MERGE (p:Product {name: $name})
-    SET p += {
-        brand: $brand,
-        price: $price,
-        discount: $discount,
-        availability: $availability,
-        rating: $rating,
-        review_count: $review_count,
-        url: $url,
-        category: $category
+# Connection pool tuning, shared by the sync and async drivers
+NEO4J_MAX_CONNECTION_POOL_SIZE = int(os.getenv("NEO4J_MAX_CONNECTION_POOL_SIZE", "100"))
+NEO4J_CONNECTION_ACQUISITION_TIMEOUT = float(os.getenv("NEO4J_CONNECTION_ACQUISITION_TIMEOUT", "60"))
+NEO4J_FETCH_SIZE = int(os.getenv("NEO4J_FETCH_SIZE", "1000"))
+
+
+def driver_config(**overrides) -> dict:
+    """Keyword arguments for GraphDatabase.driver / AsyncGraphDatabase.driver."""
+    config = {
+        "max_connection_pool_size": NEO4J_MAX_CONNECTION_POOL_SIZE,
+        "connection_acquisition_timeout": NEO4J_CONNECTION_ACQUISITION_TIMEOUT,
+        "fetch_size": NEO4J_FETCH_SIZE,
     }
+    config.update({key: value for key, value in overrides.items() if value is not None})
+    return config
+
+
+def require_password(password: str = None) -> str:
     """
-    params = {
-        "name": product["Product Name"],
-        "brand": product.get("Brand", ""),
-        "price": product.get("Price", ""),
-        "discount": product.get("Discount", ""),
-        "availability": product.get("Availability", ""),
-        "rating": product.get("Rating", ""),
-        "review_count": product.get("Review Count", ""),
-        "url": product.get("Product URL", ""),
-        "category": product.get("Category", "")
-    }
+    Return the Neo4j password to connect with.
+
+    Raises:
+        ValueError: When neither password nor NEO4J_PASSWORD is set
+    """
+    password = password or NEO4J_PASSWORD
+    if not password:
+        raise ValueError("NEO4J_PASSWORD is not set; add it to .env or the environment (see env.example)")
+    return password
+
 
-    with driver.session(database=NEO4J_DATABASE) as session:
-        session.run(query, params)
+_driver = None
+_driver_lock = threading.Lock()
 
 
-def save_pdf_document_to_neo4j(pdf_data: dict):
+def get_driver():
     """
-    Save PDF document and its extracted content to Neo4j database.
-    
-    Args:
-        pdf_data: Dictionary containing PDF metadata and extracted content
+    Return the process-wide Neo4j driver, creating it on first use.
+
+    The neo4j package is imported and the driver built only when a query is
+    actually run, so importing this module is cheap and works offline.
     """
-    # Create PDF Document node
-    doc_query = """
-    MERGE (d:Document {filename: $filename})
-    SET d += {
-        title: $title,
-        author: $author,
-        subject: $subject,
-        creator: $creator,
-        producer: $producer,
-        creation_date: $creation_date,
-        modification_date: $modification_date,
-        page_count: $page_count,
-        file_size: $file_size,
-        upload_timestamp: $upload_timestamp,
-        document_type: $document_type,
-        estimated_word_count: $estimated_word_count,
-        has_tables: $has_tables,
-        has_numbers: $has_numbers,
-        language: $language
-    }
+    global _driver
+    if _driver is None:
+        with _driver_lock:
+            if _driver is None:
+                from neo4j import GraphDatabase
+                _driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, require_password()), **driver_config())
+    return _driver
+
+
+def set_driver(driver):
+    """Replace the process-wide driver (e.g. with a test double); returns the previous one."""
+    global _driver
+    with _driver_lock:
+        previous, _driver = _driver, driver
+    return previous
+
+
+def close_driver():
+    """Close the process-wide driver if it was created."""
+    previous = set_driver(None)
+    if previous is not None:
+        previous.close()
+
+
+def __getattr__(name):
+    # Backwards compatibility for code that used the module-level `driver`
+    if name == "driver":
+        return get_driver()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def invalidate_result_cache():
+    """Record that the graph changed, so cached read results are fetched again."""
+    get_result_cache().bump()
+
+
+def _rows_sent(params: dict) -> int:
+    """Number of items in list parameters, i.e. rows expanded server-side by UNWIND."""
+    return sum(len(value) for value in (params or {}).values() if isinstance(value, list))
+
+
+def _read(query: str, params: dict = None) -> list:
+    """Run a read query through the write-aware result cache (see db.result_cache)."""
+    def run():
+        with span("neo4j.read") as trace, get_driver().session(database=NEO4J_DATABASE) as session:
+            rows = [record.data() for record in session.run(query, params or {})]
+            trace.add(rows=len(rows))
+            return rows
+
+    return get_result_cache().fetch(query, params, run)
+
+
+PRODUCT_QUERY = """
+MERGE (p:Product {name: $name})
+SET p += $properties
+"""
+
+
+def _product_params(product: dict) -> dict:
     """
-    
-    doc_params = {
+    Build the Product node parameters from a scraped product record.
+
+    Price, discount, rating and review count are stored as numbers (see
+    db.product_loader.product_row).
+    """
+    from db.product_loader import product_row
+    return product_row(product)
+
+
+def save_product_to_neo4j(product: dict):
+    """Insert or update a product node in the Neo4j graph."""
+    with span("neo4j.write", rows_sent=1), get_driver().session(database=NEO4J_DATABASE) as session:
+        session.run(PRODUCT_QUERY, _product_params(product))
+    invalidate_result_cache()
+
+
+def save_pdf_as_product(pdf_data: dict):
+    """
+    Store a record as a Product node.
+
+    Expects the keys 'Product Name', 'Brand', 'Price', 'Discount',
+    'Availability', 'Rating', 'Review Count', 'Product URL' and 'Category';
+    kept for callers of the old name, see save_product_to_neo4j.
+    """
+    save_product_to_neo4j(pdf_data)
+
+
+def save_products_to_neo4j(products, batch_size: int = None, workers: int = None) -> dict:
+    """
+    Bulk insert or update product records with batched, parallel UNWIND writes.
+
+    Rows that cannot be converted or are rejected by the database are
+    reported instead of aborting the load (see db.product_loader.load_products).
+
+    Returns:
+        The load report from load_products
+    """
+    from db.product_loader import PRODUCT_LOAD_BATCH_SIZE, PRODUCT_LOAD_WORKERS, load_products
+    return load_products(products, batch_size or PRODUCT_LOAD_BATCH_SIZE, workers or PRODUCT_LOAD_WORKERS)
+
+
+def _document_params(pdf_data: dict) -> dict:
+    """Build the Document node parameters from processed PDF data."""
+    return {
         "filename": pdf_data['filename'],
         "title": pdf_data['metadata']['title'],
         "author": pdf_data['metadata']['author'],
@@ -119,14 +180,389 @@ def save_pdf_document_to_neo4j(pdf_data: dict):
         "upload_timestamp": datetime.now().isoformat(),
         "document_type": pdf_data.get('key_info', {}).get('document_type', 'PDF'),
         "estimated_word_count": pdf_data.get('key_info', {}).get('estimated_word_count', 0),
-        "has_tables": pdf_data.get('key_info', {}).get('has_tables', False),
+        "has_tables": (bool(pdf_data['tables']) if 'tables' in pdf_data
+                       else pdf_data.get('key_info', {}).get('has_tables', False)),
         "has_numbers": pdf_data.get('key_info', {}).get('has_numbers', False),
-        "language": pdf_data.get('key_info', {}).get('language', 'English')
+        "language": pdf_data.get('key_info', {}).get('language', 'English'),
+        "content_hash": pdf_data.get('content_hash'),
+        "content_count": len(pdf_data['text_content']),
+        "topic_count": len(_unique(pdf_data.get('key_info', {}).get('main_topics', []))),
+        "key_phrase_count": len(_unique(pdf_data.get('key_info', {}).get('key_phrases', [])))
     }
-    
-    with driver.session(database=NEO4J_DATABASE) as session:
+
+
+DOCUMENT_QUERY = """
+MERGE (d:Document {filename: $filename})
+SET d += {
+    title: $title,
+    author: $author,
+    subject: $subject,
+    creator: $creator,
+    producer: $producer,
+    creation_date: $creation_date,
+    modification_date: $modification_date,
+    page_count: $page_count,
+    file_size: $file_size,
+    upload_timestamp: $upload_timestamp,
+    document_type: $document_type,
+    estimated_word_count: $estimated_word_count,
+    has_tables: $has_tables,
+    has_numbers: $has_numbers,
+    language: $language,
+    content_hash: $content_hash,
+    content_count: $content_count,
+    topic_count: $topic_count,
+    key_phrase_count: $key_phrase_count
+}
+"""
+
+
+def _batched(items: list, batch_size: int):
+    """Yield successive slices of at most batch_size items."""
+    for start in range(0, len(items), batch_size):
+        yield items[start:start + batch_size]
+
+
+def _unique(values) -> list:
+    """Drop duplicates while keeping first-seen order."""
+    return list(dict.fromkeys(values))
+
+
+def _table_rows(filename: str, tables: list) -> tuple:
+    """Split extracted tables into Table and TableRow parameter rows."""
+    table_rows, row_rows = [], []
+    for table in tables:
+        table_id = f"{filename}#{table['page']}#{table['index']}"
+        table_rows.append({
+            "table_id": table_id,
+            "page_number": table['page'],
+            "table_index": table['index'],
+            "columns": table['columns'],
+            "column_keys": table['keys'],
+            "numeric_columns": table['numeric_columns'],
+            "row_count": len(table['rows'])
+        })
+        row_rows.extend({"table_id": table_id, "row_index": i, "cells": row['cells'], "values": row['values']}
+                        for i, row in enumerate(table['rows']))
+    return table_rows, row_rows
+
+
+def page_content_hash(text: str) -> str:
+    """Hash used to detect changed pages between ingests."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+# Stored document with the same bytes (this filename's own first) and whether this filename is stored at all
+DUPLICATE_DOCUMENT_QUERY = """
+OPTIONAL MATCH (stored:Document {filename: $filename})
+OPTIONAL MATCH (d:Document {content_hash: $content_hash})
+WITH stored, d
+ORDER BY d.filename = $filename DESC
+LIMIT 1
+RETURN stored IS NOT NULL AS stored, d.filename AS filename
+"""
+
+
+def _duplicate_of(rows: list, filename: str):
+    """
+    Stored document that makes writing filename unnecessary, given DUPLICATE_DOCUMENT_QUERY rows.
+
+    Returns filename itself when it is stored with the same bytes, another
+    document's filename when only that one has them and filename is not
+    stored yet, and None when the document has to be written.
+    """
+    if not rows or rows[0]['filename'] is None:
+        return None
+    if rows[0]['filename'] == filename or not rows[0]['stored']:
+        return rows[0]['filename']
+    return None
+
+
+def _pdf_document_statements(pdf_data: dict, batch_size: int):
+    """
+    Generate the statements that write a document and its children.
+
+    Yields (query, parameters) pairs and receives each statement's rows as a
+    list of dicts, so the same logic drives both the sync and async drivers.
+    Returns the write summary.
+
+    Byte-identical files (same content_hash) are skipped, and a file whose
+    bytes match another stored document is recorded as its alias, unless a
+    document is already stored under the file's own name: that one is then
+    rewritten so none of its old pages, topics or phrases linger. For changed files
+    only pages whose hash differs are written, vanished pages are deleted and
+    topic/key phrase links are reconciled against what is already stored.
+    When pdf_data carries 'tables', the tables of every rewritten page are
+    replaced by Table/TableRow nodes linked to its Content node.
+    """
+    filename = pdf_data['filename']
+    key_info = pdf_data.get('key_info', {})
+    content_hash = pdf_data.get('content_hash')
+
+    if content_hash:
+        rows = yield DUPLICATE_DOCUMENT_QUERY, {"content_hash": content_hash, "filename": filename}
+        existing = _duplicate_of(rows, filename)
+        if existing == filename:
+            return {"status": "unchanged", "filename": filename, "pages_written": 0, "pages_deleted": 0}
+        if existing:
+            yield DOCUMENT_ALIAS_QUERY, {"existing": existing, "filename": filename}
+            return {"status": "duplicate", "filename": existing, "pages_written": 0, "pages_deleted": 0}
+
+    yield DOCUMENT_QUERY, _document_params(pdf_data)
+
+    rows = yield """
+    MATCH (c:Content {document_filename: $filename})
+    RETURN c.page_number AS page_number, c.content_hash AS content_hash
+    """, {"filename": filename}
+    stored_pages = {row['page_number']: row['content_hash'] for row in rows}
+
+    pages = []
+    for page_data in pdf_data['text_content']:
+        page_hash = page_content_hash(page_data['text'])
+        if stored_pages.get(page_data['page']) != page_hash:
+            pages.append({"page_number": page_data['page'], "text": page_data['text'], "content_hash": page_hash})
+    removed_pages = sorted(set(stored_pages) - {page_data['page'] for page_data in pdf_data['text_content']})
+
+    for batch in _batched(pages, batch_size):
+        yield """
+        MATCH (d:Document {filename: $filename})
+        UNWIND $pages AS page
+        MERGE (c:Content {page_number: page.page_number, document_filename: $filename})
+        SET c.text = page.text, c.content_hash = page.content_hash
+        MERGE (d)-[:HAS_CONTENT]->(c)
+        """, {"filename": filename, "pages": batch}
+
+    for batch in _batched(removed_pages, batch_size):
+        yield """
+        MATCH (c:Content {document_filename: $filename})
+        WHERE c.page_number IN $page_numbers
+        DETACH DELETE c
+        """, {"filename": filename, "page_numbers": batch}
+
+    written_pages = {page['page_number'] for page in pages}
+    cleared_pages = removed_pages + (sorted(written_pages) if 'tables' in pdf_data else [])
+    for batch in _batched(cleared_pages, batch_size):
+        yield """
+        MATCH (t:Table {document_filename: $filename})
+        WHERE t.page_number IN $page_numbers
+        OPTIONAL MATCH (t)-[:HAS_ROW]->(r:TableRow)
+        DETACH DELETE t, r
+        """, {"filename": filename, "page_numbers": batch}
+
+    tables, table_rows = _table_rows(
+        filename, [table for table in pdf_data.get('tables', []) if table['page'] in written_pages]
+    )
+    for batch in _batched(tables, batch_size):
+        yield """
+        UNWIND $tables AS table
+        MATCH (c:Content {page_number: table.page_number, document_filename: $filename})
+        MERGE (t:Table {table_id: table.table_id})
+        SET t.document_filename = $filename,
+            t.page_number = table.page_number,
+            t.table_index = table.table_index,
+            t.columns = table.columns,
+            t.column_keys = table.column_keys,
+            t.numeric_columns = table.numeric_columns,
+            t.row_count = table.row_count
+        MERGE (c)-[:HAS_TABLE]->(t)
+        """, {"filename": filename, "tables": batch}
+
+    for batch in _batched(table_rows, batch_size):
+        yield """
+        UNWIND $rows AS row
+        MATCH (t:Table {table_id: row.table_id})
+        CREATE (r:TableRow {table_id: row.table_id, row_index: row.row_index, cells: row.cells})
+        SET r += row.values
+        CREATE (t)-[:HAS_ROW]->(r)
+        """, {"rows": batch}
+
+    rows = yield """
+    MATCH (:Document {filename: $filename})-[:HAS_TOPIC]->(t:Topic)
+    RETURN t.name AS name
+    """, {"filename": filename}
+    stored_topics = {row['name'] for row in rows}
+    topics = _unique(key_info.get('main_topics', []))
+
+    for batch in _batched([topic for topic in topics if topic not in stored_topics], batch_size):
+        yield """
+        MATCH (d:Document {filename: $filename})
+        UNWIND $topics AS topic_name
+        MERGE (t:Topic {name: topic_name})
+        MERGE (d)-[:HAS_TOPIC]->(t)
+        """, {"filename": filename, "topics": batch}
+
+    stale_topics = list(stored_topics - set(topics))
+    if stale_topics:
+        yield """
+        MATCH (:Document {filename: $filename})-[r:HAS_TOPIC]->(t:Topic)
+        WHERE t.name IN $topics
+        DELETE r
+        """, {"filename": filename, "topics": stale_topics}
+
+    rows = yield """
+    MATCH (:Document {filename: $filename})-[:HAS_KEY_PHRASE]->(p:KeyPhrase)
+    RETURN p.phrase AS phrase
+    """, {"filename": filename}
+    stored_phrases = {row['phrase'] for row in rows}
+    phrases = _unique(key_info.get('key_phrases', []))
+
+    for batch in _batched([phrase for phrase in phrases if phrase not in stored_phrases], batch_size):
+        yield """
+        MATCH (d:Document {filename: $filename})
+        UNWIND $phrases AS phrase_text
+        MERGE (p:KeyPhrase {phrase: phrase_text})
+        MERGE (d)-[:HAS_KEY_PHRASE]->(p)
+        """, {"filename": filename, "phrases": batch}
+
+    stale_phrases = list(stored_phrases - set(phrases))
+    if stale_phrases:
+        yield """
+        MATCH (:Document {filename: $filename})-[r:HAS_KEY_PHRASE]->(p:KeyPhrase)
+        WHERE p.phrase IN $phrases
+        DELETE r
+        """, {"filename": filename, "phrases": stale_phrases}
+
+    return {"status": "written", "filename": filename, "pages_written": len(pages),
+            "pages_deleted": len(removed_pages), "tables_written": len(tables)}
+
+
+def _run_statements(tx, statements):
+    """Drive a statement generator inside a sync transaction and return its result."""
+    try:
+        query, params = next(statements)
+        while True:
+            with span("neo4j.statement", rows_sent=_rows_sent(params)) as trace:
+                rows = [record.data() for record in tx.run(query, params)]
+                trace.add(rows=len(rows))
+            query, params = statements.send(rows)
+    except StopIteration as stop:
+        return stop.value
+
+
+def _write_pdf_document(tx, pdf_data: dict, batch_size: int) -> dict:
+    """Transaction function writing a document and its children with UNWIND."""
+    return _run_statements(tx, _pdf_document_statements(pdf_data, batch_size))
+
+
+# Records another filename under which an already stored, byte-identical document was seen
+DOCUMENT_ALIAS_QUERY = """
+MATCH (d:Document {filename: $existing})
+WHERE NOT $filename IN coalesce(d.aliases, [])
+SET d.aliases = coalesce(d.aliases, []) + $filename
+"""
+
+
+def record_document_alias(existing: str, filename: str):
+    """
+    Add filename to the aliases of the stored document existing.
+
+    This is what save_pdf_document_to_neo4j does for a duplicate; callers
+    that skip duplicates before extraction (ingest.py) use it directly.
+    """
+    with span("neo4j.write", rows_sent=1), get_driver().session(database=NEO4J_DATABASE) as session:
+        session.execute_write(lambda tx: tx.run(DOCUMENT_ALIAS_QUERY,
+                                                {"existing": existing, "filename": filename}).consume())
+    invalidate_result_cache()
+
+
+def find_duplicate_document(content_hash: str, filename: str):
+    """
+    Return the stored document that makes writing filename with this content hash unnecessary, or None.
+
+    That is filename itself when it is stored unchanged, or a byte-identical
+    document stored under another name when filename has no document of its
+    own (a changed file that now matches another document must be rewritten).
+    """
+    with span("neo4j.read"), get_driver().session(database=NEO4J_DATABASE) as session:
+        rows = session.run(DUPLICATE_DOCUMENT_QUERY, {"content_hash": content_hash, "filename": filename}).data()
+    return _duplicate_of(rows, filename)
+
+
+def find_document_by_content_hash(content_hash: str):
+    """Return the filename of a stored document with this content hash, or None."""
+    query = """
+    MATCH (d:Document {content_hash: $content_hash})
+    RETURN d.filename AS filename
+    LIMIT 1
+    """
+
+    with span("neo4j.read"), get_driver().session(database=NEO4J_DATABASE) as session:
+        record = session.run(query, {"content_hash": content_hash}).single()
+        return record['filename'] if record else None
+
+
+def save_pdf_document_to_neo4j(pdf_data: dict, batch_size: int = None):
+    """
+    Save PDF document and its extracted content to Neo4j database.
+
+    The document, its pages, topics and key phrases are written in a single
+    managed write transaction, sending each group as a parameter list that is
+    expanded server-side with UNWIND. When pdf_data carries a 'content_hash',
+    identical files are skipped; otherwise only changed pages are rewritten.
+
+    Args:
+        pdf_data: Dictionary containing PDF metadata and extracted content
+        batch_size: Maximum number of rows sent per UNWIND statement
+            (defaults to NEO4J_WRITE_BATCH_SIZE)
+
+    Returns:
+        Dictionary with 'status' ('written', 'unchanged' or 'duplicate'),
+        the stored 'filename', 'pages_written' and 'pages_deleted' (plus
+        'tables_written' when written)
+    """
+    batch_size = batch_size or NEO4J_WRITE_BATCH_SIZE
+    if batch_size < 1:
+        raise ValueError("batch_size must be a positive integer")
+
+    with span("neo4j.save_document", pages=len(pdf_data['text_content'])), \
+            get_driver().session(database=NEO4J_DATABASE) as session:
+        result = session.execute_write(_write_pdf_document, pdf_data, batch_size)
+
+    if result['status'] != 'unchanged':
+        invalidate_result_cache()
+    if result['status'] == 'written':
+        _update_local_indexes(pdf_data, result['filename'])
+    return result
+
+
+def _update_local_indexes(pdf_data: dict, filename: str):
+    """Mirror a written document into the local search and passage indexes, if enabled."""
+    from utils.search_index import get_search_index
+    from utils.vector_index import get_vector_index, index_document_passages
+
+    index = get_search_index()
+    if index is not None:
+        try:
+            index.update_document(filename, pdf_data['text_content'],
+                                  title=pdf_data['metadata']['title'],
+                                  content_hash=pdf_data.get('content_hash'))
+            index.save_if_due()
+        except Exception as e:
+            index.stale = True
+            logger.warning("Local search index update failed for %s: %s", filename, e)
+
+    vector_index = get_vector_index()
+    if vector_index is not None:
+        try:
+            index_document_passages(pdf_data, vector_index)
+            vector_index.save_if_due()
+        except Exception as e:
+            logger.warning("Passage index update failed for %s: %s", filename, e)
+
+
+def save_pdf_document_to_neo4j_row_by_row(pdf_data: dict):
+    """
+    Save PDF document with one query per page, topic and key phrase.
+
+    This is the original write path, kept as a reference for benchmarking
+    against save_pdf_document_to_neo4j.
+
+    Args:
+        pdf_data: Dictionary containing PDF metadata and extracted content
+    """
+    with get_driver().session(database=NEO4J_DATABASE) as session:
         # Create document node
-        session.run(doc_query, doc_params)
+        session.run(DOCUMENT_QUERY, _document_params(pdf_data))
         
         # Create content nodes for each page
         for page_data in pdf_data['text_content']:
@@ -177,47 +613,478 @@ def save_pdf_document_to_neo4j(pdf_data: dict):
                 
                 session.run(phrase_query, phrase_params)
 
+    invalidate_result_cache()
 
-def get_pdf_documents():
-    """Retrieve all PDF documents from the database."""
-    query = """
+
+def _pdf_documents_query(paginated: bool = False, max_tags: int = None, include_counts: bool = False) -> str:
+    """
+    Build the document listing query.
+
+    Topics and key phrases are collected in separate subqueries, so a
+    document's rows never multiply into a topics x phrases cross product.
+    """
+    tag_limit = "WITH t LIMIT $max_tags" if max_tags is not None else ""
+    phrase_limit = "WITH kp LIMIT $max_tags" if max_tags is not None else ""
+    keyset = """
+    WHERE $cursor_timestamp IS NULL
+       OR d.upload_timestamp < $cursor_timestamp
+       OR (d.upload_timestamp = $cursor_timestamp AND d.filename < $cursor_filename)
+    """ if paginated else ""
+    page = "LIMIT $page_size" if paginated else ""
+    counts = """,
+           coalesce(d.content_count, COUNT { (d)-[:HAS_CONTENT]->() }) as content_count,
+           coalesce(d.topic_count, COUNT { (d)-[:HAS_TOPIC]->() }) as topic_count,
+           coalesce(d.key_phrase_count, COUNT { (d)-[:HAS_KEY_PHRASE]->() }) as key_phrase_count""" if include_counts else ""
+
+    return f"""
     MATCH (d:Document)
-    OPTIONAL MATCH (d)-[:HAS_TOPIC]->(t:Topic)
-    OPTIONAL MATCH (d)-[:HAS_KEY_PHRASE]->(kp:KeyPhrase)
+    {keyset}
+    WITH d
+    ORDER BY d.upload_timestamp DESC, d.filename DESC
+    {page}
+    CALL {{
+        WITH d
+        OPTIONAL MATCH (d)-[:HAS_TOPIC]->(t:Topic)
+        {tag_limit}
+        RETURN collect(t.name) as topics
+    }}
+    CALL {{
+        WITH d
+        OPTIONAL MATCH (d)-[:HAS_KEY_PHRASE]->(kp:KeyPhrase)
+        {phrase_limit}
+        RETURN collect(kp.phrase) as key_phrases
+    }}
     RETURN d, 
-           collect(DISTINCT t.name) as topics,
-           collect(DISTINCT kp.phrase) as key_phrases
-    ORDER BY d.upload_timestamp DESC
+           topics,
+           key_phrases{counts}
+    ORDER BY d.upload_timestamp DESC, d.filename DESC
+    """
+
+
+PDF_DOCUMENTS_QUERY = _pdf_documents_query()
+
+
+def get_pdf_documents():
+    """Retrieve all PDF documents from the database."""
+    return _read(PDF_DOCUMENTS_QUERY)
+
+
+def _list_documents_params(page_size: int, cursor: dict, max_tags: int) -> dict:
+    if page_size < 1:
+        raise ValueError("page_size must be a positive integer")
+    cursor = cursor or {}
+    return {
+        "page_size": page_size,
+        "cursor_timestamp": cursor.get("upload_timestamp"),
+        "cursor_filename": cursor.get("filename"),
+        "max_tags": max_tags
+    }
+
+
+def _documents_page(rows: list, page_size: int) -> dict:
+    """Wrap a page of listing rows with the cursor for the next page."""
+    next_cursor = None
+    if len(rows) == page_size:
+        last = rows[-1]['d']
+        next_cursor = {"upload_timestamp": last.get('upload_timestamp'), "filename": last.get('filename')}
+    return {"documents": rows, "next_cursor": next_cursor}
+
+
+def list_pdf_documents(page_size: int = 50, cursor: dict = None, max_tags: int = None,
+                       include_counts: bool = False) -> dict:
+    """
+    Retrieve one page of PDF documents, newest first.
+
+    Pages are addressed with a keyset cursor (upload_timestamp, filename), so
+    fetching a later page costs the same as the first one.
+
+    Args:
+        page_size: Maximum number of documents to return
+        cursor: 'next_cursor' from the previous page, or None for the first page
+        max_tags: Maximum number of topics and of key phrases returned per document
+        include_counts: Also return content_count, topic_count and key_phrase_count
+
+    Returns:
+        Dictionary with 'documents' (rows shaped like get_pdf_documents) and
+        'next_cursor' (None on the last page)
+    """
+    query = _pdf_documents_query(paginated=True, max_tags=max_tags, include_counts=include_counts)
+    params = _list_documents_params(page_size, cursor, max_tags)
+    return _documents_page(_read(query, params), page_size)
+
+
+_LUCENE_SPECIAL_CHARS = set('+-&|!(){}[]^"~*?:\\/')
+
+
+def _escape_lucene(text: str) -> str:
+    """Escape Lucene query syntax so user input is matched as plain terms."""
+    return "".join(f"\\{char}" if char in _LUCENE_SPECIAL_CHARS else char for char in text)
+
+
+def _lucene_query(search_term: str) -> Optional[str]:
+    """
+    Escaped full-text query for search_term, or None when there is nothing to search for.
+
+    An empty, whitespace-only or punctuation-only term would reach the
+    full-text index as an empty query, which Neo4j rejects with a ClientError.
+    """
+    if not search_term or not re.search(r"\w", search_term):
+        return None
+    return _escape_lucene(search_term)
+
+
+# Hits are occurrences of a term with no word character on either side, i.e. whole tokens
+# as utils.search_index.tokenize sees them, so "art" does not highlight inside "part".
+SEARCH_CONTENT_QUERY = f"""
+CALL db.index.fulltext.queryNodes('{CONTENT_FULLTEXT_INDEX}', $search_term)
+YIELD node AS c, score
+MATCH (d:Document)-[:HAS_CONTENT]->(c)
+WITH d, c, score
+WHERE $cursor_score IS NULL
+   OR score < $cursor_score
+   OR (score = $cursor_score AND (d.filename > $cursor_filename
+       OR (d.filename = $cursor_filename AND c.page_number > $cursor_page)))
+WITH d, c, score
+ORDER BY score DESC, d.filename, c.page_number
+LIMIT $limit
+WITH d, c, score, [term IN $terms | {{term: term, pieces: split(toLower(c.text), term)}}] AS splits
+WITH d, c, score, [s IN splits | [i IN range(0, size(s.pieces) - 2)
+         WHERE NOT right(s.pieces[i], 1) =~ '(?U)\\\\w' AND NOT left(s.pieces[i + 1], 1) =~ '(?U)\\\\w' | {{
+         start: reduce(offset = 0, piece IN s.pieces[0..i + 1] | offset + size(piece)) + i * size(s.term),
+         length: size(s.term)
+     }}]] AS term_hits
+WITH d, c, score,
+     reduce(total = 0, found IN term_hits | total + size(found)) AS hit_count,
+     reduce(hits = [], found IN term_hits | hits + found[0..$max_hits]) AS hits
+RETURN d.filename as filename,
+       c.page_number as page,
+       d.title as title,
+       score,
+       hit_count,
+       hits,
+       [h IN hits[0..$max_snippets] | {{
+           offset: CASE WHEN h.start > $window THEN h.start - $window ELSE 0 END,
+           text: substring(c.text, CASE WHEN h.start > $window THEN h.start - $window ELSE 0 END,
+                           h.length + 2 * $window)
+       }}] as snippets
+ORDER BY score DESC, filename, page
+"""
+
+
+def _search_params(search_term: str, limit: int, cursor: dict, window: int, max_snippets: int,
+                   max_hits: int) -> Optional[dict]:
+    """Query parameters for SEARCH_CONTENT_QUERY, or None when there is nothing to search for."""
+    from utils.search_index import tokenize
+
+    if limit < 1:
+        raise ValueError("limit must be a positive integer")
+    lucene_query = _lucene_query(search_term)
+    if lucene_query is None:
+        return None
+    cursor = cursor or {}
+    return {
+        "search_term": lucene_query,
+        # Only used for highlighting; terms such as 'x' or 'C++' are still searched but not highlighted
+        "terms": list(dict.fromkeys(tokenize(search_term))),
+        "limit": limit,
+        "window": window,
+        "max_snippets": max_snippets,
+        "max_hits": max_hits,
+        "cursor_score": cursor.get("score"),
+        "cursor_filename": cursor.get("filename"),
+        "cursor_page": cursor.get("page")
+    }
+
+
+def _search_page(rows: list, limit: int) -> dict:
+    """Sort hits, attach snippet-relative highlight ranges and build the next cursor."""
+    for row in rows:
+        row['hits'].sort(key=lambda hit: hit['start'])
+        for snippet in row['snippets']:
+            end = snippet['offset'] + len(snippet['text'])
+            snippet['highlights'] = [
+                [hit['start'] - snippet['offset'], hit['length']]
+                for hit in row['hits']
+                if hit['start'] >= snippet['offset'] and hit['start'] + hit['length'] <= end
+            ]
+    next_cursor = None
+    if len(rows) == limit:
+        last = rows[-1]
+        next_cursor = {"score": last['score'], "filename": last['filename'], "page": last['page']}
+    return {"results": rows, "next_cursor": next_cursor}
+
+
+def search_pdf_content(search_term: str, limit: int = 20, cursor: dict = None, window: int = 80,
+                       max_snippets: int = 3, max_hits: int = 20):
+    """
+    Search for PDF content containing specific terms.
+
+    Uses the full-text index on Content.text and returns matching pages
+    ordered by relevance. Only short windows of text around the hits are
+    returned; use get_page_content to fetch a page's full text.
+
+    Args:
+        search_term: Free-text search
+        limit: Maximum number of pages to return
+        cursor: 'next_cursor' from the previous call, or None for the first page
+        window: Characters of context on each side of a hit
+        max_snippets: Maximum snippets per page
+        max_hits: Maximum hit offsets reported per term and page
+
+    Returns:
+        Dictionary with 'results' and 'next_cursor' (None on the last page).
+        Each result has filename, page, title, score, hit_count, hits
+        ({start, length} offsets into the page text) and snippets
+        ({offset, text, highlights}), where highlights are [start, length]
+        ranges relative to the snippet text. Hits are whole-token matches of
+        the search terms' word tokens; an empty, whitespace-only or
+        punctuation-only term returns no results.
     """
-    
-    with driver.session(database=NEO4J_DATABASE) as session:
-        result = session.run(query)
-        return [record.data() for record in result]
+    params = _search_params(search_term, limit, cursor, window, max_snippets, max_hits)
+    if params is None:
+        return {"results": [], "next_cursor": None}
+    return _search_page(_read(SEARCH_CONTENT_QUERY, params), limit)
+
 
+def highlight_snippet(snippet: dict, open_tag: str = "<mark>", close_tag: str = "</mark>") -> str:
+    """Render a search snippet with its highlight ranges wrapped in tags."""
+    text, parts, position = snippet['text'], [], 0
+    for start, length in snippet.get('highlights', []):
+        if start < position:
+            continue
+        parts.extend([text[position:start], open_tag, text[start:start + length], close_tag])
+        position = start + length
+    parts.append(text[position:])
+    return "".join(parts)
 
-def search_pdf_content(search_term: str):
-    """Search for PDF content containing specific terms."""
+
+def get_page_content(filename: str, page: int):
+    """Return the full text of one page (for opening a search result), or None."""
     query = """
+    MATCH (d:Document {filename: $filename})-[:HAS_CONTENT]->(c:Content {page_number: $page})
+    RETURN d.filename as filename, c.page_number as page, d.title as title, c.text as content
+    """
+
+    rows = _read(query, {"filename": filename, "page": page})
+    return rows[0] if rows else None
+
+
+RANK_PAGES_QUERY = f"""
+CALL db.index.fulltext.queryNodes('{CONTENT_FULLTEXT_INDEX}', $search_term)
+YIELD node AS c, score
+MATCH (d:Document)-[:HAS_CONTENT]->(c)
+RETURN d.filename as filename,
+       c.page_number as page,
+       d.title as title,
+       score
+ORDER BY score DESC
+LIMIT $top_k
+"""
+
+
+def _verify_search_index(index):
+    """Mark the local index stale if its documents differ from the graph's."""
+    stored = {
+        record['filename']: record['content_hash']
+        for record in run_query("MATCH (d:Document) RETURN d.filename AS filename, d.content_hash AS content_hash",
+                                use_cache=False)
+    }
+    index.mark_verified(stale=stored != index.documents())
+
+
+def rank_pdf_pages(search_term: str, top_k: int = 10):
+    """
+    Return the best matching pages for a multi-term query.
+
+    Answered from the local BM25 index (see utils.search_index) when it is
+    enabled and in sync with the graph, which is re-checked every
+    SEARCH_INDEX_VERIFY_SECONDS; otherwise falls back to the Neo4j full-text
+    index. A term with nothing to search for returns no pages.
+
+    Returns:
+        List of dictionaries with filename, page, title and score
+    """
+    from utils.search_index import get_search_index
+
+    index = get_search_index()
+    if index is not None:
+        if index.refresh():
+            index.verified_at = None
+        if index.needs_verification():
+            _verify_search_index(index)
+        if not index.is_stale():
+            return index.search(search_term, top_k)
+
+    lucene_query = _lucene_query(search_term)
+    if lucene_query is None:
+        return []
+    return _read(RANK_PAGES_QUERY, {"search_term": lucene_query, "top_k": top_k})
+
+
+def rebuild_search_index():
+    """
+    Rebuild the local search index from the pages stored in Neo4j.
+
+    Use this when rank_pdf_pages reports the index as stale (for example
+    after documents were written by a process without the index enabled).
+    """
+    from utils.search_index import BM25Index, get_search_index, set_search_index
+
+    current = get_search_index()
+    if current is None:
+        raise ValueError("PDF_SEARCH_INDEX_DIR is not set")
+
+    index = BM25Index()
+    index.directory = current.directory
+    documents = {
+        document['filename']: document
+        for document in run_query("""
+        MATCH (d:Document)
+        RETURN d.filename AS filename, d.title AS title, d.content_hash AS content_hash
+        """, use_cache=False)
+    }
+    # Pages arrive grouped by document, so only one document's text is held at a time
+    pages_by_document = itertools.groupby(stream_query("""
     MATCH (c:Content)
-    WHERE c.text CONTAINS $search_term
-    MATCH (d:Document)-[:HAS_CONTENT]->(c)
-    RETURN d.filename as filename, 
-           c.page_number as page,
-           c.text as content,
-           d.title as title
-    ORDER BY d.upload_timestamp DESC
-    """
-    
-    with driver.session(database=NEO4J_DATABASE) as session:
-        result = session.run(query, {"search_term": search_term})
-        return [record.data() for record in result]
-
-
-def run_query(cypher_query: str, parameters: dict = None):
-    """Run a Cypher query and return the results as a list of dictionaries."""
-    with driver.session(database=NEO4J_DATABASE) as session:
+    RETURN c.document_filename AS filename, c.page_number AS page, c.text AS text
+    ORDER BY filename
+    """), key=lambda row: row['filename'])
+    for filename, pages in pages_by_document:
+        document = documents.pop(filename, None)
+        if document is not None:
+            index.update_document(filename, list(pages), title=document['title'],
+                                  content_hash=document['content_hash'])
+    for document in documents.values():  # documents without pages
+        index.update_document(document['filename'], [], title=document['title'],
+                              content_hash=document['content_hash'])
+    index.save(merge=False)
+    index.mark_verified(stale=False)
+    set_search_index(index)
+    return index
+
+
+# Clauses that can modify the graph; queries containing them are never cached
+_WRITE_CLAUSE_RE = re.compile(r"\b(CREATE|MERGE|DELETE|SET|REMOVE|DROP|FOREACH|LOAD\s+CSV)\b", re.IGNORECASE)
+
+
+def run_query(cypher_query: str, parameters: dict = None, use_cache: bool = True):
+    """
+    Run a Cypher query and return the results as a list of dictionaries.
+
+    Read-only queries are served from the result cache until the next write;
+    queries that look like writes bypass it and invalidate it.
+    """
+    writes = bool(_WRITE_CLAUSE_RE.search(cypher_query))
+    if use_cache and not writes:
+        return _read(cypher_query, parameters)
+
+    with span("neo4j.write" if writes else "neo4j.read", rows_sent=_rows_sent(parameters)) as trace, \
+            get_driver().session(database=NEO4J_DATABASE) as session:
+        result = session.run(cypher_query, parameters or {})
+        rows = [record.data() for record in result]
+        trace.add(rows=len(rows))
+    if writes:
+        invalidate_result_cache()
+    return rows
+
+
+def stream_query(cypher_query: str, parameters: dict = None, fetch_size: int = None, limit: int = None):
+    """
+    Run a Cypher query and yield its records lazily as dictionaries.
+
+    Records are pulled from the server fetch_size at a time while the caller
+    iterates, so memory use does not depend on the size of the result. The
+    session stays open until the generator is exhausted or closed.
+
+    Args:
+        cypher_query: Cypher query to run
+        parameters: Query parameters
+        fetch_size: Records pulled per round trip (defaults to NEO4J_FETCH_SIZE)
+        limit: Stop after this many records; the rest is discarded server-side
+    """
+    if limit is not None and limit <= 0:
+        return
+    fetch_size = fetch_size or NEO4J_FETCH_SIZE
+    if limit is not None:
+        fetch_size = min(fetch_size, limit)
+    with span("neo4j.stream") as trace, \
+            get_driver().session(database=NEO4J_DATABASE, fetch_size=fetch_size) as session:
+        result = session.run(cypher_query, parameters or {})
+        count = 0
+        try:
+            for record in result:
+                count += 1
+                yield record.data()
+                # Checked before asking for another record, so no more than limit are pulled
+                if limit is not None and count >= limit:
+                    result.consume()
+                    break
+        finally:
+            trace.add(rows=count)
+
+
+def _numeric_array(values: list):
+    """Convert a column to a NumPy array if every non-null value is a number, else return None."""
+    import numpy as np
+
+    present = [value for value in values if value is not None]
+    if not present or not all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in present):
+        return None
+    if len(present) == len(values) and all(isinstance(value, int) for value in present):
+        return np.array(values, dtype=np.int64)
+    return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+
+
+def _to_columns(keys: list, value_rows, numpy_arrays: bool = True) -> dict:
+    """Transpose an iterable of value tuples into a {column: values} mapping."""
+    columns = {key: [] for key in keys}
+    appenders = [columns[key].append for key in keys]
+    for values in value_rows:
+        for append, value in zip(appenders, values):
+            append(value)
+
+    if numpy_arrays:
+        try:
+            import numpy  # noqa: F401 (optional dependency)
+        except ImportError:
+            return columns
+        for key, values in columns.items():
+            array = _numeric_array(values)
+            if array is not None:
+                columns[key] = array
+    return columns
+
+
+def run_query_columnar(cypher_query: str, parameters: dict = None, fetch_size: int = None,
+                       limit: int = None, numpy_arrays: bool = True) -> dict:
+    """
+    Run a Cypher query and return its result as columns instead of row dicts.
+
+    Numeric columns become NumPy arrays (int64, or float64 with NaN for
+    nulls) when NumPy is installed; other columns are plain lists. Graph
+    values such as nodes are returned as driver objects.
+
+    Args:
+        cypher_query: Cypher query to run
+        parameters: Query parameters
+        fetch_size: Records pulled per round trip (defaults to NEO4J_FETCH_SIZE)
+        limit: Read at most this many records
+        numpy_arrays: Convert numeric columns to NumPy arrays
+
+    Returns:
+        Dictionary mapping each returned column name to its values
+    """
+    with span("neo4j.read") as trace, \
+            get_driver().session(database=NEO4J_DATABASE, fetch_size=fetch_size or NEO4J_FETCH_SIZE) as session:
         result = session.run(cypher_query, parameters or {})
-        return [record.data() for record in result]
+        keys = result.keys()
+        records = (record.values() for record in result)
+        if limit is not None:
+            records = itertools.islice(records, limit)
+        columns = _to_columns(keys, records, numpy_arrays)
+        result.consume()
+        trace.add(rows=len(next(iter(columns.values()), [])))
+        return columns
 
 
 # Optional: for testing
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Bulk loader for scraped product catalogues.
+
+Streams a CSV or JSONL file (optionally gzipped) record by record, converts
+each record to typed Product properties once (prices, percentages, ratings
+and counts become numbers), and writes them in batches with UNWIND from a
+pool of threads, each batch in its own write transaction. At most
+2 * workers batches are in memory at a time, so catalogues of any size load
+in bounded memory.
+
+A record that cannot be converted is reported and skipped. A batch rejected
+because of a row's data (a constraint violation or a value of the wrong
+type) is split in halves and retried until the offending rows are isolated,
+so one bad row never aborts the load; other failures (e.g. authentication
+errors or the database going away) are reported once for the whole batch.
+
+Usage:
+    python -m db.product_loader catalogue.csv --batch-size 1000 --workers 4 --errors errors.jsonl
+"""
+import argparse
+import csv
+import gzip
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from db.neo4j_client import NEO4J_DATABASE, get_driver, invalidate_result_cache
+from utils.tracing import span
+
+PRODUCT_LOAD_BATCH_SIZE = int(os.getenv("PRODUCT_LOAD_BATCH_SIZE", "1000"))
+PRODUCT_LOAD_WORKERS = int(os.getenv("PRODUCT_LOAD_WORKERS", "4"))
+# Errors kept in the load report; the rest are only counted
+PRODUCT_LOAD_MAX_ERRORS = int(os.getenv("PRODUCT_LOAD_MAX_ERRORS", "1000"))
+
+PRODUCT_BATCH_QUERY = """
+UNWIND $rows AS row
+MERGE (p:Product {name: row.name})
+SET p += row.properties
+"""
+
+# Normalised source column -> Product property
+FIELD_NAMES = {
+    "product_name": "name", "name": "name", "title": "name",
+    "brand": "brand",
+    "price": "price",
+    "discount": "discount",
+    "availability": "availability",
+    "rating": "rating",
+    "review_count": "review_count", "reviews": "review_count",
+    "product_url": "url", "url": "url",
+    "category": "category",
+}
+
+# A leading-dot number ('.5') must not follow a letter, so the dot of 'Rs.1,299' is not read as 0.1
+_NUMBER_RE = re.compile(r"[-+]?(?:\d[\d,]*(?:\.\d+)?|(?<![A-Za-z])\.\d+)")
+_SCALED_COUNT_RE = re.compile(r"(\d[\d,]*(?:\.\d+)?)\s*([km])?\b", re.IGNORECASE)
+_PERCENT_RE = re.compile(f"({_NUMBER_RE.pattern})\\s*%")
+_COLUMN_RE = re.compile(r"[^a-z0-9]+")
+
+
+def _first_number(value) -> Optional[float]:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if not isinstance(value, str):
+        return None
+    match = _NUMBER_RE.search(value)
+    return float(match.group().replace(",", "")) if match else None
+
+
+def parse_price(value) -> Optional[float]:
+    """'₹1,299', 'Rs.1,299', 'Rs. 1,299.00' or '$12.50' -> 1299.0 / 12.5; None when there is no number."""
+    return _first_number(value)
+
+
+def parse_percent(value) -> Optional[float]:
+    """'23% off', 'Save ₹200 (23% off)' or '23' -> 23.0; 'Rs.200 off' -> 200.0."""
+    if isinstance(value, str):
+        match = _PERCENT_RE.search(value)
+        if match:
+            return float(match.group(1).replace(",", ""))
+    return _first_number(value)
+
+
+def parse_rating(value) -> Optional[float]:
+    """'4.3', '4.3 out of 5' -> 4.3."""
+    return _first_number(value)
+
+
+def parse_count(value, unit: str = None) -> Optional[int]:
+    """
+    Parse a count such as '1,234', '(1,234)', '1.2k' or '12,345 Ratings & 1,234 Reviews'.
+
+    When unit is given ('review'), the number directly before that word is
+    used, so combined rating/review strings yield the right count; a string
+    that counts something else ('12,345 Ratings') gives None, while a bare
+    count ('1,234', '(1,234)', '1.2k') is accepted as is.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value)
+    if not isinstance(value, str):
+        return None
+    if unit:
+        match = (re.search(_SCALED_COUNT_RE.pattern + r"\s*" + re.escape(unit), value, re.IGNORECASE)
+                 or _SCALED_COUNT_RE.fullmatch(value.strip().strip("()[]").strip()))
+    else:
+        match = _SCALED_COUNT_RE.search(value)
+    if not match:
+        return None
+    number = float(match.group(1).replace(",", ""))
+    scale = {"k": 1_000, "m": 1_000_000}.get((match.group(2) or "").lower(), 1)
+    return int(round(number * scale))
+
+
+def _text(value) -> Optional[str]:
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+# Product property -> converter
+CONVERTERS: Dict[str, Callable[[Any], Any]] = {
+    "brand": _text,
+    "price": parse_price,
+    "discount": parse_percent,
+    "availability": _text,
+    "rating": parse_rating,
+    "review_count": lambda value: parse_count(value, unit="review"),
+    "url": _text,
+    "category": _text,
+}
+
+
+def normalize_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Map source column names ('Product Name', 'review-count', ...) to Product property names."""
+    product = {}
+    for column, value in record.items():
+        field = FIELD_NAMES.get(_COLUMN_RE.sub("_", str(column).lower()).strip("_"))
+        if field is not None and field not in product:
+            product[field] = value
+    return product
+
+
+def product_row(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert a scraped record into a {'name', 'properties'} row with typed values.
+
+    Empty or unparseable values are left out of 'properties', so loading a
+    partial record never erases what is already stored.
+
+    Raises:
+        ValueError: When the record has no product name
+    """
+    product = normalize_record(record)
+    name = _text(product.get("name"))
+    if name is None:
+        raise ValueError("missing product name")
+    properties = {}
+    for field, convert in CONVERTERS.items():
+        value = convert(product.get(field))
+        if value is not None:
+            properties[field] = value
+    return {"name": name, "properties": properties}
+
+
+def iter_records(path: str, file_format: str = None) -> Iterator[Dict[str, Any]]:
+    """
+    Stream records from a CSV or JSONL file, one at a time.
+
+    Args:
+        path: File path; a .gz suffix is decompressed on the fly
+        file_format: 'csv' or 'jsonl' (guessed from the extension by default)
+    """
+    name = path[:-3] if path.endswith(".gz") else path
+    file_format = file_format or ("csv" if name.lower().endswith(".csv") else "jsonl")
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8-sig", newline="") as f:
+        if file_format == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _write_rows(rows: List[Dict[str, Any]]):
+    def write(tx):
+        tx.run(PRODUCT_BATCH_QUERY, {"rows": rows}).consume()
+
+    with span("neo4j.product_batch", rows_sent=len(rows)), get_driver().session(database=NEO4J_DATABASE) as session:
+        session.execute_write(write)
+
+
+def _write_batch(batch: List[Tuple[int, Dict[str, Any]]]) -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    Write one batch of (row number, row) pairs.
+
+    Returns:
+        (rows written, errors)
+    """
+    from neo4j.exceptions import ConstraintError, CypherTypeError
+
+    try:
+        _write_rows([row for _, row in batch])
+        return len(batch), []
+    except (ConstraintError, CypherTypeError) as e:
+        if len(batch) == 1:
+            row_number, row = batch[0]
+            return 0, [{"row": row_number, "name": row["name"], "error": str(e)}]
+        # The database rejected something in this batch: isolate the bad rows
+        middle = len(batch) // 2
+        written_left, errors_left = _write_batch(batch[:middle])
+        written_right, errors_right = _write_batch(batch[middle:])
+        return written_left + written_right, errors_left + errors_right
+    except Exception as e:
+        return 0, [{"rows": [batch[0][0], batch[-1][0]], "count": len(batch), "error": f"{type(e).__name__}: {e}"}]
+
+
+def load_products(records: Iterable[Dict[str, Any]], batch_size: int = PRODUCT_LOAD_BATCH_SIZE,
+                  workers: int = PRODUCT_LOAD_WORKERS, max_errors: int = PRODUCT_LOAD_MAX_ERRORS,
+                  on_batch: Callable[[dict], None] = None) -> Dict[str, Any]:
+    """
+    Load product records into Neo4j with batched, parallel UNWIND writes.
+
+    Args:
+        records: Scraped records (e.g. from iter_records); column names are
+            normalised with normalize_record
+        batch_size: Rows per UNWIND statement and transaction
+        workers: Write transactions running in parallel
+        max_errors: Errors kept in the report (all are counted)
+        on_batch: Called with a progress dict after every finished batch
+
+    Returns:
+        Dictionary with 'rows_read', 'rows_written', 'rows_failed', 'batches',
+        'seconds' and 'errors' (row-level errors carry the 1-based 'row' number,
+        whole-batch failures the first and last row numbers as 'rows' and
+        their 'count')
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be a positive integer")
+
+    report = {"rows_read": 0, "rows_written": 0, "rows_failed": 0, "batches": 0, "errors": []}
+    started = time.perf_counter()
+
+    def add_errors(errors):
+        for error in errors:
+            report["rows_failed"] += error.get("count", 1)
+            if len(report["errors"]) < max_errors:
+                report["errors"].append(error)
+
+    def collect(future):
+        written, errors = future.result()
+        report["rows_written"] += written
+        report["batches"] += 1
+        add_errors(errors)
+        if on_batch is not None:
+            on_batch(dict(report, errors=len(report["errors"])))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        batch = []
+        for row_number, record in enumerate(records, start=1):
+            report["rows_read"] += 1
+            try:
+                batch.append((row_number, product_row(record)))
+            except Exception as e:
+                add_errors([{"row": row_number, "error": str(e)}])
+                continue
+            if len(batch) >= batch_size:
+                pending.add(pool.submit(_write_batch, batch))
+                batch = []
+                if len(pending) >= 2 * workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        collect(future)
+        if batch:
+            pending.add(pool.submit(_write_batch, batch))
+        for future in pending:
+            collect(future)
+
+    if report["rows_written"]:
+        invalidate_result_cache()
+    report["seconds"] = time.perf_counter() - started
+    return report
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="CSV or JSONL catalogue (optionally .gz)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Input format (guessed from the extension)")
+    parser.add_argument("--batch-size", type=int, default=PRODUCT_LOAD_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=PRODUCT_LOAD_WORKERS, help="Parallel write transactions")
+    parser.add_argument("--errors", help="Write the reported errors to this JSONL file")
+    args = parser.parse_args(argv)
+
+    def progress(state):
+        print(f"\r{state['rows_written']:,} written, {state['rows_failed']:,} failed, "
+              f"{state['batches']:,} batches", end="", file=sys.stderr)
+
+    report = load_products(iter_records(args.path, args.format), args.batch_size, args.workers, on_batch=progress)
+    print(file=sys.stderr)
+    if args.errors:
+        with open(args.errors, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(error) + "\n" for error in report["errors"])
+    rate = report["rows_written"] / max(report["seconds"], 1e-9)
+    print(f"✅ {report['rows_written']:,} of {report['rows_read']:,} products written in {report['seconds']:.1f}s "
+          f"({rate:,.0f} rows/s); {report['rows_failed']:,} failed")
+    for error in report["errors"][:10]:
+        print(f"❌ {json.dumps(error)}", file=sys.stderr)
+    sys.exit(1 if report["rows_failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
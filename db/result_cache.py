@@ -0,0 +1,151 @@
+"""
+Write-aware in-process cache for read query results.
+
+Read helpers in db.neo4j_client (document listings, searches, run_query)
+are re-run on every Streamlit rerun although the graph only changes when
+something is written. Results are cached under the query text and its
+parameters, tagged with the write generation current when the query
+started. Every save_* function bumps the generation, so a result read
+before a write is never served after it.
+
+Writes made by other processes (e.g. ingest.py) do not bump this process's
+generation; NEO4J_RESULT_CACHE_TTL_SECONDS bounds how long such results can
+be served. Memory is bounded by entry count and by the total number of
+cached rows, evicting least recently used entries first. Set
+NEO4J_RESULT_CACHE_ENTRIES=0 to disable the cache.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+NEO4J_RESULT_CACHE_ENTRIES = int(os.getenv("NEO4J_RESULT_CACHE_ENTRIES", "256"))
+NEO4J_RESULT_CACHE_MAX_ROWS = int(os.getenv("NEO4J_RESULT_CACHE_MAX_ROWS", "50000"))
+NEO4J_RESULT_CACHE_TTL_SECONDS = float(os.getenv("NEO4J_RESULT_CACHE_TTL_SECONDS", "300"))
+
+
+def _copy(value):
+    """Copy nested dicts and lists (what query rows are made of); other values are shared."""
+    if isinstance(value, dict):
+        return {key: _copy(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy(item) for item in value]
+    return value
+
+
+class ResultCache:
+    """LRU cache of row lists invalidated by a write generation counter."""
+
+    def __init__(self, max_entries: int = NEO4J_RESULT_CACHE_ENTRIES, max_rows: int = NEO4J_RESULT_CACHE_MAX_ROWS,
+                 ttl_seconds: float = NEO4J_RESULT_CACHE_TTL_SECONDS):
+        """
+        Args:
+            max_entries: Maximum cached results (0 disables caching)
+            max_rows: Maximum rows held across all cached results
+            ttl_seconds: Age after which a result is re-read regardless of writes
+        """
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.ttl_seconds = ttl_seconds
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (rows, generation, created)
+        self._rows = 0
+
+    @staticmethod
+    def key(query: str, parameters: Optional[dict]) -> str:
+        return query + "\0" + json.dumps(parameters or {}, sort_keys=True, default=str)
+
+    def bump(self) -> int:
+        """Record a write; every result cached so far becomes stale."""
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._rows = 0
+            return self.generation
+
+    def _get(self, key: str) -> Optional[List[dict]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            rows, generation, created = entry
+            if generation != self.generation or time.monotonic() - created > self.ttl_seconds:
+                self._discard(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return rows
+
+    def _put(self, key: str, rows: List[dict], generation: int):
+        if len(rows) > self.max_rows:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return  # a write happened while the query ran
+            self._discard(key)
+            self._entries[key] = (rows, generation, time.monotonic())
+            self._rows += len(rows)
+            while len(self._entries) > self.max_entries or self._rows > self.max_rows:
+                _, (evicted, _, _) = self._entries.popitem(last=False)
+                self._rows -= len(evicted)
+
+    def _discard(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._rows -= len(entry[0])
+
+    def fetch(self, query: str, parameters: Optional[dict], run: Callable[[], List[dict]]) -> List[dict]:
+        """
+        Return cached rows for a query, or call run() and cache its rows.
+
+        Rows are copied on the way out, including nested lists and maps, so
+        callers may modify whatever they receive.
+        """
+        if self.max_entries <= 0:
+            return run()
+        key = self.key(query, parameters)
+        rows = self._get(key)
+        if rows is None:
+            generation = self.generation
+            rows = run()
+            self._put(key, rows, generation)
+        return [_copy(row) for row in rows]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._rows = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries),
+                    "rows": self._rows, "generation": self.generation}
+
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """Return the process-wide result cache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResultCache()
+    return _cache
+
+
+def set_result_cache(cache: Optional[ResultCache]) -> Optional[ResultCache]:
+    """Replace the process-wide result cache; returns the previous one."""
+    global _cache
+    with _cache_lock:
+        previous, _cache = _cache, cache
+    return previous
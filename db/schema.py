@@ -0,0 +1,175 @@
+"""
+Idempotent schema bootstrap for the document/product graph.
+
+Every MERGE key used by db.neo4j_client is backed by a uniqueness constraint
+(which also creates the matching range index), and page text gets a
+full-text index used by search_pdf_content. All statements use IF NOT EXISTS,
+so ensure_schema can safely run on every startup.
+
+introspect_schema reads back the labels, relationship types and properties
+the live database actually contains.
+"""
+import logging
+import os
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# How long callers that retry a failed bootstrap (e.g. the Streamlit app) wait between attempts
+SCHEMA_RETRY_SECONDS = float(os.getenv("SCHEMA_RETRY_SECONDS", "300"))
+
+CONTENT_FULLTEXT_INDEX = "content_text_fulltext"
+
+SCHEMA_STATEMENTS = [
+    # Uniqueness constraints for MERGE keys
+    "CREATE CONSTRAINT document_filename IF NOT EXISTS "
+    "FOR (d:Document) REQUIRE d.filename IS UNIQUE",
+    "CREATE CONSTRAINT content_page IF NOT EXISTS "
+    "FOR (c:Content) REQUIRE (c.document_filename, c.page_number) IS UNIQUE",
+    "CREATE CONSTRAINT topic_name IF NOT EXISTS "
+    "FOR (t:Topic) REQUIRE t.name IS UNIQUE",
+    "CREATE CONSTRAINT key_phrase_phrase IF NOT EXISTS "
+    "FOR (p:KeyPhrase) REQUIRE p.phrase IS UNIQUE",
+    "CREATE CONSTRAINT product_name IF NOT EXISTS "
+    "FOR (p:Product) REQUIRE p.name IS UNIQUE",
+    "CREATE CONSTRAINT table_id IF NOT EXISTS "
+    "FOR (t:Table) REQUIRE t.table_id IS UNIQUE",
+    # Range indexes for lookups and ordering
+    "CREATE RANGE INDEX content_document_filename IF NOT EXISTS "
+    "FOR (c:Content) ON (c.document_filename)",
+    "CREATE RANGE INDEX document_upload_timestamp IF NOT EXISTS "
+    "FOR (d:Document) ON (d.upload_timestamp)",
+    "CREATE RANGE INDEX document_content_hash IF NOT EXISTS "
+    "FOR (d:Document) ON (d.content_hash)",
+    "CREATE RANGE INDEX table_document_page IF NOT EXISTS "
+    "FOR (t:Table) ON (t.document_filename, t.page_number)",
+    "CREATE RANGE INDEX table_row_table_id IF NOT EXISTS "
+    "FOR (r:TableRow) ON (r.table_id)",
+    # Full-text index over page text
+    f"CREATE FULLTEXT INDEX {CONTENT_FULLTEXT_INDEX} IF NOT EXISTS "
+    "FOR (c:Content) ON EACH [c.text]",
+]
+
+_schema_ready = False
+
+
+def ensure_schema(driver=None, database: str = None, force: bool = False) -> List[str]:
+    """
+    Create all constraints and indexes that are missing.
+
+    Runs once per process unless force is set. A statement that fails (for
+    example because existing data violates a new constraint) is logged and
+    skipped so the remaining schema is still applied; the next call then
+    retries, since the schema only counts as ready once every statement
+    succeeded. When the database cannot be reached the remaining statements
+    are reported as failed without trying each of them.
+
+    Args:
+        driver: Neo4j driver to use (defaults to the db.neo4j_client driver)
+        database: Database name (defaults to NEO4J_DATABASE)
+        force: Re-run the statements even if they already ran in this process
+
+    Returns:
+        List of statements that failed
+    """
+    global _schema_ready
+    if _schema_ready and not force:
+        return []
+
+    if driver is None or database is None:
+        from db import neo4j_client
+        driver = driver or neo4j_client.get_driver()
+        database = database or neo4j_client.NEO4J_DATABASE
+
+    from neo4j.exceptions import DriverError
+
+    failed = []
+    with driver.session(database=database) as session:
+        for position, statement in enumerate(SCHEMA_STATEMENTS):
+            try:
+                session.run(statement).consume()
+            except DriverError as e:
+                # Connection problem: every further statement would wait out the same timeout
+                logger.warning("Schema bootstrap stopped, database unavailable (%s)", e)
+                failed.extend(SCHEMA_STATEMENTS[position:])
+                break
+            except Exception as e:
+                logger.warning("Schema statement failed: %s (%s)", statement, e)
+                failed.append(statement)
+
+    _schema_ready = not failed
+    return failed
+
+
+NODE_PROPERTIES_QUERY = """
+CALL db.schema.nodeTypeProperties()
+YIELD nodeLabels, propertyName, propertyTypes
+RETURN nodeLabels, propertyName, propertyTypes
+"""
+
+RELATIONSHIP_PROPERTIES_QUERY = """
+CALL db.schema.relTypeProperties()
+YIELD relType, propertyName, propertyTypes
+RETURN relType, propertyName, propertyTypes
+"""
+
+RELATIONSHIP_PATTERNS_QUERY = """
+CALL db.schema.visualization()
+YIELD relationships
+UNWIND relationships AS r
+RETURN DISTINCT startNode(r).name AS source, type(r) AS type, endNode(r).name AS target
+"""
+
+
+def introspect_schema(driver=None, database: str = None) -> Dict[str, Any]:
+    """
+    Read labels, relationship types and property keys from the live database.
+
+    Uses the built-in db.schema procedures. nodeTypeProperties and
+    relTypeProperties scan or sample the store to find property types, so
+    this is expensive on large graphs; callers should cache the result
+    (llm.schema_prompt re-reads it at most once per SCHEMA_CACHE_TTL_SECONDS).
+
+    Args:
+        driver: Neo4j driver to use (defaults to the db.neo4j_client driver)
+        database: Database name (defaults to NEO4J_DATABASE)
+
+    Returns:
+        Dictionary with 'nodes' ({label: {property: type}}), 'relationships'
+        ({type: {property: type}}) and 'patterns' (sorted [source, type, target] triples)
+    """
+    if driver is None or database is None:
+        from db import neo4j_client
+        driver = driver or neo4j_client.get_driver()
+        database = database or neo4j_client.NEO4J_DATABASE
+
+    nodes: Dict[str, Dict[str, str]] = {}
+    relationships: Dict[str, Dict[str, str]] = {}
+    with driver.session(database=database) as session:
+        for record in session.run(NODE_PROPERTIES_QUERY):
+            for label in record["nodeLabels"]:
+                properties = nodes.setdefault(label, {})
+                if record["propertyName"]:
+                    properties[record["propertyName"]] = _property_type(record["propertyTypes"])
+        for record in session.run(RELATIONSHIP_PROPERTIES_QUERY):
+            properties = relationships.setdefault(record["relType"].lstrip(":").strip("`"), {})
+            if record["propertyName"]:
+                properties[record["propertyName"]] = _property_type(record["propertyTypes"])
+        patterns = sorted([record["source"], record["type"], record["target"]]
+                          for record in session.run(RELATIONSHIP_PATTERNS_QUERY))
+
+    return {"nodes": nodes, "relationships": relationships, "patterns": patterns}
+
+
+def _property_type(types: List[str]) -> str:
+    """Collapse the driver's property type list ("String", "Long", ...) to one name."""
+    types = types or []
+    return types[0] if len(types) == 1 else "|".join(types) or "Any"
+
+
+if __name__ == "__main__":
+    failures = ensure_schema(force=True)
+    if failures:
+        print(f"⚠️  {len(failures)} schema statement(s) failed")
+    else:
+        print("✅ Schema is up to date.")
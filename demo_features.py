@@ -166,8 +166,8 @@ def main():
     print("  1. Ensure Neo4j database is running")
     print("  2. Set up your .env file with credentials")
     print("  3. Run: streamlit run app.py")
-    print("\n🧪 To run tests:")
-    print("  python test_features.py")
+    print("\n📊 To run the benchmark suite (no database or API key needed):")
+    print("  python -m benchmarks.bench_suite --baseline benchmarks/baseline.json")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
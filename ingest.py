@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Headless bulk ingestion of PDF files into Neo4j.
+
+Runs a staged pipeline
+
+    discover -> extract (+ tables) -> key information -> [embed passages] -> graph write
+
+with bounded queues between stages (so a slow database throttles extraction
+instead of buffering documents in memory) and separate concurrency per stage.
+Extraction runs in a process pool; the other stages use threads. The embed
+stage only runs when the passage index is enabled (PDF_VECTOR_INDEX_DIR).
+Tables are extracted with pdfplumber only from pages whose text looks
+tabular (see utils.tables).
+
+Finished files are appended to a checkpoint file, so a killed run can be
+restarted with the same arguments and only processes what is left.
+
+Usage:
+    python ingest.py /archive/pdfs --extract-workers 8 --write-workers 2
+"""
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()  # Before any project module reads its settings from the environment
+
+_DONE = object()  # end-of-stream marker passed between stages
+
+
+class Checkpoint:
+    """Append-only record of files that were fully ingested."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._done = set()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        self._done.add(json.loads(line)["key"])
+        self._file = open(path, "a", encoding="utf-8")
+
+    @staticmethod
+    def key_for(path: Path) -> str:
+        """Identify a file by path, size and modification time."""
+        stat = path.stat()
+        return f"{path.resolve()}|{stat.st_size}|{int(stat.st_mtime)}"
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._done
+
+    def __len__(self) -> int:
+        return len(self._done)
+
+    def mark_done(self, key: str, filename: str):
+        with self._lock:
+            self._done.add(key)
+            self._file.write(json.dumps({"key": key, "filename": filename}) + "\n")
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class StageStats:
+    """Thread-safe counters for one pipeline stage."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.pages = 0
+        self.bytes = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, pages: int = 0, size: int = 0):
+        with self._lock:
+            self.items += 1
+            self.pages += pages
+            self.bytes += size
+            self.busy_seconds += seconds
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def report(self, wall_seconds: float) -> str:
+        wall_seconds = max(wall_seconds, 1e-9)
+        return (f"{self.name:>9}: {self.items} files, {self.pages} pages, {self.errors} errors | "
+                f"{self.items / wall_seconds:.2f} files/s, {self.pages / wall_seconds:.1f} pages/s, "
+                f"{self.bytes / wall_seconds / 1e6:.2f} MB/s | busy {self.busy_seconds:.1f}s")
+
+
+def discover_pdfs(paths: List[str], pattern: str = "*.pdf", recursive: bool = True) -> Iterator[tuple]:
+    """Yield (path, document filename) for each PDF under the given files or directories."""
+    for root in map(Path, paths):
+        if root.is_file():
+            yield root, root.name
+            continue
+        matches = root.rglob(pattern) if recursive else root.glob(pattern)
+        for path in sorted(matches):
+            if path.is_file():
+                yield path, path.relative_to(root).as_posix()
+
+
+def _extract(path: str, workers: int, table_workers: int) -> Optional[Dict[str, any]]:
+    """Extraction stage body (runs in a worker process); table_workers=0 skips tables."""
+    from utils.pdf_processor import PDFProcessor
+    return PDFProcessor.extract_text_from_pdf(path, include_extracted_text=False, workers=workers,
+                                              include_tables=table_workers > 0, table_workers=table_workers)
+
+
+class IngestPipeline:
+    """Staged, checkpointed ingestion of many PDF files."""
+
+    def __init__(self, checkpoint: Checkpoint, extract_workers: int = 4, key_info_workers: int = 1,
+                 write_workers: int = 2, queue_size: int = 8, batch_size: Optional[int] = None,
+                 pages_workers: int = 1, embed_workers: int = 1, table_workers: int = 1, log=print):
+        self.checkpoint = checkpoint
+        self.extract_workers = extract_workers
+        self.key_info_workers = key_info_workers
+        self.write_workers = write_workers
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.pages_workers = pages_workers
+        self.embed_workers = embed_workers
+        self.table_workers = table_workers
+        self.log = log
+        self.stats = {name: StageStats(name) for name in ("discover", "extract", "key_info", "embed", "write")}
+        self.skipped = 0
+
+    def _run_stage(self, name: str, workers: int, inbox: queue.Queue, outbox: Optional[queue.Queue], handle):
+        """Start worker threads for a stage; the last one to finish forwards the end marker."""
+        remaining = [workers]
+        lock = threading.Lock()
+
+        def worker():
+            while True:
+                item = inbox.get()
+                if item is _DONE:
+                    inbox.put(_DONE)  # let sibling workers see it too
+                    break
+                start = time.perf_counter()
+                try:
+                    result = handle(item)
+                except Exception as e:
+                    self.stats[name].record_error()
+                    self.log(f"❌ {name} failed for {item['filename']}: {e}")
+                    continue
+                if result is None:
+                    continue
+                pdf_data = result.get("pdf_data") or {}
+                self.stats[name].record(time.perf_counter() - start,
+                                        pages=len(pdf_data.get("text_content", [])),
+                                        size=pdf_data.get("file_size", 0))
+                if outbox is not None:
+                    outbox.put(result)
+            with lock:
+                remaining[0] -= 1
+                if remaining[0] == 0 and outbox is not None:
+                    outbox.put(_DONE)
+
+        threads = [threading.Thread(target=worker, name=f"{name}-{i}", daemon=True) for i in range(workers)]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def run(self, paths: List[str], pattern: str = "*.pdf", recursive: bool = True) -> Dict[str, StageStats]:
+        from db.neo4j_client import find_duplicate_document, record_document_alias, save_pdf_document_to_neo4j
+        from utils.pdf_processor import PDFProcessor
+        from utils.key_info import get_corpus_stats
+        from utils.search_index import get_search_index
+        from utils.tracing import get_tracer, run_traced, write_prometheus
+        from utils.vector_index import get_vector_index, split_passages
+
+        vector_index = get_vector_index()
+        to_extract = queue.Queue(maxsize=self.queue_size)
+        to_key_info = queue.Queue(maxsize=self.queue_size)
+        to_embed = queue.Queue(maxsize=self.queue_size)
+        to_write = queue.Queue(maxsize=self.queue_size)
+
+        pool = ProcessPoolExecutor(max_workers=self.extract_workers)
+
+        def extract(item):
+            duplicate_of = find_duplicate_document(PDFProcessor.file_hash(item["path"]), item["filename"])
+            if duplicate_of is not None:
+                if duplicate_of != item["filename"]:
+                    record_document_alias(duplicate_of, item["filename"])
+                self.checkpoint.mark_done(item["key"], item["filename"])
+                self.log(f"⏭️  {item['filename']} is identical to {duplicate_of}, skipped")
+                return None
+            # Spans recorded in the worker process are merged so the parent's metrics cover extraction
+            pdf_data, spans = pool.submit(run_traced, _extract, str(item["path"]), self.pages_workers,
+                                          self.table_workers).result()
+            get_tracer().merge(spans)
+            if pdf_data is None:
+                raise ValueError("could not read PDF")
+            pdf_data["filename"] = item["filename"]
+            return dict(item, pdf_data=pdf_data)
+
+        def key_info(item):
+            pdf_data = item["pdf_data"]
+            pdf_data["key_info"] = PDFProcessor.extract_key_information(pdf_data["text_content"],
+                                                                       document_id=pdf_data["content_hash"])
+            return item
+
+        def embed(item):
+            pdf_data = item["pdf_data"]
+            pdf_data["passages"] = split_passages(pdf_data["filename"], pdf_data["text_content"])
+            pdf_data["passage_vectors"] = vector_index.embedder.embed([p["text"] for p in pdf_data["passages"]])
+            return item
+
+        def write(item):
+            result = save_pdf_document_to_neo4j(item["pdf_data"], batch_size=self.batch_size)
+            self.checkpoint.mark_done(item["key"], item["filename"])
+            self.log(f"✅ {item['filename']} ({item['pdf_data']['total_pages']} pages, {result['status']}, "
+                     f"{result['pages_written']} written, {result['pages_deleted']} deleted, "
+                     f"{result.get('tables_written', 0)} tables)")
+            return item
+
+        started = time.perf_counter()
+        threads = self._run_stage("extract", self.extract_workers, to_extract, to_key_info, extract)
+        if vector_index is not None:
+            threads += (self._run_stage("key_info", self.key_info_workers, to_key_info, to_embed, key_info)
+                        + self._run_stage("embed", self.embed_workers, to_embed, to_write, embed))
+        else:
+            del self.stats["embed"]
+            threads += self._run_stage("key_info", self.key_info_workers, to_key_info, to_write, key_info)
+        threads += self._run_stage("write", self.write_workers, to_write, None, write)
+
+        try:
+            discover = self.stats["discover"]
+            for path, filename in discover_pdfs(paths, pattern, recursive):
+                key = Checkpoint.key_for(path)
+                if key in self.checkpoint:
+                    self.skipped += 1
+                    continue
+                discover.record(0.0, size=path.stat().st_size)
+                to_extract.put({"path": path, "filename": filename, "key": key})
+            to_extract.put(_DONE)
+
+            for thread in threads:
+                thread.join()
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+        for local_index in (get_search_index(), vector_index, get_corpus_stats()):
+            if local_index is not None:
+                local_index.flush()
+        write_prometheus()  # when TRACE_PROMETHEUS_PATH is set
+
+        self.wall_seconds = time.perf_counter() - started
+        return self.stats
+
+    def report(self) -> str:
+        lines = [f"Skipped {self.skipped} already ingested file(s); wall time {self.wall_seconds:.1f}s"]
+        lines.extend(stats.report(self.wall_seconds) for stats in self.stats.values())
+        return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="PDF files or directories to ingest")
+    parser.add_argument("--pattern", default="*.pdf", help="Glob pattern for files in directories")
+    parser.add_argument("--no-recursive", action="store_true", help="Do not descend into subdirectories")
+    parser.add_argument("--checkpoint", default=".ingest_checkpoint.jsonl", help="Checkpoint file path")
+    parser.add_argument("--extract-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--pages-workers", type=int, default=1,
+                        help="Process pool size for page extraction within one large file")
+    parser.add_argument("--table-workers", type=int, default=1,
+                        help="Process pool size for table extraction within one file (0 disables tables)")
+    parser.add_argument("--key-info-workers", type=int, default=1)
+    parser.add_argument("--embed-workers", type=int, default=1,
+                        help="Passage embedding threads (only used when PDF_VECTOR_INDEX_DIR is set)")
+    parser.add_argument("--write-workers", type=int, default=2)
+    parser.add_argument("--queue-size", type=int, default=8, help="Maximum items waiting between stages")
+    parser.add_argument("--batch-size", type=int, default=None, help="Rows per UNWIND batch when writing")
+    args = parser.parse_args(argv)
+
+    checkpoint = Checkpoint(args.checkpoint)
+    pipeline = IngestPipeline(
+        checkpoint,
+        extract_workers=args.extract_workers,
+        key_info_workers=args.key_info_workers,
+        write_workers=args.write_workers,
+        queue_size=args.queue_size,
+        batch_size=args.batch_size,
+        pages_workers=args.pages_workers,
+        embed_workers=args.embed_workers,
+        table_workers=args.table_workers
+    )
+    try:
+        pipeline.run(args.paths, args.pattern, recursive=not args.no_recursive)
+    finally:
+        checkpoint.close()
+    print(pipeline.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""
+Shared, lazily constructed OpenAI client.
+
+Nothing is imported or read from the environment until the first LLM call,
+so importing the llm package is cheap and works without network access.
+"""
+import os
+import threading
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_openai_client():
+    """Return the process-wide OpenAI client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import openai
+                from dotenv import load_dotenv
+
+                load_dotenv()
+                # Retries are owned by llm.gateway (LLM_MAX_RETRIES), which also counts them
+                _client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+    return _client
+
+
+def set_openai_client(client):
+    """Replace the process-wide client (e.g. with a test double); returns the previous one."""
+    global _client
+    with _client_lock:
+        previous, _client = _client, client
+    return previous
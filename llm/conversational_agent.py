@@ -1,17 +1,25 @@
-import os
-import openai
-from dotenv import load_dotenv
-from typing import List, Dict, Any
-import json
+import time
+from collections import deque
+from typing import List, Dict, Any, Iterator
 
-load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
+from llm.gateway import get_gateway
+from llm.memory import ConversationMemory
+from llm.tokens import estimate_tokens
+
+# Prompt tokens reserved for retrieved document passages
+PASSAGE_CONTEXT_TOKENS = 1500
+# Per-turn latency records kept for inspection
+TURN_METRICS_KEPT = 100
 
 class ConversationalAgent:
     """Enhanced conversational agent that maintains context and provides intelligent responses."""
     
-    def __init__(self):
-        self.conversation_history = []
+    def __init__(self, passage_token_budget: int = PASSAGE_CONTEXT_TOKENS, session_id: str = None,
+                 memory: ConversationMemory = None):
+        self.memory = memory if memory is not None else ConversationMemory(session_id=session_id)
+        self.passage_token_budget = passage_token_budget
+        self.turn_metrics = deque(maxlen=TURN_METRICS_KEPT)
+        self.last_response = None
         self.system_prompt = """You are an intelligent AI assistant specialized in Neo4j graph databases and PDF document analysis. 
         
 Your capabilities include:
@@ -38,43 +46,46 @@ Available functions:
 - Explain graph relationships
 - Provide data insights"""
     
+    @property
+    def conversation_history(self) -> List[Dict[str, str]]:
+        """Buffered messages as dictionaries with role, content and ISO timestamp."""
+        return [message.to_dict() for message in self.memory.recent()]
+    
     def add_message(self, role: str, content: str):
         """Add a message to the conversation history."""
-        self.conversation_history.append({
-            "role": role,
-            "content": content,
-            "timestamp": "now"  # Could be enhanced with actual timestamps
-        })
+        self.memory.add(role, content)
     
     def get_context_summary(self) -> str:
         """Generate a summary of the conversation context."""
-        if len(self.conversation_history) <= 2:
+        if self.memory.total_messages <= 2:
             return "New conversation started."
         
-        # Get last few messages for context
-        recent_messages = self.conversation_history[-4:]
-        context_parts = []
-        
-        for msg in recent_messages:
-            if msg["role"] == "user":
-                context_parts.append(f"User asked: {msg['content'][:100]}...")
-            elif msg["role"] == "assistant":
-                context_parts.append(f"Assistant responded: {msg['content'][:100]}...")
-        
-        return " | ".join(context_parts)
+        return self.memory.context()
     
-    def generate_response(self, user_input: str, pdf_context: str = None, graph_context: str = None) -> Dict[str, Any]:
+    def retrieve_passages(self, query: str, top_k: int = 8) -> List[Dict[str, Any]]:
         """
-        Generate a contextual response based on user input and available context.
+        Find the document passages most relevant to a query that fit the passage token budget.
         
-        Args:
-            user_input: The user's message
-            pdf_context: Information about uploaded PDFs
-            graph_context: Information about the graph database
-            
-        Returns:
-            Dictionary containing response type, content, and any additional data
+        Uses the local passage index (utils.vector_index); returns an empty
+        list when it is not enabled.
         """
+        from utils.vector_index import get_vector_index
+        
+        index = get_vector_index()
+        if index is None:
+            return []
+        index.refresh()  # pick up documents saved by other processes (e.g. ingest.py)
+        
+        packed, used = [], 0
+        for passage in index.search([query], top_k)[0]:
+            cost = estimate_tokens(passage['text']) + 10  # plus the source header
+            if used + cost <= self.passage_token_budget:
+                packed.append(passage)
+                used += cost
+        return packed
+    
+    def _prepare_turn(self, user_input: str, pdf_context: str = None, graph_context: str = None):
+        """Record the user message and build the chat messages; returns (messages, passages)."""
         # Add user message to history
         self.add_message("user", user_input)
         
@@ -84,6 +95,11 @@ Available functions:
             context_parts.append(f"PDF Context: {pdf_context}")
         if graph_context:
             context_parts.append(f"Graph Context: {graph_context}")
+        passages = self.retrieve_passages(user_input)
+        if passages:
+            context_parts.append("Relevant document passages:\n" + "\n".join(
+                f"[{p['filename']}, page {p['page']}] {p['text']}" for p in passages
+            ))
         
         full_context = " | ".join(context_parts)
         
@@ -92,40 +108,107 @@ Available functions:
             {"role": "system", "content": self.system_prompt.format(context=full_context)},
             {"role": "user", "content": user_input}
         ]
+        return messages, passages
+    
+    def _finish_turn(self, user_input: str, assistant_response: str, passages: List[Dict[str, Any]],
+                     started: float, first_token_at: float) -> Dict[str, Any]:
+        """Record the assistant message and turn latency; returns the response dictionary."""
+        # Add assistant response to history
+        self.add_message("assistant", assistant_response)
         
-        try:
-            response = openai.chat.completions.create(
-                model="gpt-4",
-                messages=messages,
-                temperature=0.7,
-                max_tokens=500
-            )
-            
-            assistant_response = response.choices[0].message.content.strip()
-            
-            # Add assistant response to history
-            self.add_message("assistant", assistant_response)
-            
-            # Determine response type and additional actions
-            response_data = {
-                "type": "conversation",
-                "content": assistant_response,
-                "conversation_history": self.conversation_history[-6:],  # Last 6 messages
-                "suggested_actions": self._suggest_actions(user_input, assistant_response)
-            }
+        metrics = {
+            "time_to_first_token": first_token_at - started,
+            "total_latency": time.perf_counter() - started
+        }
+        self.turn_metrics.append(metrics)
+        
+        # Determine response type and additional actions
+        self.last_response = {
+            "type": "conversation",
+            "content": assistant_response,
+            "conversation_history": [m.to_dict() for m in self.memory.recent(6)],  # Last 6 messages
+            "suggested_actions": self._suggest_actions(user_input, assistant_response),
+            "sources": [{"filename": p['filename'], "page": p['page']} for p in passages],
+            "metrics": metrics
+        }
+        return self.last_response
+    
+    def _error_turn(self, error: Exception, partial_response: str = "") -> Dict[str, Any]:
+        """
+        Record a failed turn; returns the response dictionary.
+
+        'content' holds only what the model produced before the failure and
+        'error' the message to show, so error text never becomes part of a reply.
+        """
+        error_response = f"I apologize, but I encountered an error: {str(error)}. Please try again."
+        # Memory keeps the partial answer when there is one, so the next turn sees what was said
+        self.add_message("assistant", partial_response or error_response)
+        
+        self.last_response = {
+            "type": "error",
+            "content": partial_response,
+            "error": error_response,
+            "conversation_history": [m.to_dict() for m in self.memory.recent(6)],
+            "suggested_actions": []
+        }
+        return self.last_response
+    
+    def generate_response(self, user_input: str, pdf_context: str = None, graph_context: str = None) -> Dict[str, Any]:
+        """
+        Generate a contextual response based on user input and available context.
+        
+        Args:
+            user_input: The user's message
+            pdf_context: Information about uploaded PDFs
+            graph_context: Information about the graph database
             
-            return response_data
+        Returns:
+            Dictionary containing response type, content, and any additional data
+        """
+        messages, passages = self._prepare_turn(user_input, pdf_context, graph_context)
+        started = time.perf_counter()
+        
+        try:
+            assistant_response = get_gateway().chat(messages, temperature=0.7, max_tokens=500)
+            finished = time.perf_counter()
+            return self._finish_turn(user_input, assistant_response, passages, started, finished)
             
         except Exception as e:
-            error_response = f"I apologize, but I encountered an error: {str(e)}. Please try again."
-            self.add_message("assistant", error_response)
-            
-            return {
-                "type": "error",
-                "content": error_response,
-                "conversation_history": self.conversation_history[-6:],
-                "suggested_actions": []
-            }
+            return self._error_turn(e)
+    
+    def generate_response_stream(self, user_input: str, pdf_context: str = None,
+                                 graph_context: str = None) -> Iterator[str]:
+        """
+        Streaming variant of generate_response that yields text as it arrives.
+        
+        The complete message is added to the conversation history when the
+        stream ends, and the dictionary generate_response would have returned
+        (including 'metrics' with time_to_first_token and total_latency) is
+        available as self.last_response afterwards. Only model output is
+        yielded: on failure self.last_response has type 'error' with the
+        message under 'error'. If the caller stops iterating early (e.g. a
+        Streamlit rerun), the partial answer is still recorded.
+        """
+        messages, passages = self._prepare_turn(user_input, pdf_context, graph_context)
+        started = time.perf_counter()
+        first_token_at = None
+        parts = []
+        recorded = False
+        
+        try:
+            for token in get_gateway().stream_chat(messages, temperature=0.7, max_tokens=500):
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                parts.append(token)
+                yield token
+        except Exception as e:
+            self._error_turn(e, "".join(parts).strip())
+            recorded = True
+        finally:
+            if not recorded:
+                # Reached on normal completion and when the generator is closed mid-stream
+                self._finish_turn(user_input, "".join(parts).strip(), passages, started,
+                                  first_token_at or time.perf_counter())
     
     def _suggest_actions(self, user_input: str, response: str) -> List[str]:
         """Suggest relevant actions based on the conversation."""
@@ -160,16 +243,19 @@ Available functions:
     
     def clear_history(self):
         """Clear the conversation history."""
-        self.conversation_history = []
+        self.memory.clear()
     
     def get_conversation_summary(self) -> str:
         """Get a summary of the entire conversation."""
-        if not self.conversation_history:
+        if not self.memory.total_messages:
             return "No conversation history."
         
         summary_parts = []
-        for i, msg in enumerate(self.conversation_history):
-            role = "User" if msg["role"] == "user" else "Assistant"
-            summary_parts.append(f"{i+1}. {role}: {msg['content'][:100]}...")
+        if self.memory.summary:
+            summary_parts.append(f"Earlier:\n{self.memory.summary}")
+        first = self.memory.total_messages - len(self.memory) + 1
+        for i, msg in enumerate(self.memory.recent(), start=first):
+            role = "User" if msg.role == "user" else "Assistant"
+            summary_parts.append(f"{i}. {role}: {msg.content[:100]}...")
         
         return "\n".join(summary_parts) 
\ No newline at end of file
@@ -0,0 +1,200 @@
+"""
+Cache of generated Cypher queries.
+
+generate_cypher_query asks the LLM to translate a question into Cypher. The
+answer only depends on the question, the prompt template and the graph
+schema, so it is cached under
+
+    sha256(fingerprint + normalised question)
+
+where the fingerprint hashes the template, schema and model. Editing the
+template or changing the schema produces a new fingerprint, so stale
+queries are never returned. Entries of every fingerprint live side by side,
+so processes using different models (or briefly seeing different schema
+versions) share the file without evicting each other.
+
+Lookups go to an in-memory LRU first and then to a SQLite file shared by
+every process on the host (set CYPHER_CACHE_PATH to an empty value to keep
+the cache in memory only). Entries expire after CYPHER_CACHE_TTL_SECONDS;
+expired rows, including those of fingerprints no longer in use, are
+removed at most once per CYPHER_CACHE_PURGE_SECONDS.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+CYPHER_CACHE_PATH = os.getenv("CYPHER_CACHE_PATH", ".cypher_cache.sqlite3")
+CYPHER_CACHE_TTL_SECONDS = float(os.getenv("CYPHER_CACHE_TTL_SECONDS", "86400"))
+CYPHER_CACHE_MAX_ENTRIES = int(os.getenv("CYPHER_CACHE_MAX_ENTRIES", "1024"))
+CYPHER_CACHE_PURGE_SECONDS = float(os.getenv("CYPHER_CACHE_PURGE_SECONDS", "3600"))
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """Case-fold, collapse whitespace and drop trailing punctuation."""
+    return _WHITESPACE_RE.sub(" ", question.casefold()).strip().rstrip("?!. ")
+
+
+def prompt_fingerprint(*parts: str) -> str:
+    """Hash everything besides the question that shapes the generated query."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class CypherCache:
+    """Two-level (memory LRU, then SQLite) cache with a TTL."""
+
+    def __init__(self, path: Optional[str] = CYPHER_CACHE_PATH, ttl_seconds: float = CYPHER_CACHE_TTL_SECONDS,
+                 max_entries: int = CYPHER_CACHE_MAX_ENTRIES):
+        """
+        Args:
+            path: SQLite file shared between processes; None or "" keeps entries in memory only
+            ttl_seconds: Age after which an entry is ignored and removed
+            max_entries: Entries kept in the in-memory LRU
+        """
+        self.path = path or None
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (cypher, created)
+        self._last_purge = 0.0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._db = None
+        if self.path:
+            self._db = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cypher_cache ("
+                " key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, question TEXT NOT NULL,"
+                " cypher TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS cypher_cache_created ON cypher_cache (created)")
+
+    @staticmethod
+    def key(question: str, fingerprint: str) -> str:
+        return hashlib.sha256(f"{fingerprint}\0{normalize_question(question)}".encode("utf-8")).hexdigest()
+
+    def _expired(self, created: float) -> bool:
+        return time.time() - created > self.ttl_seconds
+
+    def _remember(self, key: str, cypher: str, created: float):
+        self._memory[key] = (cypher, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _purge_expired(self, now: float):
+        """Remove expired rows from the SQLite file, at most once per CYPHER_CACHE_PURGE_SECONDS."""
+        if self._db is None or now - self._last_purge < CYPHER_CACHE_PURGE_SECONDS:
+            return
+        self._last_purge = now
+        self._db.execute("DELETE FROM cypher_cache WHERE created < ?", (now - self.ttl_seconds,))
+
+    def get(self, question: str, fingerprint: str) -> Optional[str]:
+        """Return the cached query for a question, or None."""
+        key = self.key(question, fingerprint)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and not self._expired(entry[1]):
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self._memory.pop(key, None)
+
+            if self._db is not None:
+                row = self._db.execute("SELECT cypher, created FROM cypher_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    if not self._expired(row[1]):
+                        self._remember(key, row[0], row[1])
+                        self.disk_hits += 1
+                        return row[0]
+                    self._db.execute("DELETE FROM cypher_cache WHERE key = ?", (key,))
+            self.misses += 1
+            return None
+
+    def put(self, question: str, fingerprint: str, cypher: str):
+        key = self.key(question, fingerprint)
+        created = time.time()
+        with self._lock:
+            self._purge_expired(created)
+            self._remember(key, cypher, created)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO cypher_cache (key, fingerprint, question, cypher, created)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (key, fingerprint, normalize_question(question), cypher, created)
+                )
+
+    def delete(self, question: str, fingerprint: str):
+        """Forget the cached query for a question (e.g. one the guard rejected)."""
+        key = self.key(question, fingerprint)
+        with self._lock:
+            self._memory.pop(key, None)
+            if self._db is not None:
+                self._db.execute("DELETE FROM cypher_cache WHERE key = ?", (key,))
+
+    def get_or_generate(self, question: str, fingerprint: str, generate: Callable[[], str]) -> str:
+        """Return the cached query or call generate() and cache a non-empty result."""
+        cypher = self.get(question, fingerprint)
+        if cypher is None:
+            cypher = generate()
+            if cypher:
+                self.put(question, fingerprint, cypher)
+        return cypher
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM cypher_cache")
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters since this cache was created."""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory)
+            }
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+_cache: Optional[CypherCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cypher_cache() -> CypherCache:
+    """Return the process-wide cache, opening it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = CypherCache()
+    return _cache
+
+
+def set_cypher_cache(cache: Optional[CypherCache]) -> Optional[CypherCache]:
+    """Replace the process-wide cache; returns the previous one."""
+    global _cache
+    with _cache_lock:
+        previous, _cache = _cache, cache
+    return previous
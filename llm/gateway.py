@@ -0,0 +1,254 @@
+"""
+Single entry point for chat completions.
+
+LLMGateway wraps a backend with a per-call timeout, a process-wide
+concurrency limit, retries with jittered exponential backoff and latency /
+token metrics. Two backends are provided:
+
+    openai  the shared OpenAI client from llm.client (one pooled HTTP client)
+    fake    a deterministic local stand-in, for offline runs and load tests
+
+The backend and model are chosen with LLM_BACKEND and LLM_MODEL.
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterator, List, Optional
+
+from llm.tokens import estimate_tokens
+from utils.tracing import span
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4")
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+# Simulated response time of the fake backend
+LLM_FAKE_LATENCY_SECONDS = float(os.getenv("LLM_FAKE_LATENCY_SECONDS", "0"))
+
+# Exceptions worth retrying (matched by name so the openai package stays optional)
+_RETRYABLE_ERRORS = {
+    "APITimeoutError", "APIConnectionError", "RateLimitError", "InternalServerError",
+    "TimeoutError", "ConnectionError"
+}
+
+
+class OpenAIBackend:
+    """Chat completions through the shared OpenAI client."""
+
+    def complete(self, messages: List[Dict[str, str]], model: str, temperature: float,
+                 max_tokens: Optional[int], timeout: float) -> tuple:
+        """Return (text, prompt_tokens, completion_tokens)."""
+        from llm.client import get_openai_client
+
+        options = {"max_tokens": max_tokens} if max_tokens else {}
+        response = get_openai_client().chat.completions.create(
+            model=model, messages=messages, temperature=temperature, timeout=timeout, **options
+        )
+        usage = getattr(response, "usage", None)
+        text = response.choices[0].message.content
+        if usage is None:
+            return text, _prompt_tokens(messages), estimate_tokens(text)
+        return text, usage.prompt_tokens, usage.completion_tokens
+
+    def stream(self, messages: List[Dict[str, str]], model: str, temperature: float,
+               max_tokens: Optional[int], timeout: float) -> Iterator[str]:
+        """Yield text deltas as they arrive."""
+        from llm.client import get_openai_client
+
+        options = {"max_tokens": max_tokens} if max_tokens else {}
+        chunks = get_openai_client().chat.completions.create(
+            model=model, messages=messages, temperature=temperature, timeout=timeout, stream=True, **options
+        )
+        for chunk in chunks:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+class FakeBackend:
+    """
+    Deterministic offline backend.
+
+    Cypher generation prompts get a fixed read-only query; other prompts get
+    a short reply that echoes the last user message. Output depends only on
+    the input, so runs are reproducible.
+    """
+
+    CYPHER_REPLY = "MATCH (d:Document) RETURN d.filename AS filename, d.title AS title LIMIT 25"
+
+    def __init__(self, latency_seconds: float = LLM_FAKE_LATENCY_SECONDS):
+        self.latency_seconds = latency_seconds
+        self.calls = 0
+
+    def _reply(self, messages: List[Dict[str, str]]) -> str:
+        self.calls += 1
+        prompt = messages[-1]["content"]
+        if len(messages) == 1 and "Cypher" in prompt:
+            return self.CYPHER_REPLY
+        return f"(offline) You said: {prompt[:200]}"
+
+    def complete(self, messages, model, temperature, max_tokens, timeout) -> tuple:
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        text = self._reply(messages)
+        return text, _prompt_tokens(messages), estimate_tokens(text)
+
+    def stream(self, messages, model, temperature, max_tokens, timeout) -> Iterator[str]:
+        words = self._reply(messages).split(" ")
+        for i, word in enumerate(words):
+            if self.latency_seconds:
+                time.sleep(self.latency_seconds / len(words))
+            yield word if i == 0 else " " + word
+
+
+def _prompt_tokens(messages: List[Dict[str, str]]) -> int:
+    return sum(estimate_tokens(message["content"]) + 4 for message in messages)
+
+
+class LLMMetrics:
+    """Thread-safe call, retry, latency and token counters."""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latencies = deque(maxlen=window)
+
+    def record(self, seconds: float, prompt_tokens: int, completion_tokens: int):
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.latencies.append(seconds)
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            latencies = sorted(self.latencies)
+        percentile = lambda q: latencies[min(int(q * len(latencies)), len(latencies) - 1)] if latencies else 0.0
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "latency_p50": percentile(0.5),
+            "latency_p95": percentile(0.95)
+        }
+
+
+class LLMGateway:
+    """Timeouts, concurrency limit, retries and metrics around a chat backend."""
+
+    def __init__(self, backend=None, model: str = LLM_MODEL, timeout: float = LLM_TIMEOUT_SECONDS,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY, max_retries: int = LLM_MAX_RETRIES,
+                 retry_base_seconds: float = LLM_RETRY_BASE_SECONDS):
+        """
+        Args:
+            backend: OpenAIBackend, FakeBackend or compatible object (chosen by LLM_BACKEND by default)
+            model: Default model name
+            timeout: Default per-call timeout in seconds
+            max_concurrency: Calls allowed in flight across all threads
+            max_retries: Retries after the first attempt for transient errors
+            retry_base_seconds: Backoff scale; attempt n waits up to base * 2**n seconds
+        """
+        self.backend = backend or (FakeBackend() if LLM_BACKEND == "fake" else OpenAIBackend())
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self.metrics = LLMMetrics()
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+
+    def _backoff(self, attempt: int):
+        self.metrics.record_retry()
+        time.sleep(random.uniform(0, self.retry_base_seconds * 2 ** attempt))
+
+    def _retryable(self, error: Exception, attempt: int) -> bool:
+        return attempt < self.max_retries and type(error).__name__ in _RETRYABLE_ERRORS
+
+    def chat(self, messages: List[Dict[str, str]], temperature: float = 0.7, max_tokens: int = None,
+             model: str = None, timeout: float = None) -> str:
+        """Return the completion text for a list of chat messages."""
+        with span("llm.chat") as trace:
+            for attempt in range(self.max_retries + 1):
+                started = time.perf_counter()
+                try:
+                    with self._semaphore:
+                        text, prompt_tokens, completion_tokens = self.backend.complete(
+                            messages, model or self.model, temperature, max_tokens, timeout or self.timeout
+                        )
+                except Exception as e:
+                    if self._retryable(e, attempt):
+                        self._backoff(attempt)
+                        continue
+                    self.metrics.record_error()
+                    raise
+                self.metrics.record(time.perf_counter() - started, prompt_tokens, completion_tokens)
+                trace.add(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, retries=attempt)
+                return text.strip()
+
+    def stream_chat(self, messages: List[Dict[str, str]], temperature: float = 0.7, max_tokens: int = None,
+                    model: str = None, timeout: float = None) -> Iterator[str]:
+        """
+        Yield completion text as it arrives.
+
+        Failures before the first delta are retried like chat(); once text has
+        been yielded an error is raised to the caller. The llm.stream span
+        includes the caller's time between deltas.
+        """
+        with span("llm.stream") as trace:
+            for attempt in range(self.max_retries + 1):
+                started = time.perf_counter()
+                parts = []
+                try:
+                    with self._semaphore:
+                        for delta in self.backend.stream(messages, model or self.model, temperature, max_tokens,
+                                                         timeout or self.timeout):
+                            parts.append(delta)
+                            yield delta
+                except Exception as e:
+                    if not parts and self._retryable(e, attempt):
+                        self._backoff(attempt)
+                        continue
+                    self.metrics.record_error()
+                    raise
+                prompt_tokens, completion_tokens = _prompt_tokens(messages), estimate_tokens("".join(parts))
+                self.metrics.record(time.perf_counter() - started, prompt_tokens, completion_tokens)
+                trace.add(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, retries=attempt)
+                return
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> LLMGateway:
+    """Return the process-wide gateway, creating it on first use."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway()
+    return _gateway
+
+
+def set_gateway(gateway: Optional[LLMGateway]) -> Optional[LLMGateway]:
+    """Replace the process-wide gateway (e.g. with a FakeBackend one); returns the previous one."""
+    global _gateway
+    with _gateway_lock:
+        previous, _gateway = _gateway, gateway
+    return previous
@@ -0,0 +1,184 @@
+"""
+Bounded, token-aware conversation memory.
+
+Recent messages are kept verbatim in a ring buffer limited both by message
+count and by an estimated token budget. Messages pushed out of the buffer
+are folded into a rolling summary (itself capped in tokens) rather than
+dropped, so the context handed to the LLM stays roughly the same size no
+matter how long the session runs.
+
+The default folding is extractive (the first sentence of each message) and
+needs no LLM call; pass a summarizer to ConversationMemory to replace it.
+
+Memories with a session_id are persisted to CONVERSATION_MEMORY_DIR (when
+set) after every message and restored when a memory with the same
+session_id is created.
+"""
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional
+
+from llm.tokens import estimate_tokens
+
+CONVERSATION_MEMORY_DIR = os.getenv("CONVERSATION_MEMORY_DIR")
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "1200"))
+MEMORY_MAX_MESSAGES = int(os.getenv("MEMORY_MAX_MESSAGES", "40"))
+MEMORY_SUMMARY_TOKENS = int(os.getenv("MEMORY_SUMMARY_TOKENS", "300"))
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s")
+_SESSION_ID_RE = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+class Message:
+    """One conversation message."""
+
+    __slots__ = ("role", "content", "timestamp", "tokens")
+
+    def __init__(self, role: str, content: str, timestamp: float = None):
+        self.role = role
+        self.content = content
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.tokens = estimate_tokens(content)
+
+    def to_dict(self) -> Dict[str, str]:
+        return {
+            "role": self.role,
+            "content": self.content,
+            "timestamp": datetime.fromtimestamp(self.timestamp).isoformat(timespec="seconds")
+        }
+
+    def __repr__(self) -> str:
+        return f"Message({self.role!r}, {self.content[:40]!r})"
+
+
+def _label(role: str) -> str:
+    return "User" if role == "user" else "Assistant"
+
+
+def fold_extractive(summary: str, message: Message, max_tokens: int = MEMORY_SUMMARY_TOKENS) -> str:
+    """
+    Add the gist of a message to a rolling summary.
+
+    Keeps the first sentence (at most 200 characters) of the message and
+    drops the oldest summary lines once the summary exceeds max_tokens.
+    """
+    gist = _SENTENCE_END_RE.split(message.content.strip(), maxsplit=1)[0][:200]
+    lines = [line for line in summary.split("\n") if line] + [f"{_label(message.role)}: {gist}"]
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+class ConversationMemory:
+    """Ring buffer of recent messages plus a rolling summary of older ones."""
+
+    def __init__(self, token_budget: int = MEMORY_TOKEN_BUDGET, max_messages: int = MEMORY_MAX_MESSAGES,
+                 summary_tokens: int = MEMORY_SUMMARY_TOKENS,
+                 summarizer: Optional[Callable[[str, Message], str]] = None,
+                 session_id: Optional[str] = None, directory: Optional[str] = CONVERSATION_MEMORY_DIR):
+        """
+        Args:
+            token_budget: Estimated tokens of verbatim messages to keep
+            max_messages: Maximum verbatim messages to keep
+            summary_tokens: Token cap for the rolling summary
+            summarizer: summarizer(summary, message) -> new summary, called for each
+                message leaving the buffer (defaults to fold_extractive)
+            session_id: Persist under this id (requires a directory)
+            directory: Where session files are written
+        """
+        self.token_budget = token_budget
+        self.max_messages = max_messages
+        self.summary_tokens = summary_tokens
+        self.summarizer = summarizer or (lambda summary, message: fold_extractive(summary, message, summary_tokens))
+        self.path = None
+        if session_id and directory:
+            self.path = os.path.join(directory, _SESSION_ID_RE.sub("_", session_id) + ".json")
+        self._lock = threading.RLock()
+        self._messages: deque = deque()
+        self._tokens = 0
+        self.summary = ""
+        self.total_messages = 0
+        self._context = None
+        if self.path and os.path.exists(self.path):
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def __iter__(self) -> Iterator[Message]:
+        return iter(list(self._messages))
+
+    def add(self, role: str, content: str) -> Message:
+        """Append a message, folding the oldest ones into the summary when over budget."""
+        message = Message(role, content)
+        with self._lock:
+            self._messages.append(message)
+            self._tokens += message.tokens
+            self.total_messages += 1
+            while len(self._messages) > 1 and (len(self._messages) > self.max_messages
+                                               or self._tokens > self.token_budget):
+                oldest = self._messages.popleft()
+                self._tokens -= oldest.tokens
+                self.summary = self.summarizer(self.summary, oldest)
+            self._context = None
+            if self.path:
+                self.save()
+        return message
+
+    def recent(self, count: int = None) -> List[Message]:
+        """The last count messages (all buffered messages by default)."""
+        with self._lock:
+            messages = list(self._messages)
+        return messages if count is None else messages[-count:]
+
+    def context(self) -> str:
+        """Summary of earlier turns followed by the buffered messages, for the system prompt."""
+        with self._lock:
+            if self._context is None:
+                parts = []
+                if self.summary:
+                    parts.append("Earlier in the conversation:\n" + self.summary)
+                if self._messages:
+                    parts.append("Recent messages:\n" + "\n".join(
+                        f"{_label(message.role)}: {message.content}" for message in self._messages
+                    ))
+                self._context = "\n\n".join(parts)
+            return self._context
+
+    def clear(self):
+        with self._lock:
+            self._messages.clear()
+            self._tokens = 0
+            self.summary = ""
+            self.total_messages = 0
+            self._context = None
+            if self.path and os.path.exists(self.path):
+                os.remove(self.path)
+
+    def save(self):
+        """Write the summary and buffered messages to the session file."""
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            state = {
+                "summary": self.summary,
+                "total_messages": self.total_messages,
+                "messages": [[m.role, m.content, m.timestamp] for m in self._messages]
+            }
+            with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(self.path + ".tmp", self.path)
+
+    def load(self):
+        with self._lock:
+            with open(self.path, encoding="utf-8") as f:
+                state = json.load(f)
+            self._messages = deque(Message(role, content, timestamp) for role, content, timestamp in state["messages"])
+            self._tokens = sum(message.tokens for message in self._messages)
+            self.summary = state["summary"]
+            self.total_messages = state["total_messages"]
+            self._context = None
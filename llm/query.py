@@ -1,95 +1,87 @@
+import logging
 import os
-import openai
-from dotenv import load_dotenv
+import time
+from functools import lru_cache
 
-load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
+from llm.cypher_cache import get_cypher_cache, prompt_fingerprint
+from llm.gateway import get_gateway
+from llm.schema_prompt import get_prompt_schema
+from llm.tokens import estimate_tokens
 
+logger = logging.getLogger(__name__)
+
+# Model for Cypher generation (defaults to the gateway's LLM_MODEL)
+CYPHER_MODEL = os.getenv("CYPHER_MODEL")
+PROMPT_TEMPLATE_PATH = os.getenv(
+    "PROMPT_TEMPLATE_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "prompt_template.txt")
+)
+
+@lru_cache(maxsize=None)
 def load_prompt_template():
-    with open("prompt_template.txt", "r") as f:
+    """Read the prompt template once per process."""
+    with open(PROMPT_TEMPLATE_PATH, "r") as f:
         return f.read()
 
-def generate_cypher_query(user_question):
-    prompt = load_prompt_template()
-
-    # ✅ FULL GRAPH SCHEMA (ESCAPED CURLY BRACES FOR .format() SAFETY)
-    graph_schema = """
-Nodes:
-  (:Part {{name}})
-  (:BikeModel {{name}})
-  (:BikeType {{name}})
-
-Relationships:
-  (:Part)-[:USED_IN {{{{quantity, price}}}}]->(:BikeModel)
-  (:BikeModel)-[:IS_A]->(:BikeType)
-
-Example Data:
-MERGE (p:Part {{{{name: 'Engine Assembly'}}}})
-MERGE (m:BikeModel {{{{name: 'Classic 350'}}}})
-MERGE (t:BikeType {{{{name: 'Cruiser'}}}})
-MERGE (p)-[:USED_IN {{{{quantity: 1, price: 32412.0}}}}]->(m)
-MERGE (m)-[:IS_A]->(t)
-
-MERGE (p:Part {{{{name: 'Clutch Plate'}}}})
-MERGE (m:BikeModel {{{{name: 'Classic 350'}}}})
-MERGE (t:BikeType {{{{name: 'Cruiser'}}}})
-MERGE (p)-[:USED_IN {{{{quantity: 3, price: 833.0}}}}]->(m)
-MERGE (m)-[:IS_A]->(t)
-
-MERGE (p:Part {{{{name: 'Brake Pads'}}}})
-MERGE (m:BikeModel {{{{name: 'Bullet 350'}}}})
-MERGE (t:BikeType {{{{name: 'Standard'}}}})
-MERGE (p)-[:USED_IN {{{{quantity: 3, price: 1290.0}}}}]->(m)
-MERGE (m)-[:IS_A]->(t)
-
-MERGE (p:Part {{{{name: 'Chain Sprocket Kit'}}}})
-MERGE (m:BikeModel {{{{name: 'Hunter 350'}}}})
-MERGE (t:BikeType {{{{name: 'Roadster'}}}})
-MERGE (p)-[:USED_IN {{{{quantity: 3, price: 2614.0}}}}]->(m)
-MERGE (m)-[:IS_A]->(t)
-
-MERGE (p:Part {{{{name: 'Front Suspension'}}}})
-MERGE (m:BikeModel {{{{name: 'Meteor 350'}}}})
-MERGE (t:BikeType {{{{name: 'Cruiser'}}}})
-MERGE (p)-[:USED_IN {{{{quantity: 2, price: 4020.0}}}}]->(m)
-MERGE (m)-[:IS_A]->(t)
-
-MERGE (p:Part {{{{name: 'Rear Suspension'}}}})
-MERGE (m:BikeModel {{{{name: 'Meteor 350'}}}})
-MERGE (t:BikeType {{{{name: 'Cruiser'}}}})
-MERGE (p)-[:USED_IN {{{{quantity: 2, price: 3780.0}}}}]->(m)
-MERGE (m)-[:IS_A]->(t)
-
-MERGE (p:Part {{{{name: 'Silencer'}}}})
-MERGE (m:BikeModel {{{{name: 'Classic 350'}}}})
-MERGE (t:BikeType {{{{name: 'Cruiser'}}}})
-MERGE (p)-[:USED_IN {{{{quantity: 1, price: 4560.0}}}}]->(m)
-MERGE (m)-[:IS_A]->(t)
-
-MERGE (p:Part {{{{name: 'Handlebar'}}}})
-MERGE (m:BikeModel {{{{name: 'Hunter 350'}}}})
-MERGE (t:BikeType {{{{name: 'Roadster'}}}})
-MERGE (p)-[:USED_IN {{{{quantity: 1, price: 870.0}}}}]->(m)
-MERGE (m)-[:IS_A]->(t)
-
-MERGE (p:Part {{{{name: 'Headlight'}}}})
-MERGE (m:BikeModel {{{{name: 'Bullet 350'}}}})
-MERGE (t:BikeType {{{{name: 'Standard'}}}})
-MERGE (p)-[:USED_IN {{{{quantity: 1, price: 1450.0}}}}]->(m)
-MERGE (m)-[:IS_A]->(t)
-
-MERGE (p:Part {{{{name: 'Fuel Tank'}}}})
-MERGE (m:BikeModel {{{{name: 'Meteor 350'}}}})
-MERGE (t:BikeType {{{{name: 'Cruiser'}}}})
-MERGE (p)-[:USED_IN {{{{quantity: 1, price: 5290.0}}}}]->(m)
-MERGE (m)-[:IS_A]->(t)
-""".strip()
-
-    formatted_prompt = prompt.replace("<GRAPH_SCHEMA>", graph_schema).format(question=user_question)
-
-    response = openai.chat.completions.create(
-        model="gpt-4",
-        messages=[{"role": "user", "content": formatted_prompt}],
-        temperature=0.2
-    )
-    return response.choices[0].message.content.strip()
\ No newline at end of file
+def build_prompt(user_question, graph_schema):
+    """Fill the template's <GRAPH_SCHEMA> and {question} placeholders."""
+    return load_prompt_template().format(question=user_question).replace("<GRAPH_SCHEMA>", graph_schema)
+
+def _cache_fingerprint(schema_version, model):
+    return prompt_fingerprint(load_prompt_template(), schema_version, model)
+
+def generate_cypher_query(user_question, use_cache=True):
+    """
+    Translate a question into Cypher with the LLM.
+
+    The prompt describes the live graph schema (see llm.schema_prompt).
+    Results are cached per normalised question; the cache key includes a hash
+    of the prompt template, schema version and model, so changing any of them
+    invalidates earlier answers (see llm.cypher_cache).
+    """
+    graph_schema, schema_version = get_prompt_schema()
+    gateway = get_gateway()
+    model = CYPHER_MODEL or gateway.model
+
+    def generate():
+        formatted_prompt = build_prompt(user_question, graph_schema)
+
+        started = time.perf_counter()
+        cypher = gateway.chat([{"role": "user", "content": formatted_prompt}], temperature=0.2, model=model)
+        logger.debug("Cypher generation: ~%d prompt tokens, %.2fs",
+                     estimate_tokens(formatted_prompt), time.perf_counter() - started)
+        return cypher
+
+    if not use_cache:
+        return generate()
+    return get_cypher_cache().get_or_generate(user_question, _cache_fingerprint(schema_version, model), generate)
+
+def run_cypher_question(user_question):
+    """
+    Generate Cypher for a question and run it through the guard.
+
+    The query is checked by db.cypher_guard (read-only, bounded LIMIT, plan
+    size, transaction timeout) before it reaches the database. A rejected
+    query is evicted from the Cypher cache and generated once more, so one
+    bad answer from the model is not served again for the cache's lifetime.
+
+    Returns:
+        Dictionary with the generated 'cypher', the 'executed' query and its 'rows'
+
+    Raises:
+        CypherGuardError: When the generated query is rejected
+    """
+    from db.cypher_guard import CypherGuardError, get_cypher_guard
+
+    cypher = generate_cypher_query(user_question)
+    guard = get_cypher_guard()
+    try:
+        executed = guard.check(cypher)["query"]
+    except CypherGuardError:
+        _, schema_version = get_prompt_schema()
+        fingerprint = _cache_fingerprint(schema_version, CYPHER_MODEL or get_gateway().model)
+        cache = get_cypher_cache()
+        cache.delete(user_question, fingerprint)
+        cypher = generate_cypher_query(user_question, use_cache=False)
+        executed = guard.check(cypher)["query"]
+        cache.put(user_question, fingerprint, cypher)
+    return {"cypher": cypher, "executed": executed, "rows": guard.run(cypher)}
@@ -0,0 +1,156 @@
+"""
+Compact, token-budgeted graph schema for the Cypher generation prompt.
+
+The schema is read from the live database (db.schema.introspect_schema),
+rendered as one line per label and relationship pattern, and cached for
+SCHEMA_CACHE_TTL_SECONDS. Introspection scans or samples the store, so it
+is rate-limited by the TTL alone rather than repeated after writes, which
+rarely change the schema. Each rendering carries a short version hash that
+feeds the Cypher cache fingerprint, so cached queries are regenerated when
+the schema changes.
+
+When the database cannot be reached the schema written by db.neo4j_client
+is used instead.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from llm.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_PROMPT_TOKENS = int(os.getenv("SCHEMA_PROMPT_TOKENS", "600"))
+SCHEMA_CACHE_TTL_SECONDS = float(os.getenv("SCHEMA_CACHE_TTL_SECONDS", "600"))
+
+# What db.neo4j_client writes; used when introspection fails
+FALLBACK_SCHEMA = {
+    "nodes": {
+        "Document": {
+            "filename": "String", "title": "String", "author": "String", "subject": "String",
+            "page_count": "Long", "file_size": "Long", "upload_timestamp": "String",
+            "document_type": "String", "estimated_word_count": "Long", "has_tables": "Boolean",
+            "has_numbers": "Boolean", "language": "String", "content_count": "Long",
+            "topic_count": "Long", "key_phrase_count": "Long", "aliases": "StringArray"
+        },
+        "Content": {"document_filename": "String", "page_number": "Long", "text": "String"},
+        "Topic": {"name": "String"},
+        "Table": {
+            "document_filename": "String", "page_number": "Long", "table_index": "Long",
+            "columns": "StringArray", "column_keys": "StringArray", "numeric_columns": "StringArray",
+            "row_count": "Long"
+        },
+        "TableRow": {"table_id": "String", "row_index": "Long", "cells": "StringArray"},
+        "KeyPhrase": {"phrase": "String"},
+        "Product": {
+            "name": "String", "brand": "String", "price": "Double", "discount": "Double",
+            "availability": "String", "rating": "Double", "review_count": "Long", "url": "String",
+            "category": "String"
+        }
+    },
+    "relationships": {"HAS_CONTENT": {}, "HAS_TOPIC": {}, "HAS_KEY_PHRASE": {}, "HAS_TABLE": {}, "HAS_ROW": {}},
+    "patterns": [
+        ["Content", "HAS_TABLE", "Table"],
+        ["Document", "HAS_CONTENT", "Content"],
+        ["Document", "HAS_KEY_PHRASE", "KeyPhrase"],
+        ["Document", "HAS_TOPIC", "Topic"],
+        ["Table", "HAS_ROW", "TableRow"]
+    ]
+}
+
+# Properties that only matter for bookkeeping and are left out of the prompt
+_HIDDEN_PROPERTIES = {"content_hash"}
+
+
+def _node_line(label: str, properties: Dict[str, str], max_properties: Optional[int]) -> str:
+    names = [name for name in properties if name not in _HIDDEN_PROPERTIES]
+    if max_properties is not None:
+        names = names[:max_properties]
+    if not names:
+        return f"  (:{label})"
+    return f"  (:{label} {{{', '.join(f'{name}: {properties[name]}' for name in names)}}})"
+
+
+def render_schema(schema: Dict[str, Any], token_budget: int = SCHEMA_PROMPT_TOKENS) -> str:
+    """
+    Render a schema as compact Cypher-like text within a token budget.
+
+    Relationship patterns are kept; node properties are trimmed (to the
+    first N per label, then none) until the text fits, and as a last resort
+    whole node lines are dropped from the end. Relationship lines are only
+    dropped when they alone exceed the budget.
+
+    Args:
+        schema: Output of db.schema.introspect_schema
+        token_budget: Maximum estimated tokens for the rendered text
+
+    Returns:
+        Schema text for the <GRAPH_SCHEMA> placeholder of the prompt template
+    """
+    relationship_lines = []
+    for source, rel_type, target in schema["patterns"]:
+        properties = [name for name in schema["relationships"].get(rel_type, {}) if name not in _HIDDEN_PROPERTIES]
+        suffix = f" {{{', '.join(properties)}}}" if properties else ""
+        relationship_lines.append(f"  (:{source})-[:{rel_type}{suffix}]->(:{target})")
+
+    most_properties = max((len(properties) for properties in schema["nodes"].values()), default=0)
+    for max_properties in [None] + list(range(most_properties - 1, -1, -1)):
+        lines = (["Nodes:"]
+                 + [_node_line(label, properties, max_properties)
+                    for label, properties in sorted(schema["nodes"].items())]
+                 + ["", "Relationships:"] + relationship_lines)
+        text = "\n".join(lines)
+        if estimate_tokens(text) <= token_budget:
+            return text
+
+    node_lines = lines[1:len(lines) - len(relationship_lines) - 2]
+    while True:
+        lines = ["Nodes:"] + node_lines + ["", "Relationships:"] + relationship_lines
+        if not node_lines or estimate_tokens("\n".join(lines)) <= token_budget:
+            break
+        node_lines.pop()
+    while lines and estimate_tokens("\n".join(lines)) > token_budget:
+        lines.pop()
+    return "\n".join(lines)
+
+
+_cached: Optional[Tuple[str, str]] = None  # (text, version)
+_cached_at = 0.0
+_cache_lock = threading.Lock()
+
+
+def get_prompt_schema(token_budget: int = SCHEMA_PROMPT_TOKENS, force: bool = False) -> Tuple[str, str]:
+    """
+    Return the rendered schema and its version hash.
+
+    The database is introspected at most once per SCHEMA_CACHE_TTL_SECONDS
+    (use force or invalidate_prompt_schema after a schema change).
+    """
+    global _cached, _cached_at
+    with _cache_lock:
+        if not force and _cached is not None and time.monotonic() - _cached_at < SCHEMA_CACHE_TTL_SECONDS:
+            return _cached
+
+        try:
+            from db.schema import introspect_schema
+            schema = introspect_schema()
+            if not schema["nodes"]:
+                schema = FALLBACK_SCHEMA  # empty database: describe what ingestion will create
+        except Exception as e:
+            logger.warning("Schema introspection failed, using the built-in schema: %s", e)
+            schema = FALLBACK_SCHEMA
+
+        text = render_schema(schema, token_budget)
+        _cached = (text, hashlib.sha256(text.encode("utf-8")).hexdigest()[:12])
+        _cached_at = time.monotonic()
+        return _cached
+
+
+def invalidate_prompt_schema():
+    """Force the next get_prompt_schema call to introspect the database again."""
+    global _cached
+    with _cache_lock:
+        _cached = None
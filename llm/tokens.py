@@ -0,0 +1,9 @@
+"""Cheap token estimates for prompt budgeting (no tokenizer dependency)."""
+
+# Average characters per token for English text with GPT-style tokenizers
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate number of tokens in text."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
@@ -10,3 +10,29 @@ def show_summary(summary):
 def play_audio(audio_path):
     with open(audio_path, "rb") as f:
         st.audio(f.read(), format="audio/mp3")
+
+def show_diagnostics(tracer):
+    """Per-stage p50/p95 latency table from a utils.tracing Tracer, with a Prometheus export."""
+    if not tracer.enabled:
+        st.info("Tracing is disabled (TRACING_ENABLED=0).")
+        return
+    snapshot = tracer.snapshot()
+    if not snapshot:
+        st.info("No traced activity yet.")
+        return
+    rows = []
+    for name, stats in snapshot.items():
+        totals = {key: value for key, value in stats.items()
+                  if key not in ("count", "errors", "total_ms", "p50_ms", "p95_ms")}
+        rows.append({
+            "stage": name,
+            "count": stats["count"],
+            "errors": stats["errors"],
+            "p50 ms": round(stats["p50_ms"], 1),
+            "p95 ms": round(stats["p95_ms"], 1),
+            "total s": round(stats["total_ms"] / 1000, 2),
+            "totals": ", ".join(f"{key}={value:g}" for key, value in totals.items())
+        })
+    st.dataframe(rows, hide_index=True, use_container_width=True)
+    st.download_button("Download Prometheus metrics", tracer.prometheus_text(),
+                       file_name="metrics.prom", mime="text/plain")
@@ -0,0 +1,152 @@
+"""
+Generation directories shared by the on-disk indexes.
+
+An index directory holds immutable generations and a pointer to the live one:
+
+    <directory>/CURRENT   name of the live generation, switched atomically
+    <directory>/gen-<n>/  files of generation n, never modified once published
+    <directory>/LOCK      locked by the process publishing a generation
+
+Writers hold writer_lock while they reload the latest generation, write a
+new one into a private staging directory (new_generation) and publish it
+with a rename and a CURRENT switch (publish). Readers pin the generation
+they have loaded with a shared lock on its PIN file (pin);
+remove_old_generations skips pinned generations, so files another process
+has memory-mapped are never removed from under it.
+
+On Windows only the writer lock is enforced; open files there cannot be
+deleted, so generations still in use survive until a later save.
+"""
+import os
+import re
+import shutil
+import uuid
+from contextlib import contextmanager
+from typing import IO, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+_GENERATION_RE = re.compile(r"gen-(\d+)$")
+
+
+@contextmanager
+def writer_lock(directory: str):
+    """Serialise writers of directory across processes."""
+    os.makedirs(directory, exist_ok=True)
+    with file_lock(os.path.join(directory, "LOCK")):
+        yield
+
+
+@contextmanager
+def file_lock(path: str):
+    """Hold an exclusive, cross-process lock on the file at path (created if missing)."""
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK gives up after about 10 seconds
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def current_generation(directory: str) -> Optional[str]:
+    """Name of the live generation, or None when nothing was published yet."""
+    try:
+        with open(os.path.join(directory, "CURRENT"), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def generation_number(name: Optional[str]) -> int:
+    """'gen-7' -> 7; 0 for None or any other name."""
+    match = _GENERATION_RE.match(name or "")
+    return int(match.group(1)) if match else 0
+
+
+def new_generation(directory: str) -> Tuple[int, str]:
+    """
+    Reserve the next generation; call while holding writer_lock.
+
+    Returns:
+        (generation number, private staging directory to write its files into)
+    """
+    number = max((generation_number(name) for name in os.listdir(directory)), default=0) + 1
+    staging = os.path.join(directory, f"tmp-{os.getpid()}-{uuid.uuid4().hex}")
+    os.makedirs(staging)
+    open(os.path.join(staging, "PIN"), "wb").close()
+    return number, staging
+
+
+def publish(directory: str, staging: str, number: int) -> str:
+    """Move a staged generation into place and make it current; returns its name."""
+    name = f"gen-{number}"
+    os.replace(staging, os.path.join(directory, name))
+    current = os.path.join(directory, "CURRENT")
+    with open(f"{current}.{os.getpid()}.tmp", "w", encoding="utf-8") as f:
+        f.write(name)
+    os.replace(f"{current}.{os.getpid()}.tmp", current)
+    return name
+
+
+def pin(path: str) -> Optional[IO]:
+    """
+    Keep the generation at path from being removed while it is in use.
+
+    Returns:
+        The pin (close it to release the generation), or None when the
+        generation has no PIN file
+    """
+    try:
+        f = open(os.path.join(path, "PIN"), "rb")
+    except FileNotFoundError:
+        return None
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_SH)
+    return f
+
+
+def remove_old_generations(directory: str, keep: str):
+    """Remove unpinned generations other than keep and abandoned staging directories; call while holding writer_lock."""
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.startswith("tmp-"):
+            # Staging directories are only written under the lock, so these were left by a crashed writer
+            shutil.rmtree(path, ignore_errors=True)
+        elif _GENERATION_RE.match(name) and name != keep:
+            _remove_unpinned(path)
+
+
+def _remove_unpinned(path: str):
+    try:
+        f = open(os.path.join(path, "PIN"), "rb")
+    except FileNotFoundError:
+        shutil.rmtree(path, ignore_errors=True)
+        return
+    if fcntl is None:
+        f.close()
+        shutil.rmtree(path, ignore_errors=True)
+        return
+    with f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return  # still loaded by some process
+        # Readers waiting for this lock find the generation gone and reload CURRENT
+        shutil.rmtree(path, ignore_errors=True)
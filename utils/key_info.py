@@ -0,0 +1,304 @@
+"""
+Key information extraction with corpus-level key phrases.
+
+scan_pages streams over a document's page records and collects everything
+extract_key_information needs: word count, number and table signals, header
+candidates and term frequencies (single terms and two-word phrases without
+stop words). Each page is read twice, both times in linear time: one loop
+over its lines for the layout signals, and one whitespace tokenization for
+words and terms. Tokens are normalised once per distinct word and counted
+with C-level Counter updates, so there is no Python work per token.
+
+Key phrases are ranked by TF-IDF against CorpusStats, which keeps document
+frequencies incrementally as documents are scanned, so ranking a new
+document never re-reads the corpus. Set KEY_PHRASE_STATS_PATH to persist
+the statistics between runs; processes sharing the file merge their counts
+on save instead of overwriting each other's.
+"""
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Union
+
+from utils.index_store import file_lock
+from utils.tracing import span
+
+KEY_PHRASE_STATS_PATH = os.getenv("KEY_PHRASE_STATS_PATH")
+# Persist the statistics after this many new documents or seconds, whichever comes first
+KEY_PHRASE_STATS_SAVE_EVERY_DOCS = int(os.getenv("KEY_PHRASE_STATS_SAVE_EVERY_DOCS", "50"))
+KEY_PHRASE_STATS_SAVE_EVERY_SECONDS = float(os.getenv("KEY_PHRASE_STATS_SAVE_EVERY_SECONDS", "30"))
+KEY_PHRASE_COUNT = int(os.getenv("KEY_PHRASE_COUNT", "10"))
+# Vocabulary size above which the rarest terms are pruned from the corpus statistics
+KEY_PHRASE_MAX_TERMS = int(os.getenv("KEY_PHRASE_MAX_TERMS", "500000"))
+MAX_TOPICS = 20
+
+_TERM_RE = re.compile(r"[a-z][a-z0-9'-]+")
+_DIGIT_RE = re.compile(r"\d")
+# Stands in for line breaks in the token stream, so two-word phrases never span lines
+_LINE_BREAK = "\x00"
+# Last characters of a line _NUMERIC_ROW_RE can match
+_NUMBER_END = frozenset("0123456789.,:%/)-")
+# Each match consumes the rest of its line, so these count lines rather than occurrences
+_PIPE_LINE_RE = re.compile(r"\|[^\n]*")
+_COLUMN_LINE_RE = re.compile(r"(?<=\S)(?:  +|\t)(?=\S)[^\n]*")
+# A label followed by at least two numbers, e.g. "Brake pads   3   1290.00"
+_NUMERIC_ROW_RE = re.compile(r"^[ \t]*\S+(?:[ \t]+[-+$€£(]?\d[\d.,:%/)-]*){2,}[ \t]*$", re.MULTILINE)
+
+STOP_WORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have
+having he her here hers herself him himself his how i if in into is it its itself just may me might
+more most must my myself no nor not now of off on once only or other our ours ourselves out over own
+page per same shall she should so some such than that the their theirs them themselves then there
+these they this those through to too under until up upon very was we were what when where which while
+who whom why will with within without would you your yours yourself yourselves
+""".split())
+
+
+def _term(word: str) -> Optional[str]:
+    """The term a whitespace-separated word counts as; None for stop words, numbers and line breaks."""
+    match = _TERM_RE.search(word)
+    if match is None or match.group() in STOP_WORDS:
+        return None
+    return match.group()
+
+
+def _pairs(tokens: list):
+    """Adjacent two-word phrases of tokens that are both terms."""
+    return map(" ".join, filter(all, zip(tokens, islice(tokens, 1, None))))
+
+
+class DocumentScan:
+    """Signals collected from one document."""
+
+    __slots__ = ("word_count", "bytes", "seconds", "has_numbers", "pipe_lines", "column_lines",
+                 "numeric_lines", "headers", "terms", "_terms_by_word")
+
+    def __init__(self):
+        self.word_count = 0
+        self.bytes = 0  # characters scanned; equals bytes for ASCII text
+        self.seconds = 0.0
+        self.has_numbers = False
+        self.pipe_lines = 0
+        self.column_lines = 0  # lines with whitespace-aligned columns
+        self.numeric_lines = 0  # a label followed by numbers
+        self.headers: List[str] = []
+        self.terms: Counter = Counter()
+        self._terms_by_word: Dict[str, Optional[str]] = {_LINE_BREAK: None}
+
+    @property
+    def has_tables(self) -> bool:
+        return "table" in self.terms or self.pipe_lines > 0 or min(self.column_lines, self.numeric_lines) >= 3
+
+    def add_page(self, text: str):
+        """Fold one page into the scan."""
+        self.bytes += len(text)
+        if not self.has_numbers:
+            self.has_numbers = _DIGIT_RE.search(text) is not None
+
+        for line in text.split("\n"):
+            line = line.strip()
+            if not line:
+                continue
+            if "|" in line:
+                self.pipe_lines += 1
+            if "  " in line or "\t" in line:  # inside the line, as it is stripped
+                self.column_lines += 1
+            if line[-1] in _NUMBER_END and _NUMERIC_ROW_RE.match(line):
+                self.numeric_lines += 1
+            if len(line) < 100 and line.isupper():
+                self.headers.append(line.rstrip(":"))
+            if line[-1] == ":":
+                label = line[:-1].strip()
+                if label and len(label) < 49:
+                    self.headers.append(label)
+
+        words = text.lower().replace("\n", f" {_LINE_BREAK} ").split()
+        self.word_count += len(words) - text.count("\n")
+        terms_by_word = self._terms_by_word
+        for word in set(words).difference(terms_by_word):
+            terms_by_word[word] = _term(word)
+        # Stop words, numbers and line breaks become None, which also breaks phrases
+        tokens = list(map(terms_by_word.__getitem__, words))
+        self.terms.update(filter(None, tokens))
+        self.terms.update(_pairs(tokens))
+
+
+def scan_pages(pages: Union[str, Iterable[Union[dict, str]]]) -> DocumentScan:
+    """
+    Scan a document's text once, page by page.
+
+    Args:
+        pages: Page records with 'text', plain page strings, or one text blob
+    """
+    started = time.perf_counter()
+    scan = DocumentScan()
+    for page in [pages] if isinstance(pages, str) else pages:
+        scan.add_page(page['text'] if isinstance(page, dict) else page)
+    scan.seconds = time.perf_counter() - started
+    return scan
+
+
+class CorpusStats:
+    """Incrementally maintained document frequencies for TF-IDF ranking."""
+
+    def __init__(self, path: Optional[str] = None, max_terms: int = KEY_PHRASE_MAX_TERMS):
+        self.path = path
+        self.max_terms = max_terms
+        self.documents = 0
+        self.frequencies: Counter = Counter()
+        self._seen = set()
+        self._lock = threading.Lock()
+        self._pending: List[tuple] = []  # (document_id, distinct terms) added since the last save
+        self._last_save = time.monotonic()
+        if path and os.path.exists(path):
+            self.load()
+
+    def add_document(self, terms: Iterable[str], document_id: Optional[str] = None) -> bool:
+        """Count a document's distinct terms; documents already counted under document_id are ignored."""
+        with self._lock:
+            if document_id is not None:
+                if document_id in self._seen:
+                    return False
+                self._seen.add(document_id)
+            terms = set(terms)
+            self.documents += 1
+            self.frequencies.update(terms)
+            if self.path:
+                self._pending.append((document_id, terms))
+            if len(self.frequencies) > self.max_terms:
+                self._prune()
+            return True
+
+    def _prune(self):
+        """Drop the rarest terms, keeping the vocabulary at about 3/4 of max_terms."""
+        keep = self.frequencies.most_common(self.max_terms * 3 // 4)
+        self.frequencies = Counter(dict(keep))
+
+    def idf(self, term: str) -> float:
+        return math.log((1 + self.documents) / (1 + self.frequencies.get(term, 0))) + 1.0
+
+    def rank(self, terms: Counter, top_k: int = KEY_PHRASE_COUNT) -> List[str]:
+        """Return the top_k terms of a document by TF-IDF, preferring phrases on ties."""
+        with self._lock:
+            scored = [(frequency * self.idf(term) * (1.5 if " " in term else 1.0), term)
+                      for term, frequency in terms.items()]
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [term for _, term in scored[:top_k]]
+
+    def save(self):
+        """
+        Merge the documents added since the last save into the file at path.
+
+        Saves are serialised across processes with a lock file; the latest
+        saved statistics are reloaded under the lock and this instance's new
+        documents are counted on top (skipping ids another process already
+        counted), so processes sharing the file keep each other's counts.
+        """
+        with self._lock, file_lock(self.path + ".lock"):
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            pending, self._pending = self._pending, []
+            if os.path.exists(self.path):
+                self._load_unlocked()
+                for document_id, terms in pending:
+                    if document_id is not None:
+                        if document_id in self._seen:
+                            continue
+                        self._seen.add(document_id)
+                    self.documents += 1
+                    self.frequencies.update(terms)
+                if len(self.frequencies) > self.max_terms:
+                    self._prune()
+            with open(f"{self.path}.{os.getpid()}.tmp", "w", encoding="utf-8") as f:
+                json.dump({"documents": self.documents, "frequencies": self.frequencies,
+                           "seen": sorted(self._seen)}, f, separators=(",", ":"))
+            os.replace(f"{self.path}.{os.getpid()}.tmp", self.path)
+            self._last_save = time.monotonic()
+
+    def save_if_due(self):
+        """Persist when enough documents were added or enough time passed since the last save."""
+        if self.path and self._pending and (
+                len(self._pending) >= KEY_PHRASE_STATS_SAVE_EVERY_DOCS
+                or time.monotonic() - self._last_save >= KEY_PHRASE_STATS_SAVE_EVERY_SECONDS):
+            self.save()
+
+    def flush(self):
+        if self.path and self._pending:
+            self.save()
+
+    def load(self):
+        with self._lock:
+            self._load_unlocked()
+
+    def _load_unlocked(self):
+        with open(self.path, encoding="utf-8") as f:
+            state = json.load(f)
+        self.documents = state["documents"]
+        self.frequencies = Counter(state["frequencies"])
+        self._seen = set(state["seen"])
+
+
+_corpus: Optional[CorpusStats] = None
+_corpus_lock = threading.Lock()
+
+
+def get_corpus_stats() -> CorpusStats:
+    """Return the process-wide corpus statistics (persisted when KEY_PHRASE_STATS_PATH is set)."""
+    global _corpus
+    if _corpus is None:
+        with _corpus_lock:
+            if _corpus is None:
+                import atexit
+
+                _corpus = CorpusStats(KEY_PHRASE_STATS_PATH)
+                atexit.register(lambda: _corpus is not None and _corpus.flush())
+    return _corpus
+
+
+def set_corpus_stats(corpus: Optional[CorpusStats]) -> Optional[CorpusStats]:
+    """Replace the process-wide corpus statistics; returns the previous one."""
+    global _corpus
+    with _corpus_lock:
+        previous, _corpus = _corpus, corpus
+    return previous
+
+
+def extract_key_information(pages: Union[str, Iterable[Union[dict, str]]], document_id: Optional[str] = None,
+                            corpus: Optional[CorpusStats] = None, top_k: int = KEY_PHRASE_COUNT) -> Dict[str, any]:
+    """
+    Extract key information from a document in one scan of its pages.
+
+    Args:
+        pages: Page records with 'text', plain page strings, or one text blob
+        document_id: Stable id (e.g. the content hash) so re-processing a
+            document does not count it twice in the corpus statistics
+        corpus: Corpus statistics to update and rank against (defaults to get_corpus_stats())
+        top_k: Number of key phrases to return
+
+    Returns:
+        Dictionary with document_type, main_topics (header lines), key_phrases
+        (TF-IDF ranked), estimated_word_count, has_tables, has_numbers,
+        language and scan_mb_per_s
+    """
+    with span("key_info") as trace:
+        scan = scan_pages(pages)
+        corpus = corpus if corpus is not None else get_corpus_stats()
+        corpus.add_document(scan.terms, document_id)
+        corpus.save_if_due()
+        trace.add(bytes=scan.bytes, words=scan.word_count)
+
+    return {
+        'document_type': 'PDF Document',
+        'main_topics': list(dict.fromkeys(scan.headers))[:MAX_TOPICS],
+        'key_phrases': corpus.rank(scan.terms, top_k),
+        'estimated_word_count': scan.word_count,
+        'has_tables': scan.has_tables,
+        'has_numbers': scan.has_numbers,
+        'language': 'English',  # Basic assumption, can be enhanced
+        'scan_mb_per_s': scan.bytes / scan.seconds / 1e6 if scan.seconds else 0.0
+    }
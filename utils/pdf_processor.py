@@ -1,109 +1,414 @@
-import PyPDF2
-import pdfplumber
 import io
-from typing import Dict, List, Optional
-import streamlit as st
+import os
+import sys
+import math
+import hashlib
+import logging
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from utils.tracing import get_tracer, run_traced, span
+
+# PyPDF2 and pdfplumber are imported where they are used, so importing this
+# module stays cheap for callers that never extract a PDF.
+
+logger = logging.getLogger(__name__)
+
+# Worker processes used by extract_pages_parallel (defaults to all cores)
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "0")) or os.cpu_count() or 1
+# Documents shorter than this are extracted in-process even when workers are requested
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))
+
+
+def _notify(level: str, message: str):
+    """
+    Report a problem in the Streamlit UI when running inside the app, or
+    through logging when used headless.
+    """
+    st = sys.modules.get('streamlit')
+    if st is not None:
+        from streamlit import runtime
+        if runtime.exists():
+            getattr(st, level)(message)
+            return
+    getattr(logger, level)(message)
+
+
+@contextmanager
+def _open_pdf_source(source):
+    """
+    Yield a seekable binary stream for a PDF source without copying its bytes.
+
+    Paths are opened directly, file objects and memory-mapped buffers are
+    rewound and used as-is, and bytes are wrapped in a BytesIO (which shares
+    the underlying buffer).
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            yield f
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        yield io.BytesIO(source)
+    else:
+        source.seek(0)
+        yield source
+
+
+def _source_size(source, stream) -> int:
+    """Return the size of a PDF source in bytes without reading it."""
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    if hasattr(source, 'size') and not callable(source.size):
+        return source.size  # Streamlit UploadedFile
+    position = stream.tell()
+    stream.seek(0, io.SEEK_END)
+    size = stream.tell()
+    stream.seek(position)
+    return size
+
+
+def _stream_hash(stream, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of a binary stream, read in fixed-size chunks and rewound afterwards."""
+    digest = hashlib.sha256()
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def _source_name(source) -> str:
+    """Best-effort file name for a PDF source."""
+    name = source if isinstance(source, (str, os.PathLike)) else getattr(source, 'name', None)
+    return os.path.basename(os.fspath(name)) if isinstance(name, (str, os.PathLike)) else 'document.pdf'
+
+
+def _extract_metadata(pdf_reader) -> Dict[str, any]:
+    """Read document info from a PyPDF2 reader."""
+    info = pdf_reader.metadata or {}
+    return {
+        'title': info.get('/Title', 'Unknown'),
+        'author': info.get('/Author', 'Unknown'),
+        'subject': info.get('/Subject', ''),
+        'creator': info.get('/Creator', ''),
+        'producer': info.get('/Producer', ''),
+        'creation_date': info.get('/CreationDate', ''),
+        'modification_date': info.get('/ModDate', ''),
+        'page_count': len(pdf_reader.pages)
+    }
+
+
+def _iter_stream_pages(stream, pdf_reader=None) -> Iterator[Dict[str, any]]:
+    """
+    Yield non-empty page records from an open PDF stream.
+
+    Like the parallel workers (_extract_page_range), only the pages PyPDF2
+    fails on or returns empty are re-extracted with pdfplumber, which is
+    opened on the same stream at the first such page. Time spent in each
+    parser (excluding the consumer's time between pages) is traced as
+    pdf.pypdf2 / pdf.pdfplumber.
+    """
+    import PyPDF2
+
+    tracer = get_tracer()
+    pdf_reader = pdf_reader or PyPDF2.PdfReader(stream)
+    plumber = None
+    stats = {"pdf.pypdf2": [0.0, 0, 0], "pdf.pdfplumber": [0.0, 0, 0]}  # seconds, pages, bytes
+
+    try:
+        for page_num, page in enumerate(pdf_reader.pages):
+            name = "pdf.pypdf2"
+            started = time.perf_counter()
+            try:
+                page_text = page.extract_text() or ''
+            except Exception as e:
+                _notify('warning', f"Could not extract text from page {page_num + 1} with PyPDF2: {str(e)}")
+                page_text = ''
+            if not page_text.strip():
+                stats[name][0] += time.perf_counter() - started
+                name = "pdf.pdfplumber"
+                started = time.perf_counter()
+                try:
+                    if plumber is None:
+                        import pdfplumber
+
+                        plumber = pdfplumber.open(stream)
+                    plumber_page = plumber.pages[page_num]
+                    page_text = plumber_page.extract_text() or ''
+                    plumber_page.flush_cache()
+                except Exception as e:
+                    _notify('warning', f"Could not extract text from page {page_num + 1}: {str(e)}")
+                    page_text = ''
+            stats[name][0] += time.perf_counter() - started
+            if page_text.strip():
+                stats[name][1] += 1
+                stats[name][2] += len(page_text)
+                yield {'page': page_num + 1, 'text': page_text.strip()}
+    finally:
+        if plumber is not None:
+            plumber.close()
+        if tracer.enabled:
+            for name, (seconds, pages, size) in stats.items():
+                if name == "pdf.pypdf2" or plumber is not None:
+                    tracer.record(name, seconds, {"pages": pages, "bytes": size})
+
+
+@contextmanager
+def _pdf_path(source):
+    """
+    Yield a filesystem path for a PDF source so worker processes can open it.
+
+    Paths are used directly; other sources are spilled to a temporary file in
+    fixed-size chunks, which is removed afterwards.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        yield os.fspath(source)
+        return
+
+    tmp = tempfile.NamedTemporaryFile(suffix='.pdf', delete=False)
+    try:
+        with tmp, _open_pdf_source(source) as stream:
+            shutil.copyfileobj(stream, tmp)
+        yield tmp.name
+    finally:
+        os.unlink(tmp.name)
+
+
+def _page_ranges(page_count: int, workers: int, pages_per_task: Optional[int] = None) -> List[range]:
+    """Split page indexes into contiguous ranges, a few per worker for load balancing."""
+    if page_count == 0:
+        return []
+    if not pages_per_task:
+        pages_per_task = max(1, math.ceil(page_count / (workers * 4)))
+    return [range(start, min(start + pages_per_task, page_count))
+            for start in range(0, page_count, pages_per_task)]
+
+
+def _extract_page_range(path: str, pages: range) -> List[Dict[str, any]]:
+    """
+    Extract a range of pages with PyPDF2 (runs in a worker process).
+
+    Only the pages PyPDF2 returned empty are re-extracted with pdfplumber.
+    """
+    import PyPDF2
+
+    records = []
+    empty_pages = []
+
+    with open(path, 'rb') as f:
+        with span("pdf.pypdf2") as trace:
+            pdf_reader = PyPDF2.PdfReader(f)
+            for page_num in pages:
+                try:
+                    page_text = pdf_reader.pages[page_num].extract_text() or ''
+                except Exception:
+                    page_text = ''
+                if page_text.strip():
+                    records.append({'page': page_num + 1, 'text': page_text.strip()})
+                    trace.add(pages=1, bytes=len(page_text))
+                else:
+                    empty_pages.append(page_num)
+
+        if empty_pages:
+            import pdfplumber
+
+            f.seek(0)
+            with span("pdf.pdfplumber") as trace, pdfplumber.open(f) as pdf:
+                for page_num in empty_pages:
+                    try:
+                        page = pdf.pages[page_num]
+                        page_text = page.extract_text()
+                        page.flush_cache()
+                    except Exception:
+                        continue
+                    if page_text and page_text.strip():
+                        records.append({'page': page_num + 1, 'text': page_text.strip()})
+                        trace.add(pages=1, bytes=len(page_text))
+
+    records.sort(key=lambda record: record['page'])
+    return records
+
 
 class PDFProcessor:
     """Utility class for processing PDF files and extracting content."""
     
     @staticmethod
-    def extract_text_from_pdf(pdf_file) -> Dict[str, any]:
+    def iter_pages(source) -> Iterator[Dict[str, any]]:
+        """
+        Stream page records from a PDF one at a time.
+
+        Only the current page's text is held in memory, so callers that
+        consume pages incrementally stay bounded regardless of document size.
+
+        Args:
+            source: File path, binary file object, bytes or memory-mapped buffer
+
+        Yields:
+            Dictionaries with 'page' (1-based page number) and 'text'
+        """
+        with _open_pdf_source(source) as stream:
+            yield from _iter_stream_pages(stream)
+    
+    @staticmethod
+    def extract_pages_parallel(source, workers: Optional[int] = None,
+                               pages_per_task: Optional[int] = None) -> List[Dict[str, any]]:
+        """
+        Extract all pages using a process pool.
+
+        The document is split into page ranges that are extracted by separate
+        worker processes; pdfplumber is used only for the individual pages
+        PyPDF2 returned empty. Pages are returned in document order.
+
+        Args:
+            source: File path, binary file object, bytes or memory-mapped buffer
+            workers: Number of worker processes (defaults to PDF_EXTRACT_WORKERS)
+            pages_per_task: Pages per work unit (defaults to ~4 units per worker)
+
+        Returns:
+            List of non-empty page records with 'page' and 'text'
+        """
+        import PyPDF2
+
+        workers = workers or PDF_EXTRACT_WORKERS
+        with _pdf_path(source) as path:
+            with open(path, 'rb') as f:
+                page_count = len(PyPDF2.PdfReader(f).pages)
+            ranges = _page_ranges(page_count, workers, pages_per_task)
+
+            if workers <= 1 or len(ranges) <= 1:
+                chunks = [_extract_page_range(path, pages) for pages in ranges]
+            else:
+                with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as pool:
+                    chunks = []
+                    for chunk, spans in pool.map(run_traced, [_extract_page_range] * len(ranges),
+                                                 [path] * len(ranges), ranges):
+                        chunks.append(chunk)
+                        get_tracer().merge(spans)
+
+        return [record for chunk in chunks for record in chunk]
+    
+    @staticmethod
+    def file_hash(source) -> str:
+        """
+        Compute the content hash used to detect identical PDF files.
+
+        Args:
+            source: File path, binary file object, bytes or memory-mapped buffer
+
+        Returns:
+            Hex-encoded SHA-256 of the file bytes
+        """
+        with _open_pdf_source(source) as stream:
+            return _stream_hash(stream)
+    
+    @staticmethod
+    def build_extracted_text(text_content: Iterable[Dict[str, any]]) -> str:
+        """
+        Join page records into the single text blob used for key information.
+
+        Args:
+            text_content: Page records as produced by iter_pages
+
+        Returns:
+            All pages joined with "Page N:" headers
+        """
+        return '\n\n'.join(f"Page {item['page']}:\n{item['text']}" for item in text_content)
+    
+    @staticmethod
+    def extract_text_from_pdf(pdf_file, include_extracted_text: bool = True,
+                              workers: Optional[int] = None, include_tables: bool = False,
+                              table_workers: Optional[int] = None) -> Dict[str, any]:
         """
         Extract text content and metadata from a PDF file.
         
         Args:
-            pdf_file: StreamlitUploadedFile object
+            pdf_file: StreamlitUploadedFile object, file path, binary file
+                object, bytes or memory-mapped buffer
+            include_extracted_text: Assemble the joined 'extracted_text' blob;
+                when False it is None and can be built later with
+                build_extracted_text
+            workers: Extract pages with a process pool of this size when the
+                document has at least PDF_PARALLEL_MIN_PAGES pages
+            include_tables: Also extract structured 'tables' from the pages
+                that look like they contain one (see extract_tables)
+            table_workers: Process pool size for table extraction
             
         Returns:
             Dictionary containing extracted text, metadata, and page count
         """
+        import PyPDF2
+
         try:
-            # Read the PDF file
-            pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_file.read()))
-            
-            # Extract metadata
-            metadata = {
-                'title': pdf_reader.metadata.get('/Title', 'Unknown'),
-                'author': pdf_reader.metadata.get('/Author', 'Unknown'),
-                'subject': pdf_reader.metadata.get('/Subject', ''),
-                'creator': pdf_reader.metadata.get('/Creator', ''),
-                'producer': pdf_reader.metadata.get('/Producer', ''),
-                'creation_date': pdf_reader.metadata.get('/CreationDate', ''),
-                'modification_date': pdf_reader.metadata.get('/ModDate', ''),
-                'page_count': len(pdf_reader.pages)
-            }
+            with span("pdf.extract") as trace, _open_pdf_source(pdf_file) as stream:
+                pdf_reader = PyPDF2.PdfReader(stream)
+                metadata = _extract_metadata(pdf_reader)
+                file_size = _source_size(pdf_file, stream)
+                content_hash = _stream_hash(stream)
+                if workers and workers > 1 and metadata['page_count'] >= PDF_PARALLEL_MIN_PAGES:
+                    text_content = PDFProcessor.extract_pages_parallel(pdf_file, workers=workers)
+                else:
+                    text_content = list(_iter_stream_pages(stream, pdf_reader))
+                trace.add(pages=len(text_content), bytes=file_size)
             
-            # Extract text from each page
-            text_content = []
-            for page_num, page in enumerate(pdf_reader.pages):
-                try:
-                    page_text = page.extract_text()
-                    if page_text.strip():
-                        text_content.append({
-                            'page': page_num + 1,
-                            'text': page_text.strip()
-                        })
-                except Exception as e:
-                    st.warning(f"Could not extract text from page {page_num + 1}: {str(e)}")
-            
-            # Try pdfplumber for better text extraction if PyPDF2 didn't work well
-            if not text_content:
-                pdf_file.seek(0)  # Reset file pointer
-                with pdfplumber.open(io.BytesIO(pdf_file.read())) as pdf:
-                    for page_num, page in enumerate(pdf.pages):
-                        page_text = page.extract_text()
-                        if page_text and page_text.strip():
-                            text_content.append({
-                                'page': page_num + 1,
-                                'text': page_text.strip()
-                            })
-            
-            return {
+            pdf_data = {
                 'metadata': metadata,
                 'text_content': text_content,
                 'total_pages': metadata['page_count'],
-                'extracted_text': '\n\n'.join([f"Page {item['page']}:\n{item['text']}" for item in text_content]),
-                'filename': pdf_file.name,
-                'file_size': len(pdf_file.getvalue())
+                'extracted_text': (
+                    PDFProcessor.build_extracted_text(text_content) if include_extracted_text else None
+                ),
+                'filename': _source_name(pdf_file),
+                'file_size': file_size,
+                'content_hash': content_hash
             }
+            if include_tables:
+                pdf_data['tables'] = PDFProcessor.extract_tables(pdf_file, text_content, workers=table_workers)
+            return pdf_data
             
         except Exception as e:
-            st.error(f"Error processing PDF: {str(e)}")
+            _notify('error', f"Error processing PDF: {str(e)}")
             return None
     
     @staticmethod
-    def extract_key_information(text_content: str) -> Dict[str, any]:
+    def extract_tables(source, text_content: Iterable[Dict[str, any]],
+                       workers: Optional[int] = None) -> List[Dict[str, any]]:
         """
-        Extract key information from PDF text content.
-        This is a basic implementation that can be enhanced with NLP.
+        Extract structured tables, running pdfplumber only on likely pages.
+        
+        Pages are scored from their extracted text first (see utils.tables),
+        so documents without tables cost no extra PDF parsing.
         
         Args:
-            text_content: Extracted text from PDF
+            source: File path, binary file object, bytes or memory-mapped buffer
+            text_content: Page records as produced by iter_pages
+            workers: Process pool size (defaults to TABLE_EXTRACT_WORKERS)
             
         Returns:
-            Dictionary containing key information
+            List of table dictionaries with 'page', 'columns', 'keys',
+            'numeric_columns' and 'rows'
         """
-        # Basic information extraction (can be enhanced with NLP)
-        lines = text_content.split('\n')
-        
-        # Look for common patterns
-        key_info = {
-            'document_type': 'PDF Document',
-            'main_topics': [],
-            'key_phrases': [],
-            'estimated_word_count': len(text_content.split()),
-            'has_tables': 'table' in text_content.lower() or '|' in text_content,
-            'has_numbers': any(char.isdigit() for char in text_content),
-            'language': 'English'  # Basic assumption, can be enhanced
-        }
+        from utils.tables import extract_tables
+        return extract_tables(source, text_content, workers=workers)
+    
+    @staticmethod
+    def extract_key_information(text_content, document_id: Optional[str] = None) -> Dict[str, any]:
+        """
+        Extract key information from PDF text content.
         
-        # Extract potential topics from lines that might be headers
-        for line in lines:
-            line = line.strip()
-            if line and len(line) < 100 and line.isupper():
-                key_info['main_topics'].append(line)
-            elif line and len(line) < 50 and line.endswith(':'):
-                key_info['key_phrases'].append(line)
+        Scans the text once per page (see utils.key_info); key phrases are
+        ranked by TF-IDF against the corpus seen so far.
         
-        return key_info 
\ No newline at end of file
+        Args:
+            text_content: Page records as produced by iter_pages, or the
+                joined extracted text
+            document_id: Stable document id (e.g. the content hash), so a
+                re-processed document is not counted twice in the corpus
+            
+        Returns:
+            Dictionary containing key information
+        """
+        from utils.key_info import extract_key_information
+        return extract_key_information(text_content, document_id=document_id)
@@ -0,0 +1,389 @@
+"""
+Local BM25 inverted index over PDF pages.
+
+The index lives next to the application and answers ranked multi-term
+searches without a database round trip. It is kept up to date by
+save_pdf_document_to_neo4j and persisted in a compact on-disk format:
+
+    <directory>/CURRENT            name of the live generation
+    <directory>/gen-<n>/meta.json  page table, per-document state and stats
+    <directory>/gen-<n>/terms.json term -> [offset, document frequency]
+    <directory>/gen-<n>/postings.bin  uint32 page ids, then uint32 term frequencies
+    <directory>/gen-<n>/lengths.bin   uint32 token count per page
+
+postings.bin is memory-mapped at load time, so opening a large index costs
+little more than reading the term dictionary. Updates go to an in-memory
+delta (replaced pages are tombstoned) and are merged into a new generation
+on save(); CURRENT is switched atomically so readers never see a partial
+index. Processes sharing the directory serialise saves with a lock file and
+merge each other's generations (see utils.index_store).
+
+The index is enabled by setting PDF_SEARCH_INDEX_DIR.
+"""
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import threading
+import time
+from array import array
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils.index_store import (current_generation, generation_number, new_generation, pin, publish,
+                               remove_old_generations, writer_lock)
+
+PDF_SEARCH_INDEX_DIR = os.getenv("PDF_SEARCH_INDEX_DIR")
+# Persist after this many updated documents or seconds, whichever comes first
+SEARCH_INDEX_SAVE_EVERY_DOCS = int(os.getenv("SEARCH_INDEX_SAVE_EVERY_DOCS", "50"))
+SEARCH_INDEX_SAVE_EVERY_SECONDS = float(os.getenv("SEARCH_INDEX_SAVE_EVERY_SECONDS", "30"))
+# Re-check the index against the graph this often, to notice writes from processes without the index
+SEARCH_INDEX_VERIFY_SECONDS = float(os.getenv("SEARCH_INDEX_VERIFY_SECONDS", "60"))
+
+_TOKEN_RE = re.compile(r"\w\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case word tokens of two or more characters."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """Incrementally updated BM25 index of (filename, page) entries."""
+
+    def __init__(self, directory: Optional[str] = None, k1: float = 1.2, b: float = 0.75):
+        self.directory = directory
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._pin = None
+        self._reset()
+        if directory and os.path.exists(os.path.join(directory, "CURRENT")):
+            self.load()
+
+    def _reset(self):
+        self.generation = 0
+        self._pages: List[Optional[Tuple[str, int]]] = []  # page id -> (filename, page), None when deleted
+        self._lengths = array("I")
+        self._documents: Dict[str, dict] = {}  # filename -> {"title", "content_hash", "page_ids"}
+        self._live_pages = 0
+        self._total_length = 0
+        self._base_terms: Dict[str, List[int]] = {}
+        self._base_ids = None
+        self._base_tfs = None
+        self._base_mmap = None
+        self._delta: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self._updates: Dict[str, Optional[dict]] = {}  # unsaved changes per filename, None for a removal
+        self._pending_documents = 0
+        self._last_save = time.monotonic()
+        self.stale = False
+        self.verified_at = None  # time.monotonic() of the last check against the graph
+
+    # ------------------------------------------------------------------ updates
+
+    def update_document(self, filename: str, pages: Iterable[dict], title: str = None, content_hash: str = None):
+        """
+        Replace all indexed pages of a document.
+
+        Args:
+            filename: Document filename
+            pages: Page records with 'page' and 'text'
+            title: Document title returned with search hits
+            content_hash: Document content hash, used to check the index against the graph
+        """
+        pages = list(pages)
+        with self._lock:
+            self._remove_pages(filename)
+            page_ids = []
+            for page_data in pages:
+                tokens = tokenize(page_data['text'])
+                page_id = len(self._pages)
+                self._pages.append((filename, page_data['page']))
+                self._lengths.append(len(tokens))
+                self._live_pages += 1
+                self._total_length += len(tokens)
+                frequencies = defaultdict(int)
+                for token in tokens:
+                    frequencies[token] += 1
+                for token, frequency in frequencies.items():
+                    self._delta[token][page_id] = frequency
+                page_ids.append(page_id)
+            self._documents[filename] = {"title": title, "content_hash": content_hash, "page_ids": page_ids}
+            self._updates[filename] = {"pages": pages, "title": title, "content_hash": content_hash}
+            self._pending_documents += 1
+
+    def remove_document(self, filename: str):
+        """Drop a document and its pages from the index."""
+        with self._lock:
+            self._remove_pages(filename)
+            self._documents.pop(filename, None)
+            self._updates[filename] = None
+            self._pending_documents += 1
+
+    def _remove_pages(self, filename: str):
+        document = self._documents.get(filename)
+        if not document:
+            return
+        for page_id in document["page_ids"]:
+            if self._pages[page_id] is not None:
+                self._pages[page_id] = None
+                self._live_pages -= 1
+                self._total_length -= self._lengths[page_id]
+
+    # ------------------------------------------------------------------ search
+
+    def _postings(self, term: str):
+        """Yield (page id, term frequency) for live pages containing term."""
+        entry = self._base_terms.get(term)
+        if entry is not None:
+            offset, count = entry
+            for page_id, frequency in zip(self._base_ids[offset:offset + count],
+                                          self._base_tfs[offset:offset + count]):
+                if self._pages[page_id] is not None:
+                    yield page_id, frequency
+        for page_id, frequency in self._delta.get(term, {}).items():
+            if self._pages[page_id] is not None:
+                yield page_id, frequency
+
+    def search(self, query: str, top_k: int = 10) -> List[dict]:
+        """
+        Rank pages against a free-text query with BM25.
+
+        Returns:
+            Up to top_k dictionaries with filename, page, title and score,
+            best match first
+        """
+        with self._lock:
+            if not self._live_pages:
+                return []
+            average_length = self._total_length / self._live_pages or 1.0
+            k1, b = self.k1, self.b
+            scores = defaultdict(float)
+
+            for term in dict.fromkeys(tokenize(query)):
+                postings = list(self._postings(term))
+                if not postings:
+                    continue
+                idf = math.log(1 + (self._live_pages - len(postings) + 0.5) / (len(postings) + 0.5))
+                for page_id, frequency in postings:
+                    norm = k1 * (1 - b + b * self._lengths[page_id] / average_length)
+                    scores[page_id] += idf * frequency * (k1 + 1) / (frequency + norm)
+
+            hits = []
+            for page_id, score in heapq.nlargest(top_k, scores.items(), key=lambda item: item[1]):
+                filename, page = self._pages[page_id]
+                hits.append({
+                    "filename": filename,
+                    "page": page,
+                    "title": self._documents[filename]["title"],
+                    "score": score
+                })
+            return hits
+
+    # ------------------------------------------------------------------ consistency
+
+    def documents(self) -> Dict[str, Optional[str]]:
+        """Indexed documents mapped to their content hash."""
+        with self._lock:
+            return {filename: document["content_hash"] for filename, document in self._documents.items()}
+
+    def is_stale(self) -> bool:
+        """True when the index is known to disagree with the graph."""
+        return self.stale
+
+    def needs_verification(self) -> bool:
+        """True when the index was not checked against the graph in the last SEARCH_INDEX_VERIFY_SECONDS."""
+        return self.verified_at is None or time.monotonic() - self.verified_at >= SEARCH_INDEX_VERIFY_SECONDS
+
+    def mark_verified(self, stale: bool):
+        """Record the outcome of a check against the graph."""
+        self.stale = stale
+        self.verified_at = time.monotonic()
+
+    # ------------------------------------------------------------------ persistence
+
+    def flush(self):
+        """Persist pending updates, if any."""
+        with self._lock:
+            if self._pending_documents:
+                self.save()
+
+    def save_if_due(self):
+        """Persist when enough documents changed or enough time passed since the last save."""
+        with self._lock:
+            if not self._pending_documents:
+                return
+            if (self._pending_documents >= SEARCH_INDEX_SAVE_EVERY_DOCS
+                    or time.monotonic() - self._last_save >= SEARCH_INDEX_SAVE_EVERY_SECONDS):
+                self.save()
+
+    def save(self, merge: bool = True):
+        """
+        Merge pending updates into a new on-disk generation and switch to it.
+
+        Saves are serialised across processes with a lock file. When another
+        process published a generation since this one was loaded, it is
+        loaded first and this instance's unsaved updates are replayed on top,
+        so concurrent writers never drop each other's documents.
+
+        Args:
+            merge: Build on the latest published generation; False replaces
+                it with this instance's contents (used by rebuild_search_index)
+        """
+        if not self.directory:
+            raise ValueError("BM25Index has no directory to save to")
+
+        with self._lock, writer_lock(self.directory):
+            if merge:
+                self._merge_latest()
+
+            # Renumber live pages densely and merge base + delta postings per term
+            remap = {}
+            pages, lengths = [], array("I")
+            for page_id, key in enumerate(self._pages):
+                if key is not None:
+                    remap[page_id] = len(pages)
+                    pages.append(key)
+                    lengths.append(self._lengths[page_id])
+
+            terms = {}
+            ids, tfs = array("I"), array("I")
+            for term in sorted(set(self._base_terms) | set(self._delta)):
+                postings = sorted((remap[page_id], frequency) for page_id, frequency in self._postings(term))
+                if not postings:
+                    continue
+                terms[term] = [len(ids), len(postings)]
+                ids.extend(page_id for page_id, _ in postings)
+                tfs.extend(frequency for _, frequency in postings)
+
+            documents = {
+                filename: {
+                    "title": document["title"],
+                    "content_hash": document["content_hash"],
+                    "page_ids": [remap[page_id] for page_id in document["page_ids"] if page_id in remap]
+                }
+                for filename, document in self._documents.items()
+            }
+
+            generation, target = new_generation(self.directory)
+            with open(os.path.join(target, "postings.bin"), "wb") as f:
+                ids.tofile(f)
+                tfs.tofile(f)
+            with open(os.path.join(target, "lengths.bin"), "wb") as f:
+                lengths.tofile(f)
+            with open(os.path.join(target, "terms.json"), "w", encoding="utf-8") as f:
+                json.dump(terms, f, separators=(",", ":"))
+            with open(os.path.join(target, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump({"generation": generation, "postings": len(ids), "pages": pages,
+                           "documents": documents, "k1": self.k1, "b": self.b},
+                          f, separators=(",", ":"))
+
+            name = publish(self.directory, target, generation)
+            self.load()
+            remove_old_generations(self.directory, keep=name)
+
+    def _merge_latest(self):
+        """Load a generation published by another process and replay this instance's unsaved updates on it."""
+        name = current_generation(self.directory)
+        if name is None or generation_number(name) == self.generation:
+            return
+        updates = self._updates
+        self.load()
+        for filename, update in updates.items():
+            if update is None:
+                self.remove_document(filename)
+            else:
+                self.update_document(filename, **update)
+
+    def load(self):
+        """Load the current generation, memory-mapping its posting lists."""
+        with self._lock:
+            for attempt in range(3):
+                source = os.path.join(self.directory, current_generation(self.directory) or "")
+                generation_pin = pin(source)
+                try:
+                    with open(os.path.join(source, "meta.json"), encoding="utf-8") as f:
+                        meta = json.load(f)
+                    with open(os.path.join(source, "terms.json"), encoding="utf-8") as f:
+                        terms = json.load(f)
+                    lengths = array("I")
+                    with open(os.path.join(source, "lengths.bin"), "rb") as f:
+                        lengths.frombytes(f.read())
+                    postings = None
+                    if meta["postings"]:
+                        with open(os.path.join(source, "postings.bin"), "rb") as f:
+                            postings = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    break
+                except FileNotFoundError:
+                    # Replaced and removed by another process while we were opening it
+                    if generation_pin is not None:
+                        generation_pin.close()
+                    if attempt == 2:
+                        raise
+
+            self._reset()
+            if self._pin is not None:
+                self._pin.close()
+            self._pin = generation_pin
+            self.generation = meta["generation"]
+            self.k1, self.b = meta["k1"], meta["b"]
+            self._pages = [tuple(page) for page in meta["pages"]]
+            self._documents = meta["documents"]
+            self._lengths = lengths
+            self._live_pages = len(self._pages)
+            self._total_length = sum(self._lengths)
+
+            self._base_terms = terms
+            count = meta["postings"]
+            if count:
+                self._base_mmap = postings
+                view = memoryview(self._base_mmap).cast("I")
+                self._base_ids, self._base_tfs = view[:count], view[count:]
+            else:
+                self._base_ids = self._base_tfs = array("I")
+
+    def refresh(self) -> bool:
+        """
+        Pick up a newer generation saved by another process.
+
+        Only reloads when this instance has no unsaved updates (save() merges
+        those with the newer generation). Returns True if a new generation
+        was loaded.
+        """
+        if not self.directory:
+            return False
+        with self._lock:
+            if self._pending_documents:
+                return False
+            name = current_generation(self.directory)
+            if name is None or generation_number(name) == self.generation:
+                return False
+            self.load()
+            return True
+
+
+_index: Optional[BM25Index] = None
+_index_lock = threading.Lock()
+
+
+def get_search_index() -> Optional[BM25Index]:
+    """Return the process-wide index, or None when PDF_SEARCH_INDEX_DIR is not set."""
+    global _index
+    if _index is None and PDF_SEARCH_INDEX_DIR:
+        with _index_lock:
+            if _index is None:
+                import atexit
+
+                _index = BM25Index(PDF_SEARCH_INDEX_DIR)
+                atexit.register(lambda: _index is not None and _index.flush())
+    return _index
+
+
+def set_search_index(index: Optional[BM25Index]) -> Optional[BM25Index]:
+    """Replace the process-wide index; returns the previous one."""
+    global _index
+    with _index_lock:
+        previous, _index = _index, index
+    return previous
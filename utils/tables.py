@@ -0,0 +1,200 @@
+"""
+Selective structured table extraction.
+
+Running pdfplumber's table finder on every page is far too slow for bulk
+ingestion, so pages are first scored from their already extracted text
+(score_table_likelihood): rows of numbers, pipe-separated or
+whitespace-aligned lines and "Table N" captions all count. Only pages at or
+above TABLE_SCORE_THRESHOLD are re-opened with pdfplumber, in a process pool
+when there are enough of them.
+
+Each table is returned as a plain dict:
+
+    {'page': 3, 'index': 0, 'columns': ['Part', 'Qty', 'Price'],
+     'keys': ['part', 'qty', 'price'], 'numeric_columns': ['qty', 'price'],
+     'rows': [{'cells': ['Brake pads', '3', '$1,290.00'],
+               'values': {'part': 'Brake pads', 'qty': 3.0, 'price': 1290.0}}]}
+
+'keys' are the column names turned into property names, and numeric
+columns hold floats in 'values', so db.neo4j_client can store rows as
+TableRow nodes that Cypher aggregates directly (sum(r.price)).
+"""
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+from utils.key_info import _COLUMN_LINE_RE, _NUMERIC_ROW_RE, _PIPE_LINE_RE
+from utils.tracing import get_tracer, run_traced, span
+
+# Pages scoring below this are not handed to pdfplumber
+TABLE_SCORE_THRESHOLD = float(os.getenv("TABLE_SCORE_THRESHOLD", "3"))
+# Worker processes for pdfplumber table extraction (1 extracts in-process)
+TABLE_EXTRACT_WORKERS = int(os.getenv("TABLE_EXTRACT_WORKERS", "1"))
+# Candidate pages per worker task
+TABLE_PAGES_PER_TASK = int(os.getenv("TABLE_PAGES_PER_TASK", "8"))
+# Share of non-empty cells that must parse as numbers for a column to be numeric
+TABLE_NUMERIC_SHARE = 0.6
+
+_CAPTION_RE = re.compile(r"^[ \t]*table[ \t]+[0-9ivx]+\b", re.IGNORECASE | re.MULTILINE)
+_NUMBER_RE = re.compile(r"^[-+]?(?:\d{1,3}(?:,\d{3})+|\d+)?(?:\.\d+)?$")
+_CURRENCY_CHARS = "$€£¥₹"
+_KEY_RE = re.compile(r"[^a-z0-9]+")
+# Property names db.neo4j_client sets itself on TableRow nodes
+_RESERVED_KEYS = {"table_id", "row_index", "cells"}
+
+# Fallback for tables without ruling lines, tried only when the line-based finder found nothing
+_TEXT_TABLE_SETTINGS = {"vertical_strategy": "text", "horizontal_strategy": "text"}
+
+
+def score_table_likelihood(text: str) -> float:
+    """
+    Cheap table likelihood of a page from its extracted text.
+
+    One point per numeric row (a label followed by at least two numbers) and
+    per pipe-separated line, half a point per whitespace-aligned line and
+    two points per "Table N" caption.
+    """
+    return (len(_NUMERIC_ROW_RE.findall(text)) + len(_PIPE_LINE_RE.findall(text))
+            + len(_COLUMN_LINE_RE.findall(text)) / 2 + 2 * len(_CAPTION_RE.findall(text)))
+
+
+def table_candidate_pages(text_content: Iterable[Dict[str, any]],
+                          threshold: float = TABLE_SCORE_THRESHOLD) -> List[int]:
+    """Page numbers whose text scores at or above threshold."""
+    return [page['page'] for page in text_content if score_table_likelihood(page['text']) >= threshold]
+
+
+def parse_number(value) -> Optional[float]:
+    """
+    Parse a table cell such as '1,290.00', '$12', '-4.5%', '(3)' or '15 %' as a float.
+
+    Percentages keep their written value (45% -> 45.0) and accounting-style
+    parentheses make the number negative. Returns None for anything else.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if not isinstance(value, str):
+        return None
+    text = value.replace("\u00a0", " ").strip()
+    negative = text.startswith("(") and text.endswith(")")
+    if negative:
+        text = text[1:-1].strip()
+    text = text.rstrip("%").rstrip().strip(_CURRENCY_CHARS).strip()
+    if text.startswith(tuple(_CURRENCY_CHARS), 1):
+        text = text[0] + text[2:].lstrip()  # "-$5"
+    if not text or not any(ch.isdigit() for ch in text) or not _NUMBER_RE.match(text):
+        return None
+    number = float(text.replace(",", ""))
+    return -number if negative else number
+
+
+def column_keys(columns: List[str]) -> List[str]:
+    """Turn header labels into unique, Cypher-friendly property names."""
+    keys = []
+    for i, column in enumerate(columns):
+        key = _KEY_RE.sub("_", column.lower()).strip("_")
+        if not key or key[0].isdigit() or key in _RESERVED_KEYS:
+            key = f"column_{i + 1}" if not key else f"col_{key}"
+        base, suffix = key, 2
+        while key in keys:
+            key, suffix = f"{base}_{suffix}", suffix + 1
+        keys.append(key)
+    return keys
+
+
+def structure_table(raw: List[List[Optional[str]]], page: int, index: int) -> Optional[Dict[str, any]]:
+    """
+    Build a table dict from pdfplumber rows, using the first row as the header.
+
+    Returns None for fragments with fewer than two columns or no data rows.
+    """
+    rows = [[" ".join((cell or "").split()) for cell in row] for row in raw]
+    rows = [row for row in rows if any(row)]
+    if len(rows) < 2 or max(len(row) for row in rows) < 2:
+        return None
+
+    width = max(len(row) for row in rows)
+    rows = [row + [""] * (width - len(row)) for row in rows]
+    columns, body = rows[0], rows[1:]
+    keys = column_keys(columns)
+
+    numeric = []
+    for i, key in enumerate(keys):
+        cells = [row[i] for row in body if row[i]]
+        if cells and sum(parse_number(cell) is not None for cell in cells) >= TABLE_NUMERIC_SHARE * len(cells):
+            numeric.append(key)
+    numeric_set = set(numeric)
+
+    structured_rows = []
+    for row in body:
+        values = {}
+        for key, cell in zip(keys, row):
+            value = parse_number(cell) if key in numeric_set else (cell or None)
+            if value is not None:
+                values[key] = value
+        structured_rows.append({'cells': row, 'values': values})
+
+    return {'page': page, 'index': index, 'columns': columns, 'keys': keys,
+            'numeric_columns': numeric, 'rows': structured_rows}
+
+
+def _extract_tables_from_pages(path: str, pages: List[int]) -> List[Dict[str, any]]:
+    """Run pdfplumber's table finder on the given 1-based pages (runs in a worker process)."""
+    import pdfplumber
+
+    tables = []
+    with pdfplumber.open(path) as pdf:
+        for page_number in pages:
+            try:
+                page = pdf.pages[page_number - 1]
+                raw_tables = page.extract_tables() or page.extract_tables(_TEXT_TABLE_SETTINGS)
+                page.flush_cache()
+            except Exception:
+                continue
+            index = 0
+            for raw in raw_tables:
+                table = structure_table(raw, page_number, index)
+                if table is not None:
+                    tables.append(table)
+                    index += 1
+    return tables
+
+
+def extract_tables(source, text_content: Iterable[Dict[str, any]], workers: Optional[int] = None,
+                   threshold: float = TABLE_SCORE_THRESHOLD,
+                   pages_per_task: int = TABLE_PAGES_PER_TASK) -> List[Dict[str, any]]:
+    """
+    Extract structured tables from the pages that look like they contain one.
+
+    Args:
+        source: File path, binary file object, bytes or memory-mapped buffer
+        text_content: The document's page records (used for scoring only)
+        workers: Worker processes (defaults to TABLE_EXTRACT_WORKERS)
+        threshold: Minimum score_table_likelihood for a page to be examined
+        pages_per_task: Candidate pages per work unit
+
+    Returns:
+        Table dicts in page order (see the module docstring)
+    """
+    from utils.pdf_processor import _pdf_path
+
+    candidates = table_candidate_pages(text_content, threshold)
+    if not candidates:
+        return []
+
+    workers = workers or TABLE_EXTRACT_WORKERS
+    chunks = [candidates[start:start + pages_per_task] for start in range(0, len(candidates), pages_per_task)]
+    with span("pdf.tables", pages=len(candidates)) as trace, _pdf_path(source) as path:
+        if workers <= 1 or len(chunks) <= 1:
+            results = [_extract_tables_from_pages(path, chunk) for chunk in chunks]
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+                results = []
+                for result, spans in pool.map(run_traced, [_extract_tables_from_pages] * len(chunks),
+                                              [path] * len(chunks), chunks):
+                    results.append(result)
+                    get_tracer().merge(spans)
+        tables = [table for chunk in results for table in chunk]
+        trace.add(tables=len(tables), rows=sum(len(table['rows']) for table in tables))
+    return tables
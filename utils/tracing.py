@@ -0,0 +1,280 @@
+"""
+Lightweight tracing spans and counters.
+
+Wrap a unit of work in a span to record its duration, whether it failed and
+any counters (bytes, pages, rows, tokens, ...):
+
+    with span("pdf.extract") as s:
+        ...
+        s.add(pages=len(pages), bytes=size)
+
+Spans are aggregated per name by the process-wide Tracer, which keeps the
+last TRACE_WINDOW durations for p50/p95 and running totals for everything
+else. The aggregate can be rendered in Prometheus text format
+(prometheus_text) and shown in the app's diagnostics panel; when
+TRACE_JSONL_PATH is set every finished span is also appended to that file
+as one JSON line (line-buffered, so worker processes can share the file).
+
+Work done in process pools is traced in the worker processes; submit it
+through run_traced and pass the returned spans to Tracer.merge so it shows
+up in the parent's aggregate.
+
+Set TRACING_ENABLED=0 to turn tracing off; span() then returns a shared
+no-op object, so instrumented code pays for little more than a function
+call.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "1") not in ("0", "false", "False", "")
+TRACE_JSONL_PATH = os.getenv("TRACE_JSONL_PATH")
+# Durations kept per span name for percentiles
+TRACE_WINDOW = int(os.getenv("TRACE_WINDOW", "1000"))
+# File written by write_prometheus when no path is given (e.g. for a node_exporter textfile collector)
+TRACE_PROMETHEUS_PATH = os.getenv("TRACE_PROMETHEUS_PATH")
+
+METRIC_PREFIX = "pdfdb"
+
+
+class _NoopSpan:
+    """Returned by span() when tracing is disabled."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def add(self, **counters):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """One timed unit of work; use as a context manager."""
+
+    __slots__ = ("tracer", "name", "counters", "started")
+
+    def __init__(self, tracer: "Tracer", name: str, counters: Dict[str, float]):
+        self.tracer = tracer
+        self.name = name
+        self.counters = counters
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # A generator closed early is not a failure of the work it was doing
+        failed = exc_type is not None and not issubclass(exc_type, GeneratorExit)
+        self.tracer.record(self.name, time.perf_counter() - self.started, self.counters, failed)
+        return False
+
+    def add(self, **counters):
+        """Add to this span's counters."""
+        for key, value in counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+
+
+class _SpanStats:
+    __slots__ = ("count", "errors", "seconds", "durations", "counters")
+
+    def __init__(self, window: int):
+        self.count = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.durations = deque(maxlen=window)
+        self.counters: Dict[str, float] = {}
+
+
+def _percentile(values: list, q: float) -> float:
+    return values[min(int(q * len(values)), len(values) - 1)] if values else 0.0
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Tracer:
+    """Aggregates finished spans per name and optionally logs them as JSONL."""
+
+    def __init__(self, enabled: bool = TRACING_ENABLED, jsonl_path: Optional[str] = TRACE_JSONL_PATH,
+                 window: int = TRACE_WINDOW):
+        """
+        Args:
+            enabled: Record spans at all
+            jsonl_path: Append each finished span to this file as a JSON line
+            window: Durations kept per span name for percentiles
+        """
+        self.enabled = enabled
+        self.window = window
+        self._lock = threading.Lock()
+        self._stats: Dict[str, _SpanStats] = {}
+        self._log = open(jsonl_path, "a", buffering=1, encoding="utf-8") if enabled and jsonl_path else None
+
+    def span(self, name: str, **counters):
+        """Start a span; counters given here are recorded with it."""
+        if not self.enabled:
+            return _NOOP_SPAN
+        return Span(self, name, counters)
+
+    def record(self, name: str, seconds: float, counters: Dict[str, float] = None, failed: bool = False):
+        """Record a finished span."""
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = _SpanStats(self.window)
+            stats.count += 1
+            stats.errors += failed
+            stats.seconds += seconds
+            stats.durations.append(seconds)
+            for key, value in (counters or {}).items():
+                stats.counters[key] = stats.counters.get(key, 0) + value
+            if self._log is not None:
+                self._log.write(json.dumps({"ts": round(time.time(), 3), "span": name,
+                                            "ms": round(seconds * 1000, 3), "error": failed,
+                                            **(counters or {})}) + "\n")
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Per span name: count, errors, total_ms, p50_ms, p95_ms and counter totals."""
+        with self._lock:
+            items = [(name, stats.count, stats.errors, stats.seconds, sorted(stats.durations), dict(stats.counters))
+                     for name, stats in self._stats.items()]
+        return {
+            name: {"count": count, "errors": errors, "total_ms": seconds * 1000,
+                   "p50_ms": _percentile(durations, 0.5) * 1000, "p95_ms": _percentile(durations, 0.95) * 1000,
+                   **counters}
+            for name, count, errors, seconds, durations, counters in sorted(items)
+        }
+
+    def prometheus_text(self) -> str:
+        """Render the aggregate in the Prometheus text exposition format."""
+        duration = f"{METRIC_PREFIX}_span_duration_seconds"
+        errors = f"{METRIC_PREFIX}_span_errors_total"
+        with self._lock:
+            items = [(name, stats.count, stats.errors, stats.seconds, sorted(stats.durations), dict(stats.counters))
+                     for name, stats in sorted(self._stats.items())]
+
+        lines = [f"# HELP {duration} Duration of traced spans.", f"# TYPE {duration} summary"]
+        for name, count, _, seconds, durations, _ in items:
+            label = f'span="{_escape_label(name)}"'
+            for q in (0.5, 0.95):
+                lines.append(f'{duration}{{{label},quantile="{q}"}} {_percentile(durations, q):.6f}')
+            lines.append(f"{duration}_sum{{{label}}} {seconds:.6f}")
+            lines.append(f"{duration}_count{{{label}}} {count}")
+
+        lines += [f"# HELP {errors} Spans that ended with an exception.", f"# TYPE {errors} counter"]
+        lines += [f'{errors}{{span="{_escape_label(name)}"}} {failed}' for name, _, failed, _, _, _ in items]
+
+        for counter in sorted({key for *_, counters in items for key in counters}):
+            metric = f"{METRIC_PREFIX}_span_{counter}_total"
+            lines += [f"# HELP {metric} Total {counter} recorded by traced spans.", f"# TYPE {metric} counter"]
+            lines += [f'{metric}{{span="{_escape_label(name)}"}} {counters[counter]:g}'
+                      for name, *_, counters in items if counter in counters]
+        return "\n".join(lines) + "\n"
+
+    def export(self) -> Dict[str, dict]:
+        """Raw per-name aggregates (picklable), for merging into another process's tracer."""
+        with self._lock:
+            return {name: {"count": stats.count, "errors": stats.errors, "seconds": stats.seconds,
+                           "durations": list(stats.durations), "counters": dict(stats.counters)}
+                    for name, stats in self._stats.items()}
+
+    def merge(self, exported: Dict[str, dict]):
+        """Add spans exported by another tracer (they were logged to JSONL where they were recorded)."""
+        with self._lock:
+            for name, other in exported.items():
+                stats = self._stats.get(name)
+                if stats is None:
+                    stats = self._stats[name] = _SpanStats(self.window)
+                stats.count += other["count"]
+                stats.errors += other["errors"]
+                stats.seconds += other["seconds"]
+                stats.durations.extend(other["durations"])
+                for key, value in other["counters"].items():
+                    stats.counters[key] = stats.counters.get(key, 0) + value
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def flush(self):
+        with self._lock:
+            if self._log is not None:
+                self._log.flush()
+
+    def close(self):
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """Return the process-wide tracer, creating it on first use."""
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = Tracer()
+                atexit.register(lambda: _tracer is not None and _tracer.close())
+    return _tracer
+
+
+def set_tracer(tracer: Optional[Tracer]) -> Optional[Tracer]:
+    """Replace the process-wide tracer; returns the previous one."""
+    global _tracer
+    with _tracer_lock:
+        previous, _tracer = _tracer, tracer
+    return previous
+
+
+def span(name: str, **counters):
+    """Start a span on the process-wide tracer (see Tracer.span)."""
+    return get_tracer().span(name, **counters)
+
+
+def run_traced(func, *args, **kwargs) -> Tuple[Any, Dict[str, dict]]:
+    """
+    Call func and return (its result, the spans it recorded, exported).
+
+    Meant as the target of process pool tasks: the spans are collected on a
+    fresh tracer (sharing the JSONL log), so they are neither lost with the
+    worker nor mixed with state inherited from the parent. Merge them in the
+    parent with get_tracer().merge(spans).
+    """
+    parent = get_tracer()
+    if not parent.enabled:
+        return func(*args, **kwargs), {}
+    tracer = Tracer(enabled=True, jsonl_path=None, window=parent.window)
+    tracer._log = parent._log
+    previous = set_tracer(tracer)
+    try:
+        return func(*args, **kwargs), tracer.export()
+    finally:
+        set_tracer(previous)
+
+
+def write_prometheus(path: Optional[str] = None) -> Optional[str]:
+    """Write the Prometheus text to path (default TRACE_PROMETHEUS_PATH); returns the path written."""
+    path = path or TRACE_PROMETHEUS_PATH
+    if not path:
+        return None
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(get_tracer().prometheus_text())
+    os.replace(path + ".tmp", path)
+    return path
@@ -1,6 +1,6 @@
-import pyttsx3
-
 def speak(text):
+    import pyttsx3
+
     engine = pyttsx3.init()
     engine.say(text)
     engine.runAndWait()
@@ -0,0 +1,345 @@
+"""
+Passage chunking, local embeddings and a NumPy top-k vector index.
+
+Pages are split into overlapping word windows ("passages") which are
+embedded with a hashing embedder: unigram and bigram features are hashed
+into a fixed number of signed dimensions, so no model download or network
+access is needed and vectors are identical across processes. Vectors are
+L2-normalised, which makes cosine similarity a plain dot product.
+
+The index is enabled by setting PDF_VECTOR_INDEX_DIR. It is persisted in
+generations (see utils.index_store) as
+
+    <directory>/CURRENT                 name of the live generation
+    <directory>/gen-<n>/vectors.npy     float32 matrix, one row per passage
+    <directory>/gen-<n>/passages.json   filename, page and text for every row
+
+so both files are switched together, and vectors.npy is memory-mapped when
+loaded. Processes sharing the directory merge each other's saves.
+"""
+import json
+import os
+import threading
+import time
+import zlib
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from utils.index_store import (current_generation, generation_number, new_generation, pin, publish,
+                               remove_old_generations, writer_lock)
+from utils.search_index import SEARCH_INDEX_SAVE_EVERY_DOCS, SEARCH_INDEX_SAVE_EVERY_SECONDS, tokenize
+
+PDF_VECTOR_INDEX_DIR = os.getenv("PDF_VECTOR_INDEX_DIR")
+PASSAGE_WORDS = int(os.getenv("PASSAGE_WORDS", "120"))
+PASSAGE_OVERLAP = int(os.getenv("PASSAGE_OVERLAP", "30"))
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "512"))
+
+# Rows scored per matrix multiply, bounding temporary memory during search
+_SEARCH_BLOCK_ROWS = 65536
+
+
+def split_passages(filename: str, pages: Iterable[dict], max_words: int = PASSAGE_WORDS,
+                   overlap: int = PASSAGE_OVERLAP) -> List[dict]:
+    """
+    Split page records into overlapping word windows.
+
+    Args:
+        filename: Document the pages belong to
+        pages: Page records with 'page' and 'text'
+        max_words: Words per passage
+        overlap: Words shared between consecutive passages of a page
+
+    Returns:
+        List of passages with filename, page, passage (index within the page) and text
+    """
+    if not 0 <= overlap < max_words:
+        raise ValueError("overlap must be smaller than max_words")
+
+    passages = []
+    step = max_words - overlap
+    for page_data in pages:
+        words = page_data['text'].split()
+        for number, start in enumerate(range(0, max(len(words) - overlap, 1), step)):
+            text = " ".join(words[start:start + max_words])
+            if text:
+                passages.append({"filename": filename, "page": page_data['page'], "passage": number, "text": text})
+    return passages
+
+
+class HashingEmbedder:
+    """Stateless feature-hashing embedder over unigrams and bigrams."""
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        tokens = tokenize(text)
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    def embed(self, texts: Sequence[str]):
+        """Return an (n, dim) float32 array of L2-normalised vectors."""
+        import numpy as np
+
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = np.fromiter((zlib.crc32(feature.encode("utf-8")) for feature in self._features(text)),
+                                 dtype=np.uint32)
+            if not hashes.size:
+                continue
+            signs = np.where(hashes & 0x80000000, 1.0, -1.0).astype(np.float32)
+            np.add.at(vectors[row], hashes % self.dim, signs)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+
+class VectorIndex:
+    """Top-k cosine search over passage vectors held in a NumPy matrix."""
+
+    def __init__(self, directory: Optional[str] = None, embedder: Optional[HashingEmbedder] = None):
+        import numpy as np
+
+        self.directory = directory
+        self.embedder = embedder or HashingEmbedder()
+        self._lock = threading.RLock()
+        self._vectors = np.zeros((0, self.embedder.dim), dtype=np.float32)
+        self._pending: List = []  # arrays appended since the last consolidation
+        self._passages: List[Optional[dict]] = []  # None marks a removed row
+        self._rows_by_document: Dict[str, List[int]] = {}
+        self._updates: Dict[str, Optional[tuple]] = {}  # unsaved (passages, vectors) per filename, None for a removal
+        self._dirty = False
+        self._pending_documents = 0
+        self._last_save = time.monotonic()
+        self._pin = None
+        self.generation = 0
+        if directory and (os.path.exists(os.path.join(directory, "CURRENT"))
+                          or os.path.exists(os.path.join(directory, "vectors.npy"))):
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._passages) - sum(passage is None for passage in self._passages)
+
+    def update_document(self, filename: str, passages: List[dict], vectors=None):
+        """
+        Replace all passages of a document.
+
+        Args:
+            filename: Document filename
+            passages: Passages as produced by split_passages
+            vectors: Precomputed embeddings for the passages (computed if omitted)
+        """
+        if vectors is None:
+            vectors = self.embedder.embed([passage["text"] for passage in passages])
+        with self._lock:
+            self._remove_rows(filename)
+            first = len(self._passages)
+            self._passages.extend(passages)
+            self._pending.append(vectors)
+            self._rows_by_document[filename] = list(range(first, first + len(passages)))
+            self._updates[filename] = (passages, vectors)
+            self._dirty = True
+            self._pending_documents += 1
+
+    def remove_document(self, filename: str):
+        with self._lock:
+            self._remove_rows(filename)
+            self._rows_by_document.pop(filename, None)
+            self._updates[filename] = None
+            self._dirty = True
+            self._pending_documents += 1
+
+    def _remove_rows(self, filename: str):
+        for row in self._rows_by_document.get(filename, []):
+            self._passages[row] = None
+
+    def _matrix(self):
+        """Consolidate pending vectors into one matrix."""
+        import numpy as np
+
+        if self._pending:
+            self._vectors = np.concatenate([np.asarray(self._vectors)] + self._pending)
+            self._pending = []
+        return self._vectors
+
+    def search(self, queries: Sequence[str], top_k: int = 5) -> List[List[dict]]:
+        """
+        Find the passages most similar to each query.
+
+        Queries are embedded together and scored with one matrix product per
+        block of rows.
+
+        Returns:
+            One list per query of up to top_k passages with positive similarity
+            (with an added 'score'), best first
+        """
+        import numpy as np
+
+        query_vectors = self.embedder.embed(list(queries))
+        with self._lock:
+            matrix = self._matrix()
+            live = np.fromiter((passage is not None for passage in self._passages), dtype=bool,
+                               count=len(self._passages))
+            if not live.any():
+                return [[] for _ in queries]
+
+            best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+            best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+            for start in range(0, matrix.shape[0], _SEARCH_BLOCK_ROWS):
+                block = matrix[start:start + _SEARCH_BLOCK_ROWS]
+                scores = query_vectors @ block.T
+                scores[:, ~live[start:start + block.shape[0]]] = -np.inf
+                rows = np.broadcast_to(np.arange(start, start + block.shape[0]), scores.shape)
+                best_scores = np.concatenate([best_scores, scores], axis=1)
+                best_rows = np.concatenate([best_rows, rows], axis=1)
+                if best_scores.shape[1] > top_k:
+                    keep = np.argpartition(-best_scores, top_k - 1, axis=1)[:, :top_k]
+                    best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                    best_rows = np.take_along_axis(best_rows, keep, axis=1)
+
+            results = []
+            for scores, rows in zip(best_scores, best_rows):
+                order = np.argsort(-scores)
+                results.append([dict(self._passages[rows[i]], score=float(scores[i]))
+                                for i in order if scores[i] > 0])
+            return results
+
+    def save(self):
+        """
+        Write live passages and vectors as a new generation and switch to it.
+
+        Like BM25Index.save, saves are serialised across processes and a
+        generation published by another process is loaded first, with this
+        instance's unsaved updates replayed on top.
+        """
+        import numpy as np
+
+        if not self.directory:
+            raise ValueError("VectorIndex has no directory to save to")
+        with self._lock, writer_lock(self.directory):
+            self._merge_latest()
+            matrix = self._matrix()
+            keep = [row for row, passage in enumerate(self._passages) if passage is not None]
+            generation, target = new_generation(self.directory)
+            np.save(os.path.join(target, "vectors.npy"), np.ascontiguousarray(matrix[keep], dtype=np.float32))
+            with open(os.path.join(target, "passages.json"), "w", encoding="utf-8") as f:
+                json.dump({"dim": self.embedder.dim, "passages": [self._passages[row] for row in keep]}, f)
+            name = publish(self.directory, target, generation)
+            self.load()
+            remove_old_generations(self.directory, keep=name)
+
+    def _merge_latest(self):
+        """Load a generation published by another process and replay this instance's unsaved updates on it."""
+        name = current_generation(self.directory)
+        if name is None or generation_number(name) == self.generation:
+            return
+        updates = self._updates
+        self.load()
+        for filename, update in updates.items():
+            if update is None:
+                self.remove_document(filename)
+            else:
+                self.update_document(filename, *update)
+
+    def refresh(self) -> bool:
+        """
+        Pick up a newer generation saved by another process.
+
+        Only reloads when this instance has no unsaved updates (save() merges
+        those with the newer generation). Returns True if a new generation
+        was loaded.
+        """
+        if not self.directory:
+            return False
+        with self._lock:
+            if self._dirty:
+                return False
+            name = current_generation(self.directory)
+            if name is None or generation_number(name) == self.generation:
+                return False
+            self.load()
+            return True
+
+    def flush(self):
+        """Save if anything changed since the last save or load."""
+        with self._lock:
+            if self._dirty:
+                self.save()
+
+    def save_if_due(self):
+        """Save when enough documents changed or enough time passed since the last save."""
+        with self._lock:
+            if self._pending_documents and (
+                    self._pending_documents >= SEARCH_INDEX_SAVE_EVERY_DOCS
+                    or time.monotonic() - self._last_save >= SEARCH_INDEX_SAVE_EVERY_SECONDS):
+                self.save()
+
+    def load(self):
+        """Load the current generation (or the unversioned files of older releases), memory-mapping the vectors."""
+        import numpy as np
+
+        with self._lock:
+            for attempt in range(3):
+                name = current_generation(self.directory)
+                source = os.path.join(self.directory, name) if name else self.directory
+                generation_pin = pin(source) if name else None
+                try:
+                    with open(os.path.join(source, "passages.json"), encoding="utf-8") as f:
+                        stored = json.load(f)
+                    vectors = np.load(os.path.join(source, "vectors.npy"), mmap_mode="r")
+                    break
+                except FileNotFoundError:
+                    # Replaced and removed by another process while we were opening it
+                    if generation_pin is not None:
+                        generation_pin.close()
+                    if attempt == 2:
+                        raise
+            if stored["dim"] != self.embedder.dim:
+                if generation_pin is not None:
+                    generation_pin.close()
+                raise ValueError(f"Index was built with dim={stored['dim']}, embedder has dim={self.embedder.dim}")
+            if self._pin is not None:
+                self._pin.close()
+            self._pin = generation_pin
+            self.generation = generation_number(name)
+            self._vectors = vectors
+            self._pending = []
+            self._updates = {}
+            self._passages = stored["passages"]
+            self._rows_by_document = {}
+            for row, passage in enumerate(self._passages):
+                self._rows_by_document.setdefault(passage["filename"], []).append(row)
+            self._dirty = False
+            self._pending_documents = 0
+            self._last_save = time.monotonic()
+
+
+def index_document_passages(pdf_data: dict, index: "VectorIndex") -> None:
+    """Chunk and embed a processed PDF into the index, reusing precomputed passages if present."""
+    passages = pdf_data.get('passages')
+    if passages is None:
+        passages = split_passages(pdf_data['filename'], pdf_data['text_content'])
+    index.update_document(pdf_data['filename'], passages, pdf_data.get('passage_vectors'))
+
+
+_index: Optional[VectorIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_vector_index() -> Optional[VectorIndex]:
+    """Return the process-wide passage index, or None when PDF_VECTOR_INDEX_DIR is not set."""
+    global _index
+    if _index is None and PDF_VECTOR_INDEX_DIR:
+        with _index_lock:
+            if _index is None:
+                import atexit
+
+                _index = VectorIndex(PDF_VECTOR_INDEX_DIR)
+                atexit.register(lambda: _index is not None and _index.flush())
+    return _index
+
+
+def set_vector_index(index: Optional[VectorIndex]) -> Optional[VectorIndex]:
+    """Replace the process-wide index; returns the previous one."""
+    global _index
+    with _index_lock:
+        previous, _index = _index, index
+    return previous